@@ -0,0 +1,352 @@
+"""Load-test the API in-process and report latency per route.
+
+The FastAPI app is booted in this process (startup hooks included) and
+driven through an ASGI transport, so the numbers cover routing, middleware,
+validation, encoding and the database calls, without any network hop in
+front of the app. The database is an in-memory mongomock-motor stand-in by
+default, or a throwaway database on a real server with ``--backend mongo``.
+
+N profiles are generated by generate_data.py, then concurrent clients replay
+a weighted mix of anonymous directory browsing, profile views, contact
+reveals, logins, registrations and profile updates. p50/p95/p99 latency and
+throughput are reported per route and can be saved as JSON; given a
+baseline, the run fails when a route's p95 regresses past the threshold.
+
+    python benchmarks/api.py --profiles 2000 --requests 5000 --json results.json
+    python benchmarks/api.py --baseline results.json --threshold 0.25
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/api.py --backend mongo --profiles 100000
+
+Numbers from the mongomock backend compare the application's own overhead
+between runs; only the mongo backend says anything about query plans.
+
+The response cache hits, misses and tag version reads from MongoDB are
+reported too; ``RESPONSE_CACHE_VERSIONS_TTL=0`` shows the cost of reading
+the versions on every lookup.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('FIREBASE_PROJECT_ID', 'benchmark')
+# Every simulated client shares one address and a handful of accounts
+os.environ.setdefault('CONTACT_RATE_LIMIT_PER_IP', '1000000/60')
+os.environ.setdefault('CONTACT_RATE_LIMIT_PER_USER', '1000000/60')
+
+import httpx  # noqa: E402
+
+import database  # noqa: E402
+import response_cache  # noqa: E402
+from serialization import SERIALIZATION_MODE  # noqa: E402
+
+PASSWORD = "benchmark123"
+
+# Relative weights of the operations in the mix
+MIX = {
+    "browse": 50,
+    "view": 25,
+    "contact": 8,
+    "login": 6,
+    "register": 3,
+    "update": 8,
+}
+
+# Routes as reported; several operations may share one
+ROUTES = {
+    "browse": "GET /api/entrepreneurs",
+    "view": "GET /api/entrepreneurs/{id}",
+    "contact": "GET /api/entrepreneurs/{id}/contact",
+    "login": "POST /api/auth/login",
+    "register": "POST /api/auth/register",
+    "update": "PUT /api/entrepreneurs/{id}",
+}
+
+
+def use_backend(backend: str, database_name: str):
+    """Point the app at the benchmark database; must run before server is imported"""
+    os.environ['DB_NAME'] = database_name
+    if backend == "mock":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("The mock backend needs mongomock-motor (pip install mongomock-motor)")
+        database.create_client = lambda url, **overrides: AsyncMongoMockClient()
+        # Read preferences mean nothing to the stand-in
+        database.listing_database = lambda db: db
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings: List[float], errors: int, elapsed: float) -> dict:
+    timings = sorted(timings)
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "throughput_rps": round(len(timings) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+    }
+
+
+class Workload:
+    """Builds the requests of each operation from the seeded directory"""
+
+    def __init__(self, server, profiles: List[dict], accounts: List[Tuple[dict, dict]], backend: str, seed: int):
+        self.server = server
+        self.random = random.Random(seed)
+        self.profile_ids = [p["id"] for p in profiles]
+        self.cities = [(p["location"], p["city"]) for p in profiles]
+        self.types = [p["profileType"] for p in profiles]
+        self.tags = [tag for p in profiles for tag in p["tags"]]
+        self.words = [p["activityName"] for p in profiles if p.get("activityName")]
+        self.accounts = accounts
+        self.tokens = [server.create_access_token(server.token_claims(user)) for user, _ in accounts]
+        # mongomock cannot evaluate the relevance score
+        self.relevance = backend != "mock"
+        self.registered = 0
+        self.operations: Dict[str, Callable[[], dict]] = {
+            "browse": self.browse,
+            "view": self.view,
+            "contact": self.contact,
+            "login": self.login,
+            "register": self.register,
+            "update": self.update,
+        }
+
+    def next(self) -> Tuple[str, dict]:
+        operation = self.random.choices(list(MIX), list(MIX.values()))[0]
+        return operation, self.operations[operation]()
+
+    def browse(self) -> dict:
+        rnd = self.random
+        params = {"limit": rnd.choice([12, 20, 50])}
+        location, city = rnd.choice(self.cities)
+        if rnd.random() < 0.4:
+            params["location"] = location
+            if rnd.random() < 0.5:
+                params["city"] = city
+        if rnd.random() < 0.3:
+            params["profileType"] = rnd.choice(self.types)
+        if rnd.random() < 0.2:
+            params["tags"] = ",".join(rnd.sample(self.tags, 2))
+        if rnd.random() < 0.2:
+            params["search"] = rnd.choice(self.words).split()[0]
+            if self.relevance and rnd.random() < 0.5:
+                params["sort"] = "relevance"
+        elif rnd.random() < 0.2:
+            params["sort"] = "rating"
+        if rnd.random() < 0.3:
+            params["cursor"] = ""
+        elif rnd.random() < 0.2:
+            params["skip"] = params["limit"] * rnd.randint(1, 5)
+        return {"method": "GET", "url": "/api/entrepreneurs", "params": params}
+
+    def view(self) -> dict:
+        return {"method": "GET", "url": f"/api/entrepreneurs/{self.random.choice(self.profile_ids)}"}
+
+    def contact(self) -> dict:
+        return {"method": "GET", "url": f"/api/entrepreneurs/{self.random.choice(self.profile_ids)}/contact"}
+
+    def login(self) -> dict:
+        user, _ = self.random.choice(self.accounts)
+        return {"method": "POST", "url": "/api/auth/login", "json": {"email": user["email"], "password": PASSWORD}}
+
+    def register(self) -> dict:
+        self.registered += 1
+        email = f"benchmark.{os.getpid()}.{self.registered}@example.com"
+        return {"method": "POST", "url": "/api/auth/register",
+                "json": {"email": email, "password": PASSWORD, "firstName": "Bench", "lastName": "Mark"}}
+
+    def update(self) -> dict:
+        index = self.random.randrange(len(self.accounts))
+        _, profile = self.accounts[index]
+        fields = self.server.EntrepreneurCreate.model_fields
+        body = {key: profile[key] for key in fields if profile.get(key) is not None}
+        body["description"] = f"{profile['description'][:150]} ({self.random.randint(0, 9999)})"
+        return {"method": "PUT", "url": f"/api/entrepreneurs/{profile['id']}", "json": body,
+                "headers": {"Authorization": f"Bearer {self.tokens[index]}"}}
+
+
+async def seed(server, count: int, accounts: int, seed_value: int) -> Tuple[List[dict], List[Tuple[dict, dict]]]:
+    from generate_data import ProfileGenerator
+
+    from passwords import pwd_context
+
+    generator = ProfileGenerator(password_hash=pwd_context.hash(PASSWORD))
+    profiles = []
+    users = []
+    for start in range(0, count, 5000):
+        batch_users, batch_profiles = generator.batch(start, min(start + 5000, count), seed_value)
+        await server.db.users.insert_many(batch_users, ordered=False)
+        await server.db.entrepreneurs.insert_many(batch_profiles, ordered=False)
+        users += batch_users
+        profiles += batch_profiles
+    for doc in users + profiles:
+        doc.pop("_id", None)
+    await server.platform_stats.rebuild()
+    return profiles, list(zip(users, profiles))[:accounts]
+
+
+async def drive(client: httpx.AsyncClient, workload: Workload, total: int, concurrency: int,
+                record: bool) -> Tuple[Dict[str, List[float]], Dict[str, int], Dict[int, int]]:
+    timings: Dict[str, List[float]] = {route: [] for route in ROUTES.values()}
+    errors: Dict[str, int] = {route: 0 for route in ROUTES.values()}
+    statuses: Dict[int, int] = {}
+    remaining = total
+
+    async def client_loop():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            operation, request = workload.next()
+            route = ROUTES[operation]
+            started = time.perf_counter()
+            response = await client.request(**request)
+            elapsed = (time.perf_counter() - started) * 1000
+            if not record:
+                continue
+            timings[route].append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 400:
+                errors[route] += 1
+
+    await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+    return timings, errors, statuses
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> List[str]:
+    """Routes whose p95 grew by more than threshold (and min_delta_ms) over the baseline"""
+    regressions = []
+    for route, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous or not previous.get("requests") or not current.get("requests"):
+            continue
+        limit = previous["p95_ms"] * (1 + threshold)
+        delta = current["p95_ms"] - previous["p95_ms"]
+        if current["p95_ms"] > limit and delta > min_delta_ms:
+            regressions.append(
+                f"{route}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms "
+                f"(+{delta / previous['p95_ms']:.0%}, limit +{threshold:.0%})"
+            )
+    return regressions
+
+
+def cache_counts() -> Dict[str, int]:
+    return {
+        "hits": int(response_cache.CACHE_REQUESTS.total(result="hit")),
+        "misses": int(response_cache.CACHE_REQUESTS.total(result="miss")),
+        "version_reads": int(response_cache.VERSION_READS.value()),
+    }
+
+
+async def run(args) -> int:
+    use_backend(args.backend, args.database)
+    import server
+
+    if args.backend == "mongo":
+        await server.db.client.drop_database(args.database)
+    await server.app.router.startup()
+    try:
+        print(f"🌱 Seeding {args.profiles:,} profiles ({args.backend})")
+        started = time.perf_counter()
+        profiles, accounts = await seed(server, args.profiles, args.accounts, args.seed)
+        # Search terms and indexes as the API would have them
+        await server.prepare_indexes()
+        print(f"   done in {time.perf_counter() - started:.1f}s")
+
+        workload = Workload(server, profiles, accounts, args.backend, args.seed)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            if args.warmup:
+                await drive(client, workload, args.warmup, args.concurrency, record=False)
+            print(f"🚀 {args.requests:,} requests, {args.concurrency} concurrent clients")
+            cache_before = cache_counts()
+            started = time.perf_counter()
+            timings, errors, statuses = await drive(client, workload, args.requests, args.concurrency, record=True)
+            elapsed = time.perf_counter() - started
+            cache = {name: count - cache_before[name] for name, count in cache_counts().items()}
+    finally:
+        await server.app.router.shutdown()
+        if args.backend == "mongo" and not args.keep:
+            await server.client.drop_database(args.database)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "backend": args.backend,
+            "profiles": args.profiles,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "serialization": SERIALIZATION_MODE,
+            "python": platform.python_version(),
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(args.requests / elapsed, 1),
+            "statuses": {str(code): count for code, count in sorted(statuses.items())},
+            "response_cache": {
+                "backend": response_cache.RESPONSE_CACHE_BACKEND,
+                "versions": response_cache.RESPONSE_CACHE_VERSIONS,
+                "versions_ttl_s": response_cache.RESPONSE_CACHE_VERSIONS_TTL,
+                **cache,
+            },
+        },
+        "routes": {route: summarize(values, errors[route], elapsed) for route, values in timings.items() if values},
+    }
+
+    print(f"{'route':<38} {'reqs':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in results["routes"].items():
+        print(f"{route:<38} {stats['requests']:>6} {stats['errors']:>4} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+    print(f"Total: {results['meta']['throughput_rps']} req/s over {elapsed:.1f}s, statuses {results['meta']['statuses']}")
+    print(f"Response cache: {cache['hits']} hits, {cache['misses']} misses, "
+          f"{cache['version_reads']} version reads from MongoDB")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold, args.min_delta_ms)
+        if regressions:
+            print("❌ Regressions against the baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"✅ No route regressed past +{args.threshold:.0%} p95")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["mock", "mongo"], default="mock")
+    parser.add_argument("--database", default="nexus_benchmark", help="database created, and dropped, by the run")
+    parser.add_argument("--keep", action="store_true", help="keep the mongo database after the run")
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=50, help="seeded users that log in and update their profile")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=200, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 growth over the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p95 changes smaller than this")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Time the directory facet counts against one count query per option.
+
+Seeds a throwaway database with generate_data.py profiles, builds the
+indexes, then for a few typical filter combinations measures:
+
+- facet: the single ``$facet`` aggregation behind ``/api/entrepreneurs/facets``
+- per-option: what the frontend would otherwise do, one ``count_documents``
+  per value of each facet field (values from ``distinct``)
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/facets.py
+    python benchmarks/facets.py --backend mock --profiles 5000 --repeat 5
+
+The mock backend has no indexes or query planner; use it to check the script.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+from api import percentile  # noqa: E402
+from database import create_client  # noqa: E402
+from generate_data import ProfileGenerator  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from repository import Repository  # noqa: E402
+
+FIELDS = ["location", "city", "profileType", "tags"]
+ARRAY_FIELDS = ["tags"]
+
+
+def scenarios(sample: dict) -> dict:
+    """Filter combinations built from one generated profile"""
+    return {
+        "unfiltered": {},
+        "location": {"location": sample["location"]},
+        "location+city": {"location": sample["location"], "city": sample["city"]},
+        "profileType": {"profileType": sample["profileType"]},
+        "tags": {"tags": {"$in": sample["tags"][:2]}},
+        "search": {"searchTerms": {"$all": sample["searchTerms"][:1]}},
+    }
+
+
+async def per_option_counts(collection, query: dict, limit: int) -> dict:
+    counts = {"total": await collection.count_documents(query)}
+    for field in FIELDS:
+        values = (await collection.distinct(field, query))[:limit]
+        counts[field] = [
+            {"value": value, "count": await collection.count_documents({"$and": [query, {field: value}]})}
+            for value in values
+        ]
+    return counts
+
+
+async def measure(run, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+    }
+
+
+async def main(args) -> int:
+    if args.backend == "mock":
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = create_client(os.environ['MONGO_URL'])
+    db = client[args.database]
+    repo = Repository(db)
+    try:
+        if args.backend == "mongo":
+            await client.drop_database(args.database)
+        print(f"🌱 Seeding {args.profiles:,} profiles ({args.backend})")
+        generator = ProfileGenerator(skew=args.skew)
+        sample = None
+        for start in range(0, args.profiles, 10000):
+            _, profiles = generator.batch(start, min(start + 10000, args.profiles), args.seed)
+            sample = sample or profiles[0]
+            await db.entrepreneurs.insert_many(profiles, ordered=False)
+        await ensure_indexes(db)
+
+        results = []
+        print(f"{'scenario':<15} {'matches':>8} {'facet p50':>10} {'p95':>8} {'per-option p50':>15} {'p95':>8} {'queries':>8}")
+        for name, query in scenarios(sample).items():
+            facets = await repo.count_facets(query, FIELDS, args.limit, ARRAY_FIELDS)
+            options = await per_option_counts(db.entrepreneurs, query, args.limit)
+            # The total, then one distinct and one count per value for each field
+            queries = 1 + sum(1 + len(options[field]) for field in FIELDS)
+            facet = await measure(lambda: repo.count_facets(query, FIELDS, args.limit, ARRAY_FIELDS), args.repeat)
+            per_option = await measure(lambda: per_option_counts(db.entrepreneurs, query, args.limit), args.repeat)
+            results.append({"scenario": name, "matches": facets["total"], "queries": queries,
+                            "facet": facet, "per_option": per_option})
+            print(f"{name:<15} {facets['total']:>8} {facet['p50_ms']:>10} {facet['p95_ms']:>8} "
+                  f"{per_option['p50_ms']:>15} {per_option['p95_ms']:>8} {queries:>8}")
+
+        if args.json:
+            Path(args.json).write_text(json.dumps(results, indent=2))
+        return 0
+    finally:
+        if args.backend == "mongo" and not args.keep:
+            await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["mongo", "mock"], default="mongo")
+    parser.add_argument("--database", default="nexus_benchmark", help="database created, and dropped, by the run")
+    parser.add_argument("--keep", action="store_true", help="keep the database after the run")
+    parser.add_argument("--profiles", type=int, default=100000)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=50, help="values per facet, as FACET_LIMIT")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write the results to this file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
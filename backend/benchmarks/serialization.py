@@ -0,0 +1,144 @@
+"""Compare the encoding cost of a directory page in each serialization mode.
+
+No database is needed: pages are built from synthetic documents shaped like
+the ones MongoDB returns for each mode.
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --sizes 10 50 100 --repeat 200 --json results.json
+
+Modes:
+- fastapi: the original path (ISO date parsing, validation against
+  List[EntrepreneurPublic], jsonable_encoder and json.dumps by FastAPI)
+- validated: ISO date parsing, TypeAdapter validation and pydantic-core encoding
+- fast: inclusive projection output encoded by orjson (SERIALIZATION_MODE=fast)
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# server.py connects lazily; these only let it import without a .env
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('FIREBASE_PROJECT_ID', 'benchmark')
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from api import percentile  # noqa: E402
+from server import ENTREPRENEUR_LIST, PUBLIC_DOCUMENTS  # noqa: E402
+
+
+def stored_document(i: int) -> dict:
+    """Profile as returned by the exclusion projection of the validated modes"""
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i)
+    media = f"https://api.example.com/api/media/{uuid.uuid4().hex}"
+    return {
+        "id": str(uuid.uuid4()),
+        "userId": str(uuid.uuid4()),
+        "profileType": "freelance",
+        "firstName": "Amina",
+        "lastName": "Diallo",
+        "companyName": "",
+        "activityName": "Designer Graphique & UI/UX",
+        "logo": media,
+        "logoThumbnail": f"{media}-192.webp",
+        "logoSrcset": f"{media}-96.webp 96w, {media}-192.webp 192w, {media}-384.webp 384w",
+        "logoVariants": [{"url": f"{media}-{w}.{fmt}", "width": w, "format": fmt}
+                         for w in (96, 192, 384) for fmt in ("webp", "jpeg")],
+        "description": "Designer passionnée avec 5 ans d'expérience. " * 3,
+        "tags": ["Design", "UI/UX", "Branding", "Logo", "Illustration"],
+        "location": "SN",
+        "city": "Dakar",
+        "website": "https://example.com",
+        "portfolio": [{"type": "image", "value": media, "thumbnail": f"{media}-192.webp",
+                       "srcset": f"{media}-192.webp 192w"} for _ in range(4)],
+        "rating": 4.5,
+        "reviewCount": 12,
+        "isPremium": False,
+        "createdAt": created.isoformat(),
+        "updatedAt": created.isoformat(),
+    }
+
+
+def projected_document(doc: dict) -> dict:
+    """The same profile as returned by the fast mode's inclusive projection"""
+    projected = {key: doc[key] for key in PUBLIC_DOCUMENTS.projection if key in doc}
+    projected["logo"] = doc["logoThumbnail"] or doc["logo"]
+    return projected
+
+
+def convert_dates(docs):
+    for ent in docs:
+        if isinstance(ent.get('createdAt'), str):
+            ent['createdAt'] = datetime.fromisoformat(ent['createdAt'])
+        if isinstance(ent.get('updatedAt'), str):
+            ent['updatedAt'] = datetime.fromisoformat(ent['updatedAt'])
+
+
+def encode_fastapi(docs) -> bytes:
+    convert_dates(docs)
+    return json.dumps(jsonable_encoder(ENTREPRENEUR_LIST.validate_python(docs))).encode()
+
+
+def encode_validated(docs) -> bytes:
+    convert_dates(docs)
+    return ENTREPRENEUR_LIST.dump_json(ENTREPRENEUR_LIST.validate_python(docs))
+
+
+def encode_fast(docs) -> bytes:
+    return PUBLIC_DOCUMENTS.encode_list(docs)
+
+
+MODES = {
+    "fastapi": (encode_fastapi, stored_document),
+    "validated": (encode_validated, stored_document),
+    "fast": (encode_fast, lambda i: projected_document(stored_document(i))),
+}
+
+
+def measure(encode, make_document, size: int, repeat: int) -> dict:
+    page = [make_document(i) for i in range(size)]
+    timings = []
+    for _ in range(repeat):
+        # Fresh shallow copies: the date conversion mutates documents in place
+        docs = [dict(doc) for doc in page]
+        started = time.perf_counter()
+        encode(docs)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return {
+        "p50_us": round(statistics.median(timings), 1),
+        "p95_us": round(percentile(timings, 0.95), 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'size':>5} {'mode':>10} {'p50 µs':>10} {'p95 µs':>10} {'vs fastapi':>11}")
+    for size in args.sizes:
+        baseline = None
+        for mode, (encode, make_document) in MODES.items():
+            result = {"size": size, "mode": mode, **measure(encode, make_document, size, args.repeat)}
+            baseline = baseline or result["p50_us"]
+            result["speedup"] = round(baseline / result["p50_us"], 2)
+            results.append(result)
+            print(f"{size:>5} {mode:>10} {result['p50_us']:>10} {result['p95_us']:>10} {result['speedup']:>10}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+"""Bulk import of entrepreneur profiles from partner spreadsheets.
+
+Partners (chambers of commerce, NGOs) upload a CSV or NDJSON file of their
+members. Rows are read ``IMPORT_CHUNK_SIZE`` at a time off the event loop and
+validated; each chunk is then written with two unordered ``bulk_write``
+calls, one upserting the accounts and one the profiles, plus a lookup of the
+account ids when rows update an earlier import. A bad row never stops the
+others: it is reported with its row number (the header line is not counted).
+
+Imported accounts have no password, so nothing is hashed during the import.
+Each gets an invite token valid ``INVITE_TTL_DAYS``; the partner sends its
+link (``INVITE_URL``) to the member, who sets a password through
+``POST /api/auth/invite``. Only the sha256 of the token is stored.
+
+The frontend has no invite page, so there is no default link: ``INVITE_URL``
+must point to the page that posts the token to ``/api/auth/invite``, with a
+``{token}`` placeholder. Imports fail until it is set; dry runs do not need
+it.
+
+Importing a member again updates the profile and issues a new invite while
+the account is pending. Accounts that registered themselves, signed in with
+Google or accepted their invite belong to their owner: those rows are
+reported as errors and left untouched.
+
+CSV files have one column per ``EntrepreneurCreate`` field, tags separated by
+``|`` (as in exports) or commas and ``portfolio`` as a JSON array. Logos and
+portfolio images must be URLs; inline images are rejected.
+
+The API endpoint requires one of the ``IMPORT_API_KEYS`` (comma-separated)
+in the ``X-API-Key`` header; without keys configured it is disabled. The CLI
+writes to the database directly and prints the report:
+
+    python bulk_import.py members.csv
+    python bulk_import.py members.ndjson --dry-run
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import os
+import re
+import secrets
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from pydantic import ValidationError
+
+import metrics
+
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 500))
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', 10 * 1024 * 1024))
+IMPORT_API_KEYS = [key.strip() for key in os.environ.get('IMPORT_API_KEYS', '').split(',') if key.strip()]
+INVITE_TTL_DAYS = int(os.environ.get('INVITE_TTL_DAYS', 14))
+# Link sent to imported members; {token} is replaced by their invite token
+INVITE_URL = os.environ.get('INVITE_URL', '')
+
+FORMATS = ("csv", "ndjson")
+_SUFFIXES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+# Profile fields only written when the profile is created
+INSERT_ONLY_FIELDS = ("id", "userId", "createdAt", "rating", "reviewCount", "isPremium")
+
+IMPORT_ROWS = metrics.counter("import_rows_total", "Rows of bulk imports by outcome", ["outcome"])
+
+_TAG_SEPARATORS = re.compile(r"[|,]")
+
+# (row number, parsed row or None, error or None)
+Row = Tuple[int, Optional[dict], Optional[str]]
+
+
+class InviteUrlNotConfigured(Exception):
+    """Imported members could not be invited: INVITE_URL is unset or has no {token}"""
+
+    def __init__(self):
+        super().__init__("INVITE_URL must be set to the invite link, with a {token} placeholder, to import members")
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    suffix = Path(filename or "").suffix.lower()
+    if suffix in _SUFFIXES:
+        return _SUFFIXES[suffix]
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/json-lines"):
+        return "ndjson"
+    return None
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def invite_token() -> Tuple[str, str]:
+    """A new invite token and the hash stored in its place"""
+    token = secrets.token_urlsafe(32)
+    return token, hash_token(token)
+
+
+def invite_url(token: str) -> str:
+    return INVITE_URL.replace("{token}", token)
+
+
+def _csv_row(record: dict) -> dict:
+    """Typed row from a CSV record; empty cells are left out so defaults apply"""
+    row = {}
+    for key, value in record.items():
+        # Cells beyond the header come under the None key
+        if key is None or value is None:
+            continue
+        key, value = key.strip(), value.strip()
+        if not key or not value:
+            continue
+        if key == "tags":
+            row[key] = [tag.strip() for tag in _TAG_SEPARATORS.split(value) if tag.strip()]
+        elif key == "portfolio":
+            row[key] = orjson.loads(value)
+        else:
+            row[key] = value
+    return row
+
+
+def read_rows(file: BinaryIO, fmt: str) -> Iterator[Row]:
+    """Parse an uploaded file row by row; blocking, run it off the event loop"""
+    if fmt == "csv":
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            for number, record in enumerate(csv.DictReader(text), 1):
+                try:
+                    yield number, _csv_row(record), None
+                except orjson.JSONDecodeError:
+                    yield number, None, "portfolio: must be a JSON array"
+        finally:
+            # Leave the upload open for its owner
+            text.detach()
+        return
+
+    number = 0
+    for line in file:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Each line must be a JSON object"
+            continue
+        yield number, row, None
+
+
+def _take(rows: Iterator[Row], size: int) -> Tuple[List[Row], Optional[str]]:
+    chunk = []
+    try:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                break
+    except (UnicodeDecodeError, csv.Error) as e:
+        return chunk, f"The rest of the file could not be read: {e}"
+    return chunk, None
+
+
+def validation_messages(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    ]
+
+
+def has_inline_images(profile: dict) -> bool:
+    values = [profile.get("logo")] + [
+        item.get("value") for item in profile.get("portfolio") or [] if item.get("type") == "image"
+    ]
+    return any(isinstance(value, str) and value.startswith("data:") for value in values)
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    accounts_created: int = 0
+    errors: List[dict] = field(default_factory=list)
+    invites: List[dict] = field(default_factory=list)
+    # Pending accounts whose names or invite changed
+    updated_user_ids: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def fail(self, row: int, errors: List[str], email: Optional[str] = None):
+        self.errors.append({"row": row, "email": email, "errors": errors})
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    def report(self) -> dict:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "invites": self.invites,
+            "seconds": round(self.seconds, 3),
+            "rowsPerSecond": self.rows_per_second,
+        }
+
+
+async def _write_chunk(repo, rows: List[Tuple[int, dict]], build_profile: Callable[[dict, str], dict],
+                       result: ImportResult):
+    now = datetime.now(timezone.utc)
+    expires = now + timedelta(days=INVITE_TTL_DAYS)
+
+    accounts, changes, tokens = [], [], []
+    for _, profile in rows:
+        token, token_hash = invite_token()
+        tokens.append(token)
+        accounts.append({
+            "id": str(uuid.uuid4()),
+            "email": profile["email"],
+            "password": None,  # Set when the invite is accepted
+            "googleId": None,
+            "createdAt": now,
+            "importedAt": now,
+        })
+        changes.append({
+            "firstName": profile.get("firstName"),
+            "lastName": profile.get("lastName"),
+            "hasProfile": True,
+            "inviteTokenHash": token_hash,
+            "inviteExpiresAt": expires,
+        })
+
+    inserted, failed = await repo.upsert_pending_users(accounts, changes)
+    for index, error in failed.items():
+        number, profile = rows[index]
+        message = "An account with this email already exists" if error.get("code") == 11000 else error.get("errmsg")
+        result.fail(number, [message], profile["email"])
+
+    # Accounts from an earlier import keep their id
+    matched = [index for index in range(len(rows)) if index not in inserted and index not in failed]
+    existing = await repo.user_ids_by_email([rows[index][1]["email"] for index in matched]) if matched else {}
+
+    written, documents = [], []
+    for index, (number, profile) in enumerate(rows):
+        if index in failed:
+            continue
+        user_id = accounts[index]["id"] if index in inserted else existing.get(profile["email"])
+        if user_id is None:
+            # The account changed hands between the upsert and the lookup
+            result.fail(number, ["An account with this email already exists"], profile["email"])
+            continue
+        written.append(index)
+        documents.append(build_profile(profile, user_id))
+    result.accounts_created += len(inserted)
+
+    created, failed_profiles = await repo.upsert_imported_profiles(documents, INSERT_ONLY_FIELDS)
+    unflag = []
+    for position, index in enumerate(written):
+        number, profile = rows[index]
+        user_id = documents[position]["userId"]
+        if position in failed_profiles:
+            result.fail(number, [failed_profiles[position].get("errmsg", "Profile could not be written")], profile["email"])
+            if index in inserted:
+                unflag.append(user_id)
+            continue
+        if position in created:
+            result.created += 1
+        else:
+            result.updated += 1
+        if index not in inserted:
+            result.updated_user_ids.append(user_id)
+        result.invites.append({
+            "row": number,
+            "email": profile["email"],
+            "userId": user_id,
+            "inviteUrl": invite_url(tokens[index]),
+            "expiresAt": expires,
+        })
+    if unflag:
+        await repo.clear_profile_flags(unflag)
+
+
+async def import_rows(repo, rows: Iterator[Row], validate: Callable[[dict], dict],
+                      build_profile: Callable[[dict, str], dict], chunk_size: int = IMPORT_CHUNK_SIZE,
+                      dry_run: bool = False) -> ImportResult:
+    """Validate and write rows chunk by chunk.
+
+    validate turns a row into profile fields, raising ValidationError;
+    build_profile makes the complete profile document of a user.
+    Raises InviteUrlNotConfigured before reading anything when rows would be
+    written without an invite link to send.
+    """
+    if not dry_run and "{token}" not in INVITE_URL:
+        raise InviteUrlNotConfigured()
+    result = ImportResult()
+    started = time.perf_counter()
+    # Email -> first row using it; later rows would overwrite it in the same import
+    seen: Dict[str, int] = {}
+    last = 0
+
+    while True:
+        chunk, read_error = await asyncio.to_thread(_take, rows, chunk_size)
+        valid = []
+        for number, row, error in chunk:
+            result.rows += 1
+            last = number
+            if error is not None:
+                result.fail(number, [error])
+                continue
+            try:
+                profile = validate(row)
+            except ValidationError as e:
+                email = row.get("email")
+                result.fail(number, validation_messages(e), email if isinstance(email, str) else None)
+                continue
+            email = profile["email"]
+            if has_inline_images(profile):
+                result.fail(number, ["Images must be URLs; upload them through /api/media first"], email)
+                continue
+            if email in seen:
+                result.fail(number, [f"Same email as row {seen[email]}"], email)
+                continue
+            seen[email] = number
+            valid.append((number, profile))
+
+        if valid and not dry_run:
+            await _write_chunk(repo, valid, build_profile, result)
+        if read_error is not None:
+            result.fail(last + 1, [read_error])
+            break
+        if len(chunk) < chunk_size:
+            break
+
+    result.seconds = time.perf_counter() - started
+    if result.created:
+        IMPORT_ROWS.inc(result.created, outcome="created")
+    if result.updated:
+        IMPORT_ROWS.inc(result.updated, outcome="updated")
+    if result.failed:
+        IMPORT_ROWS.inc(result.failed, outcome="failed")
+    return result
+
+
+async def main(args) -> int:
+    # Validation and the database come from the API itself
+    from server import client, finish_import, import_profile_document, repo, validate_import_row
+
+    fmt = args.format or detect_format(args.file, None)
+    if fmt is None:
+        print("❌ Pass --format: the file extension is not .csv, .ndjson or .jsonl", file=sys.stderr)
+        return 2
+    try:
+        with open(args.file, "rb") as file:
+            result = await import_rows(repo, read_rows(file, fmt), validate_import_row, import_profile_document,
+                                       args.chunk_size, args.dry_run)
+        await finish_import(result)
+    except InviteUrlNotConfigured as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    finally:
+        client.close()
+
+    output = open(args.report, "wb") if args.report else sys.stdout.buffer
+    output.write(orjson.dumps(result.report(), option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    if args.report:
+        output.close()
+    print(f"{'✅' if not result.failed else '⚠️ '} {result.rows:,} rows: {result.created:,} created, "
+          f"{result.updated:,} updated, {result.failed:,} failed in {result.seconds:.1f}s "
+          f"({result.rows_per_second:,.0f} rows/s)", file=sys.stderr)
+    return 0 if not result.failed else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="rows validated and written together")
+    parser.add_argument("--report", help="file to write the JSON report to (default: stdout)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
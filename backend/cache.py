@@ -0,0 +1,67 @@
+"""In-process LRU cache with per-entry expiry."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """LRU mapping whose entries also expire after a time-to-live.
+
+    ``maxsize`` is a budget in arbitrary units: every entry costs ``size``
+    units (1 by default), so the same class bounds either the number of
+    entries or, when callers pass byte lengths, the memory held.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.currsize = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at, size = entry
+            if expires_at <= self.timer():
+                del self._data[key]
+                self.currsize -= size
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: int = 1):
+        if size > self.maxsize:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.currsize -= old[2]
+            self._data[key] = (value, self.timer() + ttl, size)
+            self.currsize += size
+            while self.currsize > self.maxsize:
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.currsize -= evicted_size
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self.currsize -= entry[2]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currsize = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
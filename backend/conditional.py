@@ -0,0 +1,73 @@
+"""HTTP conditional requests (ETag / Last-Modified / 304) for public reads.
+
+Validators are derived from data that is known before a body is encoded:
+``id`` + ``updatedAt`` for a profile, the response-cache key (which embeds
+the collection versions) for listings. A matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with an empty 304.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Union
+
+from fastapi import Request, Response, status
+
+from serialization import SERIALIZATION_MODE
+
+# Lets browsers and the CDN in front of the frontend cache public directory responses
+PUBLIC_CACHE_CONTROL = os.environ.get(
+    'PUBLIC_CACHE_CONTROL',
+    'public, max-age=30, s-maxage=120, stale-while-revalidate=300'
+)
+# Part of every ETag, so changing the response representation invalidates old ones
+# (the serialization modes format dates differently)
+REPRESENTATION_VERSION = f"1:{SERIALIZATION_MODE}"
+
+
+def strong_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(p) for p in (REPRESENTATION_VERSION, *parts)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def http_date(value: Union[datetime, str]) -> str:
+    if isinstance(value, str):
+        # Document not migrated to native dates yet
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validator_headers(etag: Optional[str], last_modified: Union[datetime, str, None] = None) -> Dict[str, str]:
+    headers = {"Cache-Control": PUBLIC_CACHE_CONTROL}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers.get("ETag")
+        if not etag:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison, as required for If-None-Match
+        return "*" in candidates or etag in [c[2:] if c.startswith("W/") else c for c in candidates]
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,170 @@
+"""MongoDB client settings, pool warm-up and connection pool metrics.
+
+Every option can be overridden from the environment:
+
+- ``MONGO_MAX_POOL_SIZE`` / ``MONGO_MIN_POOL_SIZE``: connections per server
+  (the minimum is kept open by the driver between bursts)
+- ``MONGO_MAX_IDLE_TIME_MS``: idle connections are closed after this
+- ``MONGO_WAIT_QUEUE_TIMEOUT_MS``: how long a request waits for a free
+  connection before failing, instead of piling up behind a saturated pool
+- ``MONGO_CONNECT_TIMEOUT_MS``, ``MONGO_SOCKET_TIMEOUT_MS``,
+  ``MONGO_SERVER_SELECTION_TIMEOUT_MS``: network timeouts
+- ``MONGO_COMPRESSORS``: wire compression, in order of preference; by default
+  zstd and snappy when their libraries are installed, then zlib
+- ``MONGO_LISTING_READ_PREFERENCE``: read preference of the public listing
+  queries (``primary`` by default). ``secondaryPreferred`` offloads them to
+  the secondaries, but those may lag: a listing read right after a write can
+  miss it and then be cached under the version the write just bumped, so
+  only opt in when stale pages for up to the cache TTL are acceptable.
+- ``MONGO_WARM_CONNECTIONS``: connections opened at startup
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+import metrics
+from instrumentation import MongoCommandTimer
+
+logger = logging.getLogger(__name__)
+
+
+def _default_compressors() -> str:
+    compressors = []
+    if importlib.util.find_spec("zstandard"):
+        compressors.append("zstd")
+    if importlib.util.find_spec("snappy"):
+        compressors.append("snappy")
+    compressors.append("zlib")
+    return ",".join(compressors)
+
+
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 5))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 20000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', _default_compressors())
+MONGO_LISTING_READ_PREFERENCE = os.environ.get('MONGO_LISTING_READ_PREFERENCE', 'primary')
+MONGO_WARM_CONNECTIONS = int(os.environ.get('MONGO_WARM_CONNECTIONS', MONGO_MIN_POOL_SIZE))
+
+POOL_CONNECTIONS = metrics.gauge("mongo_pool_connections", "Open connections in the MongoDB pool", ["address"])
+POOL_IN_USE = metrics.gauge("mongo_pool_connections_in_use", "MongoDB connections checked out", ["address"])
+POOL_CHECKOUT_WAIT = metrics.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a MongoDB connection", ["address"]
+)
+POOL_CHECKOUT_FAILURES = metrics.counter(
+    "mongo_pool_checkout_failures_total", "MongoDB connection checkouts that failed", ["address", "reason"]
+)
+POOL_CLEARED = metrics.counter("mongo_pool_cleared_total", "MongoDB pools cleared after errors", ["address"])
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Exports pool size, connections in use and checkout wait time.
+
+    The driver checks a connection out on the thread that runs the operation,
+    so the wait is measured between the two events on that thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        POOL_CONNECTIONS.set(0, address=_address(event))
+        POOL_IN_USE.set(0, address=_address(event))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        POOL_CLEARED.inc(address=_address(event))
+
+    def pool_closed(self, event):
+        POOL_CONNECTIONS.set(0, address=_address(event))
+        POOL_IN_USE.set(0, address=_address(event))
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.inc(address=_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.dec(address=_address(event))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _waited(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, address=_address(event))
+            self._local.started = None
+
+    def connection_check_out_failed(self, event):
+        self._waited(event)
+        POOL_CHECKOUT_FAILURES.inc(address=_address(event), reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        self._waited(event)
+        POOL_IN_USE.inc(address=_address(event))
+
+    def connection_checked_in(self, event):
+        POOL_IN_USE.dec(address=_address(event))
+
+
+def client_options() -> dict:
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "compressors": MONGO_COMPRESSORS,
+        # Dates are stored as BSON dates and read back as aware UTC datetimes
+        "tz_aware": True,
+    }
+
+
+def create_client(mongo_url: str, **overrides) -> AsyncIOMotorClient:
+    """Motor client with the configured pool; overrides take precedence"""
+    options = {**client_options(), **overrides}
+    return AsyncIOMotorClient(mongo_url, event_listeners=[PoolMetrics(), MongoCommandTimer()], **options)
+
+
+def listing_database(db):
+    """The same database with the read preference of the public listing queries"""
+    return db.client.get_database(
+        db.name,
+        read_preference=make_read_preference(read_pref_mode_from_name(MONGO_LISTING_READ_PREFERENCE), None),
+        codec_options=db.codec_options,
+    )
+
+
+async def warm_pool(client, connections: int = MONGO_WARM_CONNECTIONS):
+    """Open connections before the first requests instead of during them"""
+    if connections <= 0:
+        return
+    started = time.perf_counter()
+    try:
+        # Concurrent pings each check out their own connection
+        await asyncio.gather(*[client.admin.command("ping") for _ in range(connections)])
+    except Exception as e:
+        logger.warning(f"MongoDB pool warm-up failed: {str(e)}")
+        return
+    logger.info(f"Warmed {connections} MongoDB connections in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,193 @@
+"""Buffered per-profile analytics: views, contact reveals, search impressions.
+
+Handlers only ``record()`` events on an in-process asyncio queue. A
+background task aggregates them into counters per (profile, hour) and writes
+them with a single ``bulk_write`` of ``$inc`` upserts into
+``profile_stats_hourly`` whenever enough events are buffered or the flush
+interval elapses. The platform totals in ``stats`` are bumped by the same
+flush. Pending events are drained on shutdown.
+
+When a flush fails, the counters whose upserts failed are kept for the next
+one; upserts that succeeded in a partially failed batch are not retried, so
+nothing is counted twice. Failed flushes are retried with an exponential
+backoff, and while MongoDB is unavailable at most ``EVENTS_MAX_KEYS``
+(profile, hour) counters are kept: further events are dropped and counted in
+``events_dropped_total``.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+EVENTS_FLUSH_INTERVAL = float(os.environ.get('EVENTS_FLUSH_INTERVAL', 5))
+EVENTS_MAX_BATCH = int(os.environ.get('EVENTS_MAX_BATCH', 5000))
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100000))
+# Most (profile, hour) counters kept in memory, and longest wait between failed flushes
+EVENTS_MAX_KEYS = int(os.environ.get('EVENTS_MAX_KEYS', 50000))
+EVENTS_MAX_BACKOFF = float(os.environ.get('EVENTS_MAX_BACKOFF', 60))
+
+EVENT_KINDS = ("views", "contactReveals", "impressions")
+# Event kind -> platform total in the stats document
+PLATFORM_TOTALS = {"views": "totalViews", "contactReveals": "totalContactReveals"}
+
+BUFFER_DEPTH = metrics.gauge("events_buffer_depth", "Analytics events queued or aggregated but not yet written")
+FLUSH_TIME = metrics.histogram("events_flush_seconds", "Time taken to write a batch of analytics counters")
+EVENTS_WRITTEN = metrics.counter("events_written_total", "Analytics events written to MongoDB", ["kind"])
+EVENTS_DROPPED = metrics.counter(
+    "events_dropped_total", "Analytics events dropped because the queue or the counters were full", ["reason"]
+)
+
+
+def _hour(now: float) -> datetime:
+    return datetime.fromtimestamp(now - now % 3600, tz=timezone.utc)
+
+
+class EventPipeline:
+    def __init__(self, db, platform_stats=None, flush_interval: float = EVENTS_FLUSH_INTERVAL,
+                 max_batch: int = EVENTS_MAX_BATCH, queue_size: int = EVENTS_QUEUE_SIZE,
+                 max_keys: int = EVENTS_MAX_KEYS, max_backoff: float = EVENTS_MAX_BACKOFF):
+        self.db = db
+        self.platform_stats = platform_stats
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_keys = max_keys
+        self.max_backoff = max_backoff
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._counts: Dict[Tuple[str, datetime], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._buffered = 0
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def record(self, kind: str, profile_id: str, count: int = 1):
+        """Queue an event without waiting; events are dropped if the queue is full"""
+        try:
+            self._queue.put_nowait((kind, profile_id, count, time.time()))
+        except asyncio.QueueFull:
+            EVENTS_DROPPED.inc(count, reason="queue_full")
+            return
+        BUFFER_DEPTH.set(self._queue.qsize() + self._buffered)
+
+    def record_many(self, kind: str, profile_ids: Iterable[str]):
+        for profile_id in profile_ids:
+            self.record(kind, profile_id)
+
+    def _add(self, key: Tuple[str, datetime], kinds: Dict[str, int]):
+        if key not in self._counts and len(self._counts) >= self.max_keys:
+            EVENTS_DROPPED.inc(sum(kinds.values()), reason="buffer_full")
+            return
+        counters = self._counts[key]
+        for kind, count in kinds.items():
+            counters[kind] += count
+            self._buffered += count
+
+    def _aggregate(self, event):
+        kind, profile_id, count, at = event
+        self._add((profile_id, _hour(at)), {kind: count})
+
+    def _drain(self):
+        while True:
+            try:
+                self._aggregate(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def flush(self) -> bool:
+        """Write the buffered counters; False if some of them could not be written"""
+        self._drain()
+        if not self._counts:
+            return True
+        counts, self._counts = self._counts, defaultdict(lambda: defaultdict(int))
+        self._buffered = 0
+
+        entries = list(counts.items())
+        operations = [
+            UpdateOne({"profileId": profile_id, "hour": hour}, {"$inc": dict(kinds)}, upsert=True)
+            for (profile_id, hour), kinds in entries
+        ]
+
+        started = time.perf_counter()
+        failed: List[int] = []
+        try:
+            await self.db.profile_stats_hourly.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # The other upserts were applied: retrying them would count them twice
+            failed = [error["index"] for error in e.details.get("writeErrors", [])]
+            logger.error(f"Analytics flush failed for {len(failed)} of {len(operations)} counters: {str(e)}")
+        except Exception as e:
+            failed = list(range(len(operations)))
+            logger.error(f"Analytics flush failed: {str(e)}")
+        finally:
+            FLUSH_TIME.observe(time.perf_counter() - started)
+
+        # Put the failed counters back so the next flush retries them
+        for index in failed:
+            self._add(*entries[index])
+        BUFFER_DEPTH.set(self._queue.qsize() + self._buffered)
+
+        failed_indexes = set(failed)
+        totals: Dict[str, int] = defaultdict(int)
+        for index, (_, kinds) in enumerate(entries):
+            if index not in failed_indexes:
+                for kind, count in kinds.items():
+                    totals[kind] += count
+        for kind, count in totals.items():
+            EVENTS_WRITTEN.inc(count, kind=kind)
+
+        platform = {PLATFORM_TOTALS[k]: n for k, n in totals.items() if k in PLATFORM_TOTALS}
+        if platform and self.platform_stats is not None:
+            try:
+                await self.platform_stats.increment(**platform)
+            except Exception as e:
+                logger.error(f"Platform stats update failed: {str(e)}")
+        return not failed
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        backoff = 0.0
+        while not self._closing:
+            deadline = loop.time() + self.flush_interval
+            while self._buffered < self.max_batch and not self._closing:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                self._aggregate(event)
+                self._drain()
+            if await self.flush():
+                backoff = 0.0
+            else:
+                # A failed flush leaves the buffer full: wait instead of retrying at once
+                backoff = min(max(backoff * 2, self.flush_interval), self.max_backoff)
+                await asyncio.sleep(backoff)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and write everything still buffered"""
+        if self._task is not None:
+            # wait_for() can swallow a cancellation that races with a queued
+            # event, so the loop also checks the flag
+            self._closing = True
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._closing = False
+        await self.flush()
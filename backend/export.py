@@ -0,0 +1,171 @@
+"""Streaming export of the directory as NDJSON or CSV.
+
+Rows are read from a MongoDB cursor ``EXPORT_BATCH_SIZE`` documents at a
+time, in ``(updatedAt, id)`` order, encoded as they arrive and sent in chunks
+of about ``EXPORT_CHUNK_BYTES``, optionally gzip-compressed on the fly. Memory
+use stays constant whatever the size of the collection.
+
+Incremental exports pass ``since``: only profiles updated at or after it are
+exported. Each row carries its ``updatedAt``, so the last one is the ``since``
+of the next export (that row is exported again, never missed).
+
+The API endpoint requires one of the ``EXPORT_API_KEYS`` (comma-separated) in
+the ``X-API-Key`` header; without keys configured it is disabled. The CLI
+reads the database directly:
+
+    python export.py --format csv --output entrepreneurs.csv
+    python export.py --since 2024-06-01T00:00:00Z --gzip --output changes.ndjson.gz
+"""
+import argparse
+import asyncio
+import csv
+import hmac
+import io
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Callable, List, Optional
+
+import orjson
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+EXPORT_CHUNK_BYTES = int(os.environ.get('EXPORT_CHUNK_BYTES', 64 * 1024))
+EXPORT_API_KEYS = [key.strip() for key in os.environ.get('EXPORT_API_KEYS', '').split(',') if key.strip()]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def valid_api_key(key: Optional[str], keys: List[str] = EXPORT_API_KEYS) -> bool:
+    if not key:
+        return False
+    # Constant-time comparison against every configured key
+    return any([hmac.compare_digest(key.encode(), allowed.encode()) for allowed in keys])
+
+
+def _timestamp(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def csv_value(value) -> str:
+    """Flatten a JSON value into one CSV cell"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return _timestamp(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return "|".join(value)
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value, option=_ORJSON_OPTIONS).decode()
+    return str(value)
+
+
+class CsvEncoder:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _line(self, values) -> bytes:
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerow(values)
+        return self._buffer.getvalue().encode()
+
+    def header(self) -> bytes:
+        return self._line(self.columns)
+
+    def row(self, row: dict) -> bytes:
+        return self._line([csv_value(row.get(column)) for column in self.columns])
+
+
+async def encode_rows(docs: AsyncIterable[dict], to_row: Callable[[dict], dict], fmt: str,
+                      columns: List[str], chunk_bytes: int = EXPORT_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Encoded rows of docs, grouped into chunks of about chunk_bytes"""
+    if fmt == "csv":
+        encoder = CsvEncoder(columns)
+        encode = encoder.row
+        chunk = [encoder.header()]
+    else:
+        def encode(row):
+            return orjson.dumps(row, option=_ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        chunk = []
+    size = sum(len(line) for line in chunk)
+
+    async for doc in docs:
+        line = encode(to_row(doc))
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def gzip_chunks(chunks: AsyncIterable[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """gzip stream of chunks, compressed as they arrive"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(docs: AsyncIterable[dict], to_row: Callable[[dict], dict], fmt: str,
+                  columns: List[str], compress: bool = False) -> AsyncIterator[bytes]:
+    chunks = encode_rows(docs, to_row, fmt, columns)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+async def main(args) -> int:
+    # The row shape and database come from the API itself
+    from server import EXPORT_COLUMNS, client, export_documents, export_row
+
+    since = datetime.fromisoformat(args.since.replace("Z", "+00:00")) if args.since else None
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    started = time.perf_counter()
+    written = 0
+    rows = 0
+
+    def count_row(doc: dict) -> dict:
+        nonlocal rows
+        rows += 1
+        return export_row(doc)
+
+    try:
+        stream = export_stream(export_documents(since, args.batch_size), count_row, args.format,
+                               EXPORT_COLUMNS, compress=args.gzip)
+        async for chunk in stream:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+        client.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Exported {rows:,} profiles ({written:,} bytes) in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} rows/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=list(MEDIA_TYPES), default="ndjson")
+    parser.add_argument("--since", help="only profiles updated at or after this ISO 8601 time")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="documents per cursor batch")
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
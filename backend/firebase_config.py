@@ -1,35 +1,219 @@
-import firebase_admin
-from firebase_admin import credentials, auth
-import os
+import asyncio
+import base64
+import hashlib
 import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+CLOCK_SKEW_SECONDS = 60
+MIN_KEY_REFRESH_INTERVAL = 60
+VERIFIED_TOKEN_TTL = int(os.environ.get('FIREBASE_TOKEN_CACHE_TTL', 60))
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get('FIREBASE_TOKEN_CACHE_SIZE', 10000))
+
+
+def _load_project_id() -> str:
+    """Resolve the Firebase project from the environment or the admin credentials"""
+    project_id = os.getenv("FIREBASE_PROJECT_ID")
+    if project_id:
+        return project_id
+
+    # Initialize from environment variable for cloud deployment
+    firebase_admin_json_str = os.getenv("FIREBASE_ADMIN_JSON")
+    if firebase_admin_json_str:
+        try:
+            return json.loads(firebase_admin_json_str)["project_id"]
+        except (json.JSONDecodeError, KeyError) as e:
+            raise ValueError(f"Error decoding FIREBASE_ADMIN_JSON: {e}")
 
-# Initialize Firebase Admin from environment variable for cloud deployment
-firebase_admin_json_str = os.getenv("FIREBASE_ADMIN_JSON")
-if firebase_admin_json_str:
-    try:
-        firebase_admin_json = json.loads(firebase_admin_json_str)
-        cred = credentials.Certificate(firebase_admin_json)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Error decoding FIREBASE_ADMIN_JSON: {e}")
-else:
     # Fallback for local development if the file exists
-    from pathlib import Path
-    ROOT_DIR = Path(__file__).parent
-    local_creds_path = ROOT_DIR / 'firebase-admin.json'
+    local_creds_path = Path(__file__).parent / 'firebase-admin.json'
     if local_creds_path.exists():
-        cred = credentials.Certificate(str(local_creds_path))
-    else:
-        raise ValueError("FIREBASE_ADMIN_JSON environment variable not set and firebase-admin.json file not found.")
+        return json.loads(local_creds_path.read_text())["project_id"]
+
+    raise ValueError("FIREBASE_ADMIN_JSON environment variable not set and firebase-admin.json file not found.")
+
+
+class TokenVerificationError(Exception):
+    pass
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _is_timestamp(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _load_public_keys(certificates: Dict[str, str]) -> dict:
+    """Map key id -> RSA public key from PEM certificates (or PEM public keys)"""
+    keys = {}
+    for kid, pem in certificates.items():
+        data = pem.encode()
+        if b"BEGIN CERTIFICATE" in data:
+            keys[kid] = x509.load_pem_x509_certificate(data).public_key()
+        else:
+            keys[kid] = serialization.load_pem_public_key(data)
+    return keys
+
+
+class StaticKeySource:
+    """Fixed key set, used to stand in for Google's certificates offline"""
+
+    def __init__(self, certificates: Dict[str, str]):
+        self._keys = _load_public_keys(certificates)
+
+    async def get_keys(self, refresh: bool = False) -> dict:
+        return self._keys
+
+
+class GoogleKeySource:
+    """Google's signing certificates, cached for the max-age they are served with"""
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL, executor: Optional[ThreadPoolExecutor] = None):
+        self.url = url
+        self.executor = executor
+        self._keys: dict = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fetch(self):
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else 0
+        return _load_public_keys(response.json()), max_age
+
+    async def get_keys(self, refresh: bool = False) -> dict:
+        now = time.monotonic()
+        if self._keys and now < self._expires_at and not refresh:
+            return self._keys
+
+        async with self._lock:
+            now = time.monotonic()
+            fresh = now < self._expires_at
+            recently_fetched = now - self._fetched_at < MIN_KEY_REFRESH_INTERVAL
+            # Another request refreshed while we waited, or a forced refresh just happened
+            if self._keys and ((fresh and not refresh) or (refresh and recently_fetched)):
+                return self._keys
+            try:
+                loop = asyncio.get_running_loop()
+                keys, max_age = await loop.run_in_executor(self.executor, self._fetch)
+            except Exception as e:
+                if not self._keys:
+                    raise TokenVerificationError(f"Could not fetch signing keys: {str(e)}")
+                logger.warning(f"Using stale Firebase signing keys: {str(e)}")
+                return self._keys
+            self._keys = keys
+            self._fetched_at = now
+            self._expires_at = now + max_age
+            return self._keys
+
+
+class FirebaseTokenVerifier:
+    """Async verification of Firebase ID tokens
+
+    Signatures are checked on a thread pool, and tokens that already passed
+    verification are remembered for a short time (never past their expiry).
+    """
+
+    def __init__(self, project_id: str, key_source=None, max_workers: int = 2):
+        self.project_id = project_id
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="firebase")
+        self.key_source = key_source or GoogleKeySource(executor=self.executor)
+        self.verified = TTLCache(maxsize=VERIFIED_TOKEN_CACHE_SIZE, ttl=VERIFIED_TOKEN_TTL)
+
+    def _check_signature(self, key, signing_input: bytes, signature: bytes):
+        try:
+            key.verify(signature, signing_input, padding.PKCS1v15(), hashes.SHA256())
+        except InvalidSignature:
+            raise TokenVerificationError("Invalid token signature")
+
+    def _check_claims(self, claims: dict, now: float):
+        if claims.get("aud") != self.project_id:
+            raise TokenVerificationError("Token has an incorrect audience")
+        if claims.get("iss") != ISSUER_PREFIX + self.project_id:
+            raise TokenVerificationError("Token has an incorrect issuer")
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise TokenVerificationError("Token has an invalid subject")
+        exp, iat = claims.get("exp"), claims.get("iat")
+        # Both are required, as the Admin SDK requires them
+        if not _is_timestamp(exp):
+            raise TokenVerificationError("Token has no valid expiry time")
+        if not _is_timestamp(iat):
+            raise TokenVerificationError("Token has no valid issue time")
+        if exp < now - CLOCK_SKEW_SECONDS:
+            raise TokenVerificationError("Token expired")
+        if iat > now + CLOCK_SKEW_SECONDS:
+            raise TokenVerificationError("Token used before issue time")
+        if claims.get("auth_time", 0) > now + CLOCK_SKEW_SECONDS:
+            raise TokenVerificationError("Token has an invalid auth time")
+
+    async def verify(self, id_token: str) -> dict:
+        if not id_token or not isinstance(id_token, str):
+            raise TokenVerificationError("ID token must be a non-empty string")
+
+        cache_key = hashlib.sha256(id_token.encode()).digest()
+        cached = self.verified.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        try:
+            header_segment, payload_segment, signature_segment = id_token.split(".")
+            header = json.loads(_b64decode(header_segment))
+            claims = json.loads(_b64decode(payload_segment))
+            signature = _b64decode(signature_segment)
+        except ValueError:
+            raise TokenVerificationError("Malformed ID token")
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise TokenVerificationError("Malformed ID token")
+
+        if header.get("alg") != "RS256":
+            raise TokenVerificationError("Token has an incorrect algorithm")
+        kid = header.get("kid")
+        keys = await self.key_source.get_keys()
+        if kid not in keys:
+            # Keys may have rotated since they were cached
+            keys = await self.key_source.get_keys(refresh=True)
+        if kid not in keys:
+            raise TokenVerificationError("Token signed by an unknown key")
+
+        now = time.time()
+        self._check_claims(claims, now)
+        signing_input = f"{header_segment}.{payload_segment}".encode()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._check_signature, keys[kid], signing_input, signature)
+
+        claims["uid"] = claims["sub"]
+        self.verified.set(cache_key, claims, ttl=min(VERIFIED_TOKEN_TTL, claims["exp"] - now))
+        return dict(claims)
+
+
+token_verifier = FirebaseTokenVerifier(_load_project_id())
 
-try:
-    firebase_app = firebase_admin.get_app()
-except ValueError:
-    firebase_app = firebase_admin.initialize_app(cred)
 
-def verify_firebase_token(id_token: str):
+async def verify_firebase_token(id_token: str):
     """Verify Firebase ID token and return decoded token"""
     try:
-        decoded_token = auth.verify_id_token(id_token)
-        return decoded_token
+        return await token_verifier.verify(id_token)
     except Exception as e:
         raise Exception(f"Token verification failed: {str(e)}")
@@ -0,0 +1,204 @@
+"""Generate large synthetic directories for load and performance testing.
+
+Profiles are synthesized from the seed ``demo_data``: its profile types,
+activities, countries, cities, names and tags are recombined, with a Zipf-like
+skew so a few cities and tags dominate as they do in production. All users
+share one password, hashed once. Batches are generated on a process pool
+(building the search terms dominates) and written with unordered
+``insert_many`` calls while the next ones are generated; the indexes are
+built once the data is loaded. A given seed always produces the same data.
+
+    python generate_data.py --profiles 100000
+    python generate_data.py --profiles 1000000 --skew 1.2 --batch-size 10000 --drop
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import unicodedata
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from indexes import ensure_indexes
+from geo import geo_document
+from search import search_document
+from seed_data import client, db, demo_data, pwd_context
+from stats import PlatformStats
+
+
+def _ascii(value: str) -> str:
+    return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().lower().replace(" ", "")
+
+
+def _zipf_weights(count: int, skew: float) -> List[float]:
+    """Weight of the n-th most popular value; skew 0 is uniform"""
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+class ProfileGenerator:
+    def __init__(self, skew: float = 1.0, password_hash: str = ""):
+        self.random = random.Random()
+        self.password_hash = password_hash
+        profiles = [data["entrepreneur"] for data in demo_data]
+
+        # Ties broken by name: set order changes between processes
+        self.types = sorted({p["profileType"] for p in profiles}, key=lambda t: (-sum(p["profileType"] == t for p in profiles), t))
+        self.type_weights = _zipf_weights(len(self.types), skew)
+        self.templates: Dict[str, List[dict]] = {t: [p for p in profiles if p["profileType"] == t] for t in self.types}
+
+        self.places: List[Tuple[str, str]] = list(dict.fromkeys((p["location"], p["city"]) for p in profiles))
+        self.place_weights = _zipf_weights(len(self.places), skew)
+
+        tag_counts: Dict[str, int] = {}
+        for p in profiles:
+            for tag in p["tags"]:
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        self.tags = sorted(tag_counts, key=lambda t: -tag_counts[t])
+        self.tag_weights = _zipf_weights(len(self.tags), skew)
+
+        self.first_names = sorted({data["user"]["firstName"] for data in demo_data})
+        self.last_names = sorted({data["user"]["lastName"] for data in demo_data})
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.since = today - timedelta(days=730)
+
+    def _pick(self, values: Sequence, weights: Sequence[float]):
+        return self.random.choices(values, weights)[0]
+
+    def generate(self, index: int) -> Tuple[dict, dict]:
+        rnd = self.random
+        profile_type = self._pick(self.types, self.type_weights)
+        template = rnd.choice(self.templates[profile_type])
+        location, city = self._pick(self.places, self.place_weights)
+        first_name, last_name = rnd.choice(self.first_names), rnd.choice(self.last_names)
+        email = f"{_ascii(first_name)}.{_ascii(last_name)}.{index}@example.com"
+
+        tags = list(template["tags"][:rnd.randint(2, len(template["tags"]))])
+        for tag in rnd.choices(self.tags, self.tag_weights, k=rnd.randint(0, 3)):
+            if tag not in tags:
+                tags.append(tag)
+        # The API accepts at most 5 tags per profile
+        tags = tags[:5]
+
+        created = self.since + timedelta(seconds=rnd.randint(0, 730 * 86400))
+        user_id = str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+        user = {
+            "id": user_id,
+            "email": email,
+            "password": self.password_hash,
+            "firstName": first_name,
+            "lastName": last_name,
+            "googleId": None,
+            "hasProfile": True,
+            "createdAt": created,
+        }
+        company = template.get("companyName")
+        profile = {
+            **template,
+            "id": str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+            "userId": user_id,
+            "firstName": first_name,
+            "lastName": last_name,
+            "companyName": f"{company} {city}" if company else company,
+            "tags": tags,
+            "email": email,
+            "location": location,
+            "city": city,
+            "rating": round(min(5.0, max(1.0, rnd.gauss(4.3, 0.5))), 1),
+            "reviewCount": int(rnd.expovariate(1 / 15)),
+            "isPremium": rnd.random() < 0.1,
+            "createdAt": created,
+            "updatedAt": created + timedelta(seconds=rnd.randint(0, 90 * 86400)),
+        }
+        profile.update(search_document(profile))
+        profile.update(geo_document(profile))
+        if profile["point"]:
+            # Spread profiles over a few km around the city centre
+            longitude, latitude = profile["point"]["coordinates"]
+            profile["point"]["coordinates"] = [round(longitude + rnd.gauss(0, 0.04), 5),
+                                               round(latitude + rnd.gauss(0, 0.04), 5)]
+        return user, profile
+
+    def batch(self, start: int, end: int, seed: int) -> Tuple[List[dict], List[dict]]:
+        # Seeded per batch, so the output does not depend on which worker ran it
+        self.random.seed(f"{seed}:{start}")
+        pairs = [self.generate(i) for i in range(start, end)]
+        return [user for user, _ in pairs], [profile for _, profile in pairs]
+
+
+_generator: Optional[ProfileGenerator] = None
+
+
+def _init_worker(skew: float, password_hash: str):
+    global _generator
+    _generator = ProfileGenerator(skew=skew, password_hash=password_hash)
+
+
+def _generate_batch(start: int, end: int, seed: int) -> Tuple[List[dict], List[dict]]:
+    return _generator.batch(start, end, seed)
+
+
+async def load(pool: ProcessPoolExecutor, total: int, batch_size: int, concurrency: int, seed: int) -> int:
+    loop = asyncio.get_running_loop()
+    starts = iter(range(0, total, batch_size))
+    started = time.perf_counter()
+    written = 0
+
+    async def worker():
+        nonlocal written
+        # Workers share the iterator: each takes the next batch when it is done
+        for start in starts:
+            users, profiles = await loop.run_in_executor(pool, _generate_batch, start, min(start + batch_size, total), seed)
+            await db.users.insert_many(users, ordered=False)
+            await db.entrepreneurs.insert_many(profiles, ordered=False)
+            written += len(profiles)
+            print(f"   {written:,}/{total:,} profiles ({written / (time.perf_counter() - started):,.0f} rows/s)", end="\r")
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    print()
+    return written
+
+
+async def main(args) -> int:
+    try:
+        if args.drop:
+            print("🗑️  Dropping users and entrepreneurs")
+            await db.users.drop()
+            await db.entrepreneurs.drop()
+        elif await db.entrepreneurs.estimated_document_count():
+            print("⚠️  Appending to existing data; existing indexes slow the load down (use --drop)")
+
+        password_hash = pwd_context.hash(args.password)
+
+        print(f"🌱 Generating {args.profiles:,} profiles (skew {args.skew}, {args.workers} workers)")
+        started = time.perf_counter()
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.skew, password_hash)) as pool:
+            written = await load(pool, args.profiles, args.batch_size, args.concurrency or args.workers + 1, args.seed)
+        load_time = time.perf_counter() - started
+        print(f"✅ Loaded {written:,} users and profiles in {load_time:.1f}s ({written / load_time:,.0f} rows/s)")
+
+        started = time.perf_counter()
+        await ensure_indexes(db)
+        print(f"✅ Built indexes in {time.perf_counter() - started:.1f}s")
+
+        totals = await PlatformStats(db).rebuild()
+        print(f"📊 {totals}")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generator processes")
+    parser.add_argument("--concurrency", type=int, default=0, help="batches in flight (default: workers + 1)")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent for cities, types and tags (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for reproducible datasets")
+    parser.add_argument("--password", default="demo123", help="password of every generated user")
+    parser.add_argument("--drop", action="store_true", help="drop users and entrepreneurs first")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,224 @@
+"""Offline geocoding of profile cities and proximity queries.
+
+Profiles carry a country code (``location``) and a free-text ``city``. The
+bundled gazetteer below maps the cities of the markets we serve to their
+coordinates; no external geocoding service is ever called. Every profile
+gets a derived ``point`` field, a GeoJSON Point (or null for cities missing
+from the gazetteer), backed by a 2dsphere index so "near me" is an index
+walk ordered by distance.
+
+City names are matched accent- and punctuation-insensitively: "Thiès",
+"thies" and "THIES" resolve to the same place.
+
+Every write path sets the point, so only documents written before it
+existed lack one. ``backfill_pending_points`` fills them in once and marks
+the backfill done in the ``migrations`` collection, like the date migration;
+later startups only read that marker.
+"""
+import math
+import re
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from search import fold
+
+# Country code -> city -> (latitude, longitude)
+GAZETTEER: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "SN": {
+        "Dakar": (14.7167, -17.4677),
+        "Pikine": (14.7549, -17.3900),
+        "Guédiawaye": (14.7833, -17.4000),
+        "Rufisque": (14.7153, -17.2733),
+        "Thiès": (14.7910, -16.9359),
+        "Mbour": (14.4200, -16.9600),
+        "Saint-Louis": (16.0179, -16.4896),
+        "Louga": (15.6144, -16.2286),
+        "Diourbel": (14.6550, -16.2314),
+        "Touba": (14.8500, -15.8833),
+        "Kaolack": (14.1652, -16.0726),
+        "Ziguinchor": (12.5681, -16.2719),
+        "Kolda": (12.8939, -14.9406),
+        "Tambacounda": (13.7707, -13.6673),
+    },
+    "GH": {
+        "Accra": (5.6037, -0.1870),
+        "Tema": (5.6698, -0.0166),
+        "Kumasi": (6.6885, -1.6244),
+        "Tamale": (9.4008, -0.8393),
+        "Takoradi": (4.8845, -1.7554),
+        "Cape Coast": (5.1053, -1.2466),
+        "Koforidua": (6.0940, -0.2591),
+        "Sunyani": (7.3399, -2.3268),
+        "Ho": (6.6008, 0.4713),
+        "Bolgatanga": (10.7856, -0.8514),
+    },
+    "CI": {
+        "Abidjan": (5.3600, -4.0083),
+        "Bouaké": (7.6906, -5.0303),
+        "Yamoussoukro": (6.8276, -5.2893),
+        "San-Pédro": (4.7485, -6.6363),
+        "Daloa": (6.8774, -6.4502),
+        "Korhogo": (9.4580, -5.6296),
+        "Man": (7.4125, -7.5538),
+        "Gagnoa": (6.1319, -5.9506),
+    },
+    "ML": {
+        "Bamako": (12.6392, -8.0029),
+        "Sikasso": (11.3176, -5.6665),
+        "Koutiala": (12.3917, -5.4642),
+        "Ségou": (13.4317, -6.2157),
+        "Mopti": (14.4843, -4.1827),
+        "Kayes": (14.4469, -11.4445),
+        "Tombouctou": (16.7666, -3.0026),
+        "Gao": (16.2717, -0.0447),
+    },
+    "BF": {
+        "Ouagadougou": (12.3714, -1.5197),
+        "Bobo-Dioulasso": (11.1771, -4.2979),
+        "Koudougou": (12.2526, -2.3627),
+        "Ouahigouya": (13.5828, -2.4216),
+        "Banfora": (10.6333, -4.7667),
+        "Kaya": (13.0917, -1.0844),
+    },
+    "BJ": {
+        "Cotonou": (6.3703, 2.3912),
+        "Abomey-Calavi": (6.4485, 2.3557),
+        "Porto-Novo": (6.4969, 2.6289),
+        "Bohicon": (7.1782, 2.0667),
+        "Parakou": (9.3372, 2.6303),
+        "Djougou": (9.7085, 1.6660),
+        "Natitingou": (10.3042, 1.3796),
+    },
+    "TG": {
+        "Lomé": (6.1319, 1.2228),
+        "Tsévié": (6.4261, 1.2133),
+        "Kpalimé": (6.9000, 0.6333),
+        "Atakpamé": (7.5333, 1.1333),
+        "Sokodé": (8.9833, 1.1333),
+        "Kara": (9.5511, 1.1861),
+    },
+    "NE": {
+        "Niamey": (13.5116, 2.1254),
+        "Dosso": (13.0490, 3.1937),
+        "Maradi": (13.5000, 7.1017),
+        "Zinder": (13.8053, 8.9881),
+        "Tahoua": (14.8888, 5.2692),
+        "Agadez": (16.9733, 7.9911),
+    },
+    "NG": {
+        "Lagos": (6.5244, 3.3792),
+        "Ibadan": (7.3775, 3.9470),
+        "Abeokuta": (7.1475, 3.3619),
+        "Ilorin": (8.4966, 4.5421),
+        "Benin City": (6.3350, 5.6037),
+        "Onitsha": (6.1413, 6.8029),
+        "Enugu": (6.4584, 7.5464),
+        "Port Harcourt": (4.8156, 7.0498),
+        "Calabar": (4.9757, 8.3417),
+        "Abuja": (9.0765, 7.3986),
+        "Kaduna": (10.5105, 7.4165),
+        "Jos": (9.8965, 8.8583),
+        "Kano": (12.0022, 8.5920),
+    },
+}
+
+# Derived field holding the GeoJSON point
+POINT_FIELD = "point"
+
+# Completion marker of the backfill in the migrations collection
+POINTS_MIGRATION_ID = "points:entrepreneurs"
+
+# Projection removing the derived point from API responses
+GEO_PROJECTION = {POINT_FIELD: 0}
+
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = 1000
+
+_KEY_RE = re.compile(r"[^a-z0-9]+")
+
+
+def _key(name: str) -> str:
+    return _KEY_RE.sub("", fold(name))
+
+
+# Folded city name -> coordinates, per country and across all countries
+_BY_COUNTRY: Dict[str, Dict[str, Tuple[float, float]]] = {
+    country: {_key(city): coords for city, coords in cities.items()}
+    for country, cities in GAZETTEER.items()
+}
+_ANY_COUNTRY: Dict[str, Tuple[float, float]] = {}
+for _cities in _BY_COUNTRY.values():
+    for _city, _coords in _cities.items():
+        _ANY_COUNTRY.setdefault(_city, _coords)
+
+
+def geocode(city: Optional[str], country: Optional[str] = None) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of a gazetteer city, within country when given"""
+    if not city:
+        return None
+    if country:
+        return _BY_COUNTRY.get(country.upper(), {}).get(_key(city))
+    return _ANY_COUNTRY.get(_key(city))
+
+
+def point(latitude: float, longitude: float) -> dict:
+    """GeoJSON coordinates are longitude first"""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def geo_document(doc: dict) -> dict:
+    """Build the derived point of an entrepreneur document"""
+    coords = geocode(doc.get("city"), doc.get("location"))
+    return {POINT_FIELD: point(*coords) if coords else None}
+
+
+def valid_coordinates(latitude: float, longitude: float) -> bool:
+    return -90 <= latitude <= 90 and -180 <= longitude <= 180 and not (math.isnan(latitude) or math.isnan(longitude))
+
+
+def near_stage(latitude: float, longitude: float, radius_km: float, query: dict) -> dict:
+    """$geoNear stage: profiles within radius_km matching query, nearest first, with distanceKm"""
+    return {"$geoNear": {
+        "near": point(latitude, longitude),
+        "key": POINT_FIELD,
+        "distanceField": "distanceKm",
+        "distanceMultiplier": 0.001,
+        "maxDistance": radius_km * 1000,
+        "query": query,
+        "spherical": True,
+    }}
+
+
+async def backfill_points(collection, batch_size: int = 500) -> int:
+    """Populate the point of documents written before it existed."""
+    projection = {"_id": 1, "city": 1, "location": 1}
+    cursor = collection.find({POINT_FIELD: {"$exists": False}}, projection)
+
+    updated = 0
+    batch = []
+    async for doc in cursor:
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": geo_document(doc)}))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+
+    return updated
+
+
+async def backfill_pending_points(db, batch_size: int = 500) -> int:
+    """Run backfill_points on the entrepreneurs unless already marked done"""
+    if await db.migrations.find_one({"_id": POINTS_MIGRATION_ID, "done": True}, {"_id": 1}):
+        return 0
+    updated = await backfill_points(db.entrepreneurs, batch_size)
+    await db.migrations.update_one(
+        {"_id": POINTS_MIGRATION_ID},
+        {"$set": {"done": True, "migrated": updated, "updatedAt": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    return updated
@@ -0,0 +1,136 @@
+"""Responsive variants (thumbnails) for stored images.
+
+Each source image is decoded once, re-encoded to WebP and JPEG at a few fixed
+widths with its metadata stripped, and the resulting files go back into the
+media store. Variant sets are recorded in ``media_variants`` under the source
+hash, so an image shared by several profiles is only processed once.
+
+Decoding and encoding run in a process pool to keep CPU work off the event
+loop.
+"""
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from media import InvalidImage, media_digest, media_url
+
+
+VARIANT_WIDTHS = tuple(int(w) for w in os.environ.get('IMAGE_VARIANT_WIDTHS', '96,192,384').split(','))
+# Logos in the directory grid are 96 CSS px wide; 192 covers 2x screens
+THUMBNAIL_WIDTH = int(os.environ.get('IMAGE_THUMBNAIL_WIDTH', 192))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+IMAGE_QUALITY = 80
+MAX_IMAGE_PIXELS = 40_000_000
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """JPEG has no alpha channel: composite onto white"""
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.split()[3])
+    return background
+
+
+def render_variants(data: bytes, widths: Tuple[int, ...]) -> List[Tuple[int, str, bytes]]:
+    """Decode an image and re-encode it at each width, as (width, format, bytes).
+
+    Runs in a worker process. Images are never upscaled and no metadata
+    (EXIF, ICC, comments) is carried over.
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source)
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            image = image.convert("RGBA" if has_alpha else "RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"Could not decode image: {str(e)}")
+
+    variants = []
+    for width in sorted({min(w, image.width) for w in widths}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+        webp = io.BytesIO()
+        resized.save(webp, "WEBP", quality=IMAGE_QUALITY, method=4)
+        variants.append((width, "webp", webp.getvalue()))
+
+        jpeg = io.BytesIO()
+        _flatten(resized).save(jpeg, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+        variants.append((width, "jpeg", jpeg.getvalue()))
+    return variants
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _image_set(variants: List[dict]) -> dict:
+    """Thumbnail, srcset and variant list for a set of stored variants"""
+    webp = sorted((v for v in variants if v["format"] == "webp"), key=lambda v: v["width"])
+    suitable = [v for v in webp if v["width"] >= THUMBNAIL_WIDTH]
+    thumbnail = suitable[0] if suitable else webp[-1]
+    return {
+        "thumbnail": thumbnail["url"],
+        "srcset": ", ".join(f"{v['url']} {v['width']}w" for v in webp),
+        "variants": variants,
+    }
+
+
+async def image_variants(store, db, digest: str, base_url: str = "") -> Optional[dict]:
+    """Variant set of a stored image, generating it on first use"""
+    cached = await db.media_variants.find_one({"_id": digest}, {"variants": 1})
+    if cached is not None:
+        return _image_set(cached["variants"])
+
+    info = await store.stat(digest)
+    if info is None:
+        return None
+    data = b"".join([chunk async for chunk in store.iter_range(digest, 0, info.size - 1)])
+
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(_get_executor(), render_variants, data, VARIANT_WIDTHS)
+
+    variants = []
+    for width, fmt, content in rendered:
+        stored = await store.save(content)
+        variants.append({"url": media_url(stored.digest, base_url), "width": width, "format": fmt})
+
+    await db.media_variants.update_one({"_id": digest}, {"$set": {"variants": variants}}, upsert=True)
+    return _image_set(variants)
+
+
+async def apply_image_variants(store, db, profile: dict, base_url: str = "") -> dict:
+    """Attach thumbnails and srcsets to a profile whose images are media URLs.
+
+    External URLs get no variants, so stale ones are cleared on update.
+    """
+    logo_digest = media_digest(profile.get('logo') or "")
+    logo_set = await image_variants(store, db, logo_digest, base_url) if logo_digest else None
+    profile['logoThumbnail'] = logo_set["thumbnail"] if logo_set else None
+    profile['logoSrcset'] = logo_set["srcset"] if logo_set else None
+    profile['logoVariants'] = logo_set["variants"] if logo_set else []
+
+    for item in profile.get('portfolio') or []:
+        digest = media_digest(item.get('value') or "") if item.get('type') == "image" else None
+        item_set = await image_variants(store, db, digest, base_url) if digest else None
+        item['thumbnail'] = item_set["thumbnail"] if item_set else None
+        item['srcset'] = item_set["srcset"] if item_set else None
+    return profile
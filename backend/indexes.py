@@ -0,0 +1,219 @@
+"""Index declarations for every hot query path, reconciled at startup.
+
+Run as a script to reconcile manually, or with ``--check`` to explain the
+canonical directory queries and fail if any of them falls back to a COLLSCAN:
+
+    python indexes.py
+    python indexes.py --check
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # Pending invites of imported accounts
+        IndexModel([("inviteTokenHash", ASCENDING)], name="inviteTokenHash_unique", unique=True, sparse=True),
+    ],
+    "entrepreneurs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("userId", ASCENDING)], name="userId_unique", unique=True),
+        # Directory filters + sort, with id as the keyset tie-breaker
+        IndexModel([("createdAt", DESCENDING), ("id", DESCENDING)], name="createdAt"),
+        IndexModel([("rating", DESCENDING), ("id", DESCENDING)], name="rating"),
+        IndexModel(
+            [("location", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)],
+            name="location_createdAt",
+        ),
+        IndexModel(
+            [("location", ASCENDING), ("city", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)],
+            name="location_city_createdAt",
+        ),
+        IndexModel(
+            [("profileType", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)],
+            name="profileType_createdAt",
+        ),
+        IndexModel(
+            [("tags", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)],
+            name="tags_createdAt",
+        ),
+        IndexModel([("searchTerms", ASCENDING)], name="searchTerms"),
+        # Full and incremental exports
+        IndexModel([("updatedAt", ASCENDING), ("id", ASCENDING)], name="updatedAt_id"),
+        # Proximity search; profiles without a point are left out of the index
+        IndexModel([("point", GEOSPHERE)], name="point_2dsphere"),
+    ],
+    "profile_stats_hourly": [
+        # Target of the analytics $inc upserts
+        IndexModel([("profileId", ASCENDING), ("hour", DESCENDING)], name="profileId_hour_unique", unique=True),
+    ],
+}
+
+BY_DATE = [("createdAt", DESCENDING), ("id", DESCENDING)]
+BY_RATING = [("rating", DESCENDING), ("id", DESCENDING)]
+
+# (collection, filter, sort) triples mirroring the queries issued by server.py
+CANONICAL_QUERIES: List[Tuple[str, dict, list]] = [
+    ("users", {"id": "probe"}, []),
+    ("users", {"email": "probe@example.com"}, []),
+    ("users", {"inviteTokenHash": "probe"}, []),
+    ("entrepreneurs", {"id": "probe"}, []),
+    ("entrepreneurs", {"userId": "probe"}, []),
+    ("entrepreneurs", {}, BY_DATE),
+    ("entrepreneurs", {}, BY_RATING),
+    ("entrepreneurs", {"location": "SN"}, BY_DATE),
+    ("entrepreneurs", {"location": "SN", "city": "Dakar"}, BY_DATE),
+    ("entrepreneurs", {"profileType": "freelance"}, BY_DATE),
+    ("entrepreneurs", {"tags": {"$in": ["Design"]}}, BY_DATE),
+    ("entrepreneurs", {"rating": {"$gte": 4.0}}, BY_RATING),
+    ("entrepreneurs", {"searchTerms": {"$all": ["dev"]}}, BY_DATE),
+    ("entrepreneurs", {"point": {"$nearSphere": {
+        "$geometry": {"type": "Point", "coordinates": [-17.4677, 14.7167]}, "$maxDistance": 50000,
+    }}}, []),
+    # Keyset page after a cursor
+    ("entrepreneurs", {"$or": [{"createdAt": {"$lt": "probe"}}, {"createdAt": "probe", "id": {"$lt": "probe"}}]}, BY_DATE),
+    ("entrepreneurs", {"updatedAt": {"$gte": "probe"}}, [("updatedAt", ASCENDING), ("id", ASCENDING)]),
+    ("profile_stats_hourly", {"profileId": "probe", "hour": "probe"}, []),
+]
+
+# Options compared when deciding whether an existing index matches its declaration
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "2dsphereIndexVersion", "partialFilterExpression")
+
+
+def _spec_matches(existing: dict, declared: dict) -> bool:
+    if list(existing["key"].items()) != list(declared["key"].items()):
+        return False
+    return all(existing.get(opt) == declared.get(opt) for opt in _COMPARED_OPTIONS)
+
+
+class MissingUniqueIndexes(Exception):
+    """Unique indexes could not be built; the writes relying on them are unsafe"""
+
+    def __init__(self, names: List[str]):
+        super().__init__(f"Unique indexes missing: {', '.join(names)}")
+        self.names = names
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create missing indexes and rebuild those whose definition changed.
+
+    Indexes that are not declared here are left untouched. Each index is
+    reconciled on its own, so one failure (a duplicate in a unique field, a
+    conflicting definition) does not leave the others unbuilt. Failures are
+    logged; if a unique index is among them, MissingUniqueIndexes is raised
+    once every index has been tried. Returns the names of the indexes
+    created per collection.
+    """
+    created: Dict[str, List[str]] = {}
+    missing_unique: List[str] = []
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = {}
+        try:
+            async for info in collection.list_indexes():
+                existing[info["name"]] = info
+        except OperationFailure:
+            # Collection does not exist yet
+            pass
+
+        for model in models:
+            declared = model.document
+            name = declared["name"]
+            current = existing.get(name)
+            if current is not None and _spec_matches(current, declared):
+                continue
+            try:
+                if current is not None:
+                    logger.info(f"Rebuilding index {collection_name}.{name}")
+                    await collection.drop_index(name)
+                await collection.create_indexes([model])
+            except Exception as e:
+                logger.error(f"Could not build index {collection_name}.{name}: {str(e)}")
+                if declared.get("unique"):
+                    missing_unique.append(f"{collection_name}.{name}")
+                continue
+            created.setdefault(collection_name, []).append(name)
+
+        if collection_name in created:
+            logger.info(f"Created indexes on {collection_name}: {', '.join(created[collection_name])}")
+
+    if missing_unique:
+        raise MissingUniqueIndexes(missing_unique)
+    return created
+
+
+def _plan_stages(plan) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def check_query_plans(db) -> List[str]:
+    """Explain every canonical query and return a description of each COLLSCAN."""
+    failures = []
+    for collection_name, query, sort in CANONICAL_QUERIES:
+        cursor = db[collection_name].find(query).limit(50)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        if "COLLSCAN" in stages:
+            failures.append(f"{collection_name} {query} sort={sort}: COLLSCAN")
+    return failures
+
+
+async def main(check: bool) -> int:
+    root_dir = Path(__file__).parent
+    load_dotenv(root_dir / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'nexus_connect')]
+
+    try:
+        if not check:
+            try:
+                created = await ensure_indexes(db)
+            except MissingUniqueIndexes as e:
+                print(f"❌ {str(e)}")
+                return 1
+            total = sum(len(names) for names in created.values())
+            print(f"✅ Indexes reconciled ({total} created)")
+            return 0
+
+        failures = await check_query_plans(db)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            return 1
+        print(f"✅ {len(CANONICAL_QUERIES)} canonical queries use an index")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="fail if a canonical query does a COLLSCAN")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(args.check)))
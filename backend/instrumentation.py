@@ -0,0 +1,297 @@
+"""Per-request timing breakdown, Server-Timing headers and a sampling profiler.
+
+Each request gets a ``RequestTimings`` in a context variable. Phases are
+recorded into it by:
+
+- ``InstrumentedRoute`` (the route class of the API router): ``validation``
+  is FastAPI's request parsing and validation, including dependencies but
+  not ``auth``; ``handler`` is the endpoint itself; ``encoding`` is what
+  FastAPI does with the returned value (response model validation and JSON
+  encoding), which is nothing for handlers returning bytes
+- ``timed(phase)`` blocks in application code: ``auth`` around
+  ``get_current_user``, ``validation``/``encoding`` where handlers validate
+  and encode responses themselves (those run inside ``handler``)
+- ``MongoCommandTimer``, a pymongo command listener: ``mongo`` is the summed
+  duration of the commands sent for the request. Motor runs them on its
+  executor with a copy of the caller's context, so they are attributed to
+  the request that issued them. Concurrent commands can add up to more than
+  the wall time.
+
+``InstrumentationMiddleware`` exports the phases as ``Server-Timing``
+(``SERVER_TIMING=0`` disables the header) and as the
+``http_request_phase_seconds`` histograms on ``/api/metrics`` (which requires
+one of the ``METRICS_API_KEYS``).
+
+Profiling is opt-in. A request is profiled when it carries
+``X-Profile: <PROFILE_TOKEN>`` (only if a token is configured) or is drawn at
+``PROFILE_SAMPLE_RATE``. While it runs, a thread samples the event loop's
+stack every ``PROFILE_INTERVAL_MS``; requests slower than
+``PROFILE_SLOW_MS`` (or requested by header) are written to ``PROFILE_DIR`` in
+the folded format read by flamegraph.pl and speedscope. The loop serves other
+requests meanwhile, so their frames show up too; one request is profiled at a
+time.
+"""
+import asyncio
+import collections
+import contextvars
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'X-Profile').lower().encode()
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 500))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles'))
+
+REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", ["method", "route", "status"]
+)
+PHASE_DURATION = metrics.histogram(
+    "http_request_phase_seconds", "Time spent in each phase of a request", ["route", "phase"]
+)
+MONGO_COMMAND_DURATION = metrics.histogram(
+    "mongo_command_duration_seconds", "Duration of MongoDB commands", ["command"]
+)
+MONGO_COMMAND_FAILURES = metrics.counter("mongo_command_failures_total", "MongoDB commands that failed", ["command"])
+PROFILES_WRITTEN = metrics.counter("profiles_written_total", "Request profiles written to disk")
+
+# Order of the Server-Timing entries
+PHASES = ("auth", "validation", "handler", "mongo", "encoding")
+
+
+class RequestTimings:
+    __slots__ = ("phases", "mongo_commands", "route", "endpoint_started", "endpoint_finished", "_lock")
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.mongo_commands = 0
+        self.route: Optional[str] = None
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+        # Mongo events arrive from Motor's executor threads
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_command(self, seconds: float):
+        with self._lock:
+            self.phases["mongo"] = self.phases.get("mongo", 0.0) + seconds
+            self.mongo_commands += 1
+
+    def server_timing(self, total: float) -> str:
+        entries = []
+        for phase in PHASES:
+            if phase in self.phases:
+                entry = f"{phase};dur={self.phases[phase] * 1000:.2f}"
+                if phase == "mongo":
+                    entry += f';desc="{self.mongo_commands} command{"" if self.mongo_commands == 1 else "s"}"'
+                entries.append(entry)
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the duration of the block to a phase of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_DURATION.observe(seconds, command=event.command_name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_command(seconds)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_DURATION.observe(seconds, command=event.command_name)
+        MONGO_COMMAND_FAILURES.inc(command=event.command_name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_command(seconds)
+
+
+class InstrumentedRoute(APIRoute):
+    """Splits the time FastAPI spends around the endpoint into phases"""
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call) and not getattr(call, "_instrumented", False):
+            async def endpoint(*args, **kwargs):
+                timings = _current.get()
+                if timings is None:
+                    return await call(*args, **kwargs)
+                timings.endpoint_started = time.perf_counter()
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    timings.endpoint_finished = time.perf_counter()
+
+            # The request handler calls dependant.call when a request comes in
+            endpoint._instrumented = True
+            self.dependant.call = endpoint
+        handler = super().get_route_handler()
+
+        async def instrumented(request):
+            timings = _current.get()
+            if timings is None:
+                return await handler(request)
+            timings.route = self.path_format
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                finished = time.perf_counter()
+                if timings.endpoint_started is not None:
+                    auth = timings.phases.get("auth", 0.0)
+                    timings.add("validation", max(0.0, timings.endpoint_started - started - auth))
+                    if timings.endpoint_finished is not None:
+                        timings.add("handler", timings.endpoint_finished - timings.endpoint_started)
+                        timings.add("encoding", finished - timings.endpoint_finished)
+
+        return instrumented
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: collections.Counter = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> collections.Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+_profiling = threading.Lock()
+
+
+def _profile_requested(scope) -> bool:
+    if PROFILE_TOKEN:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1") == PROFILE_TOKEN
+    return False
+
+
+def write_profile(stacks: collections.Counter, method: str, route: str, duration: float) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    path = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{slug}-{duration * 1000:.0f}ms.folded"
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+    PROFILES_WRITTEN.inc()
+    return path
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware timing each request and reporting its phases"""
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        requested = _profile_requested(scope)
+        sampler = None
+        if (requested or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)) and _profiling.acquire(blocking=False):
+            sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+            sampler.start()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = timings.server_timing(time.perf_counter() - started).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - started
+            _current.reset(token)
+            route = timings.route or "unmatched"
+            REQUEST_DURATION.observe(duration, method=scope["method"], route=route, status=str(status))
+            for phase, seconds in timings.phases.items():
+                PHASE_DURATION.observe(seconds, route=route, phase=phase)
+            if sampler is not None:
+                stacks = sampler.stop()
+                _profiling.release()
+                if stacks and (requested or duration * 1000 >= PROFILE_SLOW_MS):
+                    try:
+                        path = write_profile(stacks, scope["method"], route, duration)
+                        logger.info(f"Profiled {scope['method']} {route} ({duration * 1000:.0f} ms) to {path}")
+                    except OSError as e:
+                        logger.warning(f"Could not write profile: {str(e)}")
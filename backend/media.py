@@ -0,0 +1,322 @@
+"""Content-addressed image storage for logos and portfolio images.
+
+Images are stored once under the SHA-256 of their bytes, either on the local
+filesystem or in GridFS (``MEDIA_BACKEND=local|gridfs``), and profile
+documents only keep the ``/api/media/{hash}`` URL.
+
+Profiles written before the media store existed can be migrated (images
+moved and their responsive variants rendered) with:
+
+    python media.py migrate
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import UpdateOne
+
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MEDIA_BACKEND = os.environ.get('MEDIA_BACKEND', 'local')
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', ROOT_DIR / 'media'))
+MEDIA_BASE_URL = os.environ.get('MEDIA_BASE_URL', '')
+MAX_IMAGE_BYTES = int(os.environ.get('MAX_IMAGE_BYTES', 5 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+MEDIA_PATH = "/api/media/"
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URL_RE = re.compile(r"^data:(?P<type>[\w/+.-]+)?(?:;[\w=-]+)*;base64,(?P<data>.*)$", re.DOTALL)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+@dataclass
+class MediaInfo:
+    digest: str
+    size: int
+    content_type: str
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Detect the image type from its magic bytes; the client's claim is not trusted"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def is_digest(value: str) -> bool:
+    return bool(_DIGEST_RE.match(value))
+
+
+def validate_image(data: bytes) -> str:
+    if not data:
+        raise InvalidImage("Empty image")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise InvalidImage(f"Image exceeds {MAX_IMAGE_BYTES // (1024 * 1024)} MB")
+    content_type = sniff_content_type(data[:16])
+    if content_type is None:
+        raise InvalidImage("Unsupported image format (PNG, JPEG, GIF or WebP expected)")
+    return content_type
+
+
+def decode_inline_image(value: str) -> Optional[bytes]:
+    """Bytes of a data URL, or None when the value is a regular URL"""
+    match = _DATA_URL_RE.match(value)
+    if not match:
+        return None
+    try:
+        return base64.b64decode(match.group("data"), validate=False)
+    except (binascii.Error, ValueError):
+        raise InvalidImage("Invalid base64 image data")
+
+
+def media_url(digest: str, base_url: str = "") -> str:
+    return f"{(MEDIA_BASE_URL or base_url).rstrip('/')}{MEDIA_PATH}{digest}"
+
+
+def media_digest(url: str) -> Optional[str]:
+    """Hash referenced by a media URL, or None for any other URL"""
+    _, found, digest = url.rpartition(MEDIA_PATH)
+    if found and is_digest(digest):
+        return digest
+    return None
+
+
+class LocalMediaStore:
+    """Media files sharded by the first two hex characters of their hash"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _write(self, digest: str, data: bytes):
+        path = self._path(digest)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _stat(self, digest: str) -> Optional[MediaInfo]:
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                head = f.read(16)
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        return MediaInfo(digest, size, sniff_content_type(head) or "application/octet-stream")
+
+    def _read(self, digest: str, offset: int, length: int) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    async def save(self, data: bytes) -> MediaInfo:
+        content_type = validate_image(data)
+        digest = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._write, digest, data)
+        return MediaInfo(digest, len(data), content_type)
+
+    async def stat(self, digest: str) -> Optional[MediaInfo]:
+        return await asyncio.to_thread(self._stat, digest)
+
+    async def iter_range(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes start..end (inclusive) in chunks"""
+        offset = start
+        while offset <= end:
+            chunk = await asyncio.to_thread(self._read, digest, offset, min(CHUNK_SIZE, end - offset + 1))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+
+class GridFSMediaStore:
+    """Media files in a GridFS bucket, one file per hash"""
+
+    def __init__(self, db, bucket_name: str = "media"):
+        self.db = db
+        self.bucket_name = bucket_name
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        # Created lazily so the store can be built before the event loop runs
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(self.db, bucket_name=self.bucket_name)
+        return self._bucket
+
+    async def save(self, data: bytes) -> MediaInfo:
+        content_type = validate_image(data)
+        digest = hashlib.sha256(data).hexdigest()
+        if await self.stat(digest) is None:
+            await self.bucket.upload_from_stream(digest, data, metadata={"contentType": content_type})
+        return MediaInfo(digest, len(data), content_type)
+
+    async def stat(self, digest: str) -> Optional[MediaInfo]:
+        files = await self.db[f"{self.bucket_name}.files"].find_one({"filename": digest})
+        if files is None:
+            return None
+        content_type = (files.get("metadata") or {}).get("contentType", "application/octet-stream")
+        return MediaInfo(digest, files["length"], content_type)
+
+    async def iter_range(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        stream = await self.bucket.open_download_stream_by_name(digest)
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def create_media_store(db):
+    if MEDIA_BACKEND == "gridfs":
+        return GridFSMediaStore(db)
+    return LocalMediaStore(MEDIA_ROOT)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive offsets.
+
+    Returns None when there is no usable Range header (serve everything) and
+    raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def store_image_value(store, value: Optional[str], base_url: str = "") -> Optional[str]:
+    """Move an inline (data URL) image into the store and return its URL.
+
+    Regular URLs, including media URLs, are returned unchanged.
+    """
+    if not value:
+        return value
+    data = decode_inline_image(value)
+    if data is None:
+        return value
+    info = await store.save(data)
+    return media_url(info.digest, base_url)
+
+
+async def externalize_images(store, doc: dict, base_url: str = "") -> dict:
+    """Replace inline logo and portfolio images of a profile with media URLs"""
+    doc['logo'] = await store_image_value(store, doc.get('logo'), base_url)
+    for item in doc.get('portfolio') or []:
+        if item.get('type') == "image":
+            item['value'] = await store_image_value(store, item.get('value'), base_url)
+    return doc
+
+
+async def migrate_inline_images(db, store, batch_size: int = 100) -> int:
+    """Move inline images of existing profiles into the media store and
+    render their responsive variants.
+
+    Profiles whose media images have no variants yet, such as those migrated
+    before variants existed, get them too.
+    """
+    # Lazy: imaging imports this module
+    import imaging
+
+    media_value = {"$regex": f"{re.escape(MEDIA_PATH)}[0-9a-f]{{64}}$"}
+    query = {"$or": [
+        {"logo": {"$regex": "^data:"}},
+        {"portfolio.value": {"$regex": "^data:"}},
+        {"logo": media_value, "logoThumbnail": None},
+        {"portfolio": {"$elemMatch": {"type": "image", "value": media_value, "thumbnail": None}}},
+    ]}
+    cursor = db.entrepreneurs.find(query, {"_id": 1, "logo": 1, "portfolio": 1}, batch_size=batch_size)
+
+    migrated = 0
+    batch = []
+    async for doc in cursor:
+        try:
+            await externalize_images(store, doc)
+            await imaging.apply_image_variants(store, db, doc)
+        except (InvalidImage, imaging.InvalidImage) as e:
+            # Two classes when this module runs as a script
+            print(f"⚠️  Skipping profile {doc['_id']}: {str(e)}")
+            continue
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "logo": doc.get("logo"),
+            "logoThumbnail": doc["logoThumbnail"],
+            "logoSrcset": doc["logoSrcset"],
+            "logoVariants": doc["logoVariants"],
+            "portfolio": doc.get("portfolio", []),
+        }}))
+        if len(batch) >= batch_size:
+            await db.entrepreneurs.bulk_write(batch, ordered=False)
+            migrated += len(batch)
+            batch = []
+    if batch:
+        await db.entrepreneurs.bulk_write(batch, ordered=False)
+        migrated += len(batch)
+    return migrated
+
+
+async def main(command: str) -> int:
+    # Lazy: imaging imports this module
+    import imaging
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'nexus_connect')]
+    try:
+        if command != "migrate":
+            print("Usage: python media.py migrate")
+            return 2
+        if not MEDIA_BASE_URL:
+            print("❌ MEDIA_BASE_URL must be set so migrated images get absolute URLs")
+            return 1
+        migrated = await migrate_inline_images(db, create_media_store(db))
+        print(f"✅ Moved inline images of {migrated} profiles to the media store, with their variants")
+        return 0
+    finally:
+        imaging.shutdown()
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "")))
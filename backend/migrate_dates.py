@@ -0,0 +1,141 @@
+"""Convert timestamps stored as ISO strings to native BSON dates, in place.
+
+Documents are streamed in ``_id`` order and rewritten in batches of
+``bulk_write`` updates; only the current batch is held in memory. After each
+batch the last ``_id`` is checkpointed in the ``migrations`` collection, so
+an interrupted run resumes where it stopped. Each update only applies if the
+field still holds the string that was read, so it is safe to run while the
+API is serving writes (which store native dates already).
+
+Sorting, the keyset cursors and incremental exports compare dates by BSON
+type, so they are only correct once every timestamp is native. The API
+therefore runs ``migrate_pending`` at startup: collections whose migration is
+marked done are skipped, the others are converted (or resumed) before any
+request is served. The script is still useful to convert a large database
+ahead of a deploy.
+
+    python migrate_dates.py
+    python migrate_dates.py --batch-size 500 --restart
+    python migrate_dates.py --dry-run
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+# Collection -> timestamp fields written by the API
+DATE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "users": ("createdAt",),
+    "entrepreneurs": ("createdAt", "updatedAt"),
+    "contact_messages": ("createdAt",),
+}
+
+
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    # Strings without an offset were written from UTC clocks
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def migrate_collection(db, name: str, fields: Tuple[str, ...], batch_size: int = 1000,
+                             restart: bool = False, dry_run: bool = False) -> int:
+    """Convert the string timestamps of one collection; returns the documents converted by this run"""
+    checkpoint_id = f"dates:{name}"
+    checkpoint = None if restart else await db.migrations.find_one({"_id": checkpoint_id})
+
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    if checkpoint and checkpoint.get("lastId") is not None:
+        query["_id"] = {"$gt": checkpoint["lastId"]}
+    projection = {field: 1 for field in fields}
+    cursor = db[name].find(query, projection, batch_size=batch_size).sort("_id", 1)
+
+    # Documents converted by earlier, interrupted runs
+    previous = checkpoint.get("migrated", 0) if checkpoint else 0
+    migrated = 0
+    batch = []
+    last_id = None
+
+    async def write():
+        nonlocal migrated, batch
+        if not dry_run:
+            await db[name].bulk_write(batch, ordered=False)
+            await db.migrations.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"lastId": last_id, "migrated": previous + migrated + len(batch), "updatedAt": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        migrated += len(batch)
+        batch = []
+
+    async for doc in cursor:
+        last_id = doc["_id"]
+        changes = {}
+        for field in fields:
+            value = doc.get(field)
+            if not isinstance(value, str):
+                continue
+            try:
+                changes[field] = parse_timestamp(value)
+            except ValueError:
+                print(f"⚠️  {name} {doc['_id']}: unparseable {field} {value!r}")
+        if not changes:
+            continue
+        # Skip documents rewritten by the API since they were read
+        guard = {"_id": doc["_id"], **{field: doc[field] for field in changes}}
+        batch.append(UpdateOne(guard, {"$set": changes}))
+        if len(batch) >= batch_size:
+            await write()
+    if batch:
+        await write()
+
+    if not dry_run:
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"done": True, "migrated": previous + migrated, "updatedAt": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+    return migrated
+
+
+async def migrate_pending(db, batch_size: int = 1000) -> Dict[str, int]:
+    """Convert the collections not yet marked done; returns the documents converted per collection"""
+    done = {doc["_id"] async for doc in db.migrations.find({"done": True}, {"_id": 1})}
+    converted = {}
+    for name, fields in DATE_FIELDS.items():
+        if f"dates:{name}" not in done:
+            converted[name] = await migrate_collection(db, name, fields, batch_size)
+    return converted
+
+
+async def main(batch_size: int, restart: bool, dry_run: bool) -> int:
+    root_dir = Path(__file__).parent
+    load_dotenv(root_dir / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'nexus_connect')]
+    try:
+        for name, fields in DATE_FIELDS.items():
+            started = time.perf_counter()
+            migrated = await migrate_collection(db, name, fields, batch_size, restart, dry_run)
+            elapsed = time.perf_counter() - started
+            verb = "Would convert" if dry_run else "Converted"
+            print(f"✅ {name}: {verb} {migrated} documents in {elapsed:.1f}s")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoints and scan from the start")
+    parser.add_argument("--dry-run", action="store_true", help="count the documents to convert without writing")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.batch_size, args.restart, args.dry_run)))
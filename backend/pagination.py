@@ -0,0 +1,62 @@
+"""Opaque keyset cursors for the directory listing.
+
+A cursor encodes the (sort value, id) pair of the last item of a page, so
+the next page starts with an index seek instead of skipping documents, and
+does not shift when profiles are inserted concurrently.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+# Sort fields that support keyset pagination, with the type of their values.
+# Cursors come from clients: anything else (an operator object, a list)
+# must never reach the query.
+_SORT_VALUE_TYPES = {"createdAt": datetime, "rating": (int, float)}
+CURSOR_SORT_FIELDS = tuple(_SORT_VALUE_TYPES)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if list(value) != ["$date"] or not isinstance(value["$date"], str):
+            raise InvalidCursor("Malformed cursor")
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(sort_field: str, doc: dict) -> str:
+    payload = [sort_field, _encode_value(doc.get(sort_field)), doc["id"]]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort_field: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        field, value, last_id = json.loads(raw)
+        value = _decode_value(value)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if field != sort_field or sort_field not in _SORT_VALUE_TYPES or not isinstance(last_id, str):
+        raise InvalidCursor("Cursor does not match the requested sort")
+    if isinstance(value, bool) or not isinstance(value, _SORT_VALUE_TYPES[sort_field]):
+        raise InvalidCursor("Cursor does not match the requested sort")
+    return value, last_id
+
+
+def keyset_filter(sort_field: str, value: Any, last_id: str) -> dict:
+    """Documents strictly after (value, last_id) in descending (sort_field, id) order"""
+    return {"$or": [
+        {sort_field: {"$lt": value}},
+        {sort_field: value, "id": {"$lt": last_id}},
+    ]}
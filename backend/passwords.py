@@ -0,0 +1,92 @@
+"""Bcrypt hashing on a bounded worker pool, off the event loop.
+
+bcrypt releases the GIL while it works, so a small thread pool gives real
+parallelism without the start-up cost of a process pool. The number of
+in-flight jobs is capped: once the queue is full, new requests fail fast with
+``PasswordPoolBusy`` instead of piling up behind a login burst.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+import metrics
+
+
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_POOL_MAX_PENDING = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 64))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+QUEUE_DEPTH = metrics.gauge("password_pool_pending", "Password jobs queued or running")
+QUEUE_WAIT = metrics.histogram("password_pool_queue_wait_seconds", "Time password jobs wait for a worker")
+HASH_TIME = metrics.histogram("password_pool_work_seconds", "Time spent hashing or verifying a password", ["operation"])
+REJECTED = metrics.counter("password_pool_rejected_total", "Password jobs rejected because the pool was full")
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password pool is saturated")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext, max_workers: int, max_pending: int):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        self._pending = 0
+        # Released from the worker threads
+        self._lock = threading.Lock()
+
+    def _retry_after(self) -> int:
+        per_job = HASH_TIME.mean(operation="verify") or HASH_TIME.mean(operation="hash") or 0.25
+        return max(1, math.ceil(self._pending * per_job / self.max_workers))
+
+    async def _run(self, operation: str, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                REJECTED.inc()
+                raise PasswordPoolBusy(self._retry_after())
+            self._pending += 1
+            QUEUE_DEPTH.set(self._pending)
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            QUEUE_WAIT.observe(started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                HASH_TIME.observe(time.perf_counter() - started, operation=operation)
+
+        future = self._executor.submit(job)
+        # A job keeps its slot until the worker is done with it, even when the
+        # caller is cancelled (client disconnect) while bcrypt is running
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            QUEUE_DEPTH.set(self._pending)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", self.context.verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(pwd_context, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING)
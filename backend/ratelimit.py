@@ -0,0 +1,229 @@
+"""Per-route rate limits, enforced by an ASGI middleware before any handler runs.
+
+Each policy limits a route per client IP and, for authenticated requests, per
+user. Counters use the sliding window approximation: the count of the current
+fixed window plus the previous window's count weighted by how much of it still
+overlaps the sliding window. Every attempt counts, including rejected ones, so
+a client hammering a route stays blocked until it slows down.
+
+Stores (``RATE_LIMIT_BACKEND``):
+
+- ``memory`` (default): per-process dict sharded by key, pruned lazily. Each
+  worker enforces its own limits.
+- ``redis``: any client with the redis.asyncio interface (``incr``,
+  ``expire``, ``get``), shared by all workers. Tests can pass a local fake.
+- ``none``: rate limiting disabled.
+
+Per-IP limits key on the socket peer address by default. Behind a reverse
+proxy or load balancer every request then comes from the proxy, so set
+``RATE_LIMIT_PROXY_HOPS`` to the number of proxies that append to
+``X-Forwarded-For`` (1 for a single load balancer): the client address is
+taken that many entries from the right of the header. Only enable it when
+every request goes through those proxies, since a client reaching the API
+directly could otherwise pick its own address.
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_SHARDS = int(os.environ.get('RATE_LIMIT_SHARDS', 64))
+# Keys kept per shard before expired windows are pruned
+RATE_LIMIT_SHARD_SIZE = int(os.environ.get('RATE_LIMIT_SHARD_SIZE', 4096))
+# Trusted proxies in front of the API that append to X-Forwarded-For.
+# 0 (default) trusts no header and uses the socket peer address.
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_PROXY_HOPS', 0))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+RATE_LIMITED = metrics.counter("rate_limit_rejections_total", "Requests rejected by a rate limit", ["route", "scope"])
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    limit: int
+    window: int  # seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse ``"<requests>/<seconds>"``, e.g. ``"30/600"``"""
+        limit, _, window = value.partition("/")
+        return cls(int(limit), int(window or 60))
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    method: str
+    path: str  # Route template, e.g. /api/entrepreneurs/{entrepreneur_id}/contact
+    per_ip: Optional[RateLimit] = None
+    per_user: Optional[RateLimit] = None
+
+    def pattern(self) -> "re.Pattern":
+        return re.compile("^" + re.sub(r"\{[^}/]+\}", "[^/]+", self.path) + "$")
+
+
+def _estimate(previous: int, current: int, elapsed: float, window: int) -> float:
+    return previous * (1 - elapsed / window) + current
+
+
+def _retry_after(previous: int, current: int, elapsed: float, rate: RateLimit) -> int:
+    """Seconds until one more request fits under the limit"""
+    room = rate.limit - current - 1
+    if room < 0 or previous == 0:
+        return max(1, math.ceil(rate.window - elapsed))
+    # previous * (1 - (elapsed + t) / window) + current + 1 <= limit
+    return max(1, math.ceil(rate.window * (1 - room / previous) - elapsed))
+
+
+class MemoryStore:
+    def __init__(self, shards: int = RATE_LIMIT_SHARDS, shard_size: int = RATE_LIMIT_SHARD_SIZE, timer=time.time):
+        self._shards: List[Dict[str, list]] = [{} for _ in range(shards)]
+        self.shard_size = shard_size
+        self.timer = timer
+
+    def _prune(self, shard: Dict[str, list], now: float):
+        for key in [k for k, (start, window, _, _) in shard.items() if now - start >= 2 * window]:
+            del shard[key]
+
+    async def hit(self, key: str, rate: RateLimit) -> Tuple[bool, int]:
+        """Count a request; returns whether it is allowed and the seconds to wait if not"""
+        now = self.timer()
+        shard = self._shards[hash(key) % len(self._shards)]
+        start = now - now % rate.window
+        entry = shard.get(key)
+        if entry is None:
+            if len(shard) >= self.shard_size:
+                self._prune(shard, now)
+            entry = shard[key] = [start, rate.window, 0, 0]
+        elif entry[0] != start:
+            # Roll the windows forward; a gap of more than one window forgets everything
+            entry[3] = entry[2] if start - entry[0] == rate.window else 0
+            entry[0], entry[2] = start, 0
+        entry[2] += 1
+        _, _, current, previous = entry
+        elapsed = now - start
+        if _estimate(previous, current, elapsed, rate.window) <= rate.limit:
+            return True, 0
+        return False, _retry_after(previous, current, elapsed, rate)
+
+
+class RedisStore:
+    def __init__(self, client, prefix: str = "nexus:ratelimit:", timer=time.time):
+        self.client = client
+        self.prefix = prefix
+        self.timer = timer
+
+    async def hit(self, key: str, rate: RateLimit) -> Tuple[bool, int]:
+        now = self.timer()
+        index = int(now // rate.window)
+        current_key = f"{self.prefix}{key}:{rate.window}:{index}"
+        current = int(await self.client.incr(current_key))
+        if current == 1:
+            await self.client.expire(current_key, 2 * rate.window)
+        previous = int(await self.client.get(f"{self.prefix}{key}:{rate.window}:{index - 1}") or 0)
+        elapsed = now - index * rate.window
+        if _estimate(previous, current, elapsed, rate.window) <= rate.limit:
+            return True, 0
+        return False, _retry_after(previous, current, elapsed, rate)
+
+
+def client_ip(scope, proxy_hops: int = RATE_LIMIT_PROXY_HOPS) -> str:
+    """Client address as seen by the outermost trusted proxy"""
+    if proxy_hops > 0:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                hops = [h.strip() for h in value.decode("latin-1").split(",") if h.strip()]
+                if hops:
+                    return hops[-min(proxy_hops, len(hops))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware: a rejected request costs a dict lookup and no handler"""
+
+    def __init__(self, app, policies: List[RoutePolicy], store=None,
+                 user_key: Optional[Callable[[str], Optional[str]]] = None):
+        self.app = app
+        self.store = store
+        # Maps the bearer token to a stable user id, or None when it is invalid
+        self.user_key = user_key
+        self.policies = [(policy, policy.pattern()) for policy in policies]
+
+    def _match(self, scope) -> Optional[RoutePolicy]:
+        for policy, pattern in self.policies:
+            if policy.method == scope["method"] and pattern.match(scope["path"]):
+                return policy
+        return None
+
+    def _user(self, scope) -> Optional[str]:
+        if self.user_key is None:
+            return None
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    return self.user_key(token)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.store is None:
+            await self.app(scope, receive, send)
+            return
+        policy = self._match(scope)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        checks = []
+        if policy.per_ip:
+            checks.append(("ip", f"ip:{client_ip(scope)}", policy.per_ip))
+        user = self._user(scope) if policy.per_user else None
+        if user:
+            checks.append(("user", f"user:{user}", policy.per_user))
+
+        for scope_name, key, rate in checks:
+            try:
+                allowed, retry_after = await self.store.hit(f"{policy.path}:{key}", rate)
+            except Exception as e:
+                # A limiter outage must not take the route down
+                logger.warning(f"Rate limit check failed: {str(e)}")
+                break
+            if not allowed:
+                RATE_LIMITED.inc(route=policy.path, scope=scope_name)
+                await _reject(send, retry_after)
+                return
+
+        await self.app(scope, receive, send)
+
+
+async def _reject(send, retry_after: int):
+    body = json.dumps({"detail": "Too many requests, please retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_rate_limit_store():
+    if RATE_LIMIT_BACKEND == "redis":
+        # Optional dependency, only needed for limits shared by all workers
+        import redis.asyncio as redis
+        return RedisStore(redis.from_url(REDIS_URL))
+    if RATE_LIMIT_BACKEND == "none":
+        return None
+    return MemoryStore()
@@ -0,0 +1,269 @@
+"""Data access for users, profiles and contact messages.
+
+Writes are shaped to need as few round trips as possible and to stay
+correct under concurrent requests:
+
+- uniqueness (one account per email, one profile per user) is enforced by
+  the unique indexes declared in indexes.py, not by a read before the write;
+- a profile update is a single ownership-filtered ``find_one_and_update``
+  returning the new document;
+- creating a profile sends the insert and the user's ``hasProfile`` flag
+  concurrently. Setting the flag is correct whether the insert succeeds or
+  hits the unique index, and it is reverted if the insert fails otherwise;
+- bulk imports upsert a chunk of accounts, then of profiles, with one
+  unordered ``bulk_write`` each; failures are reported per operation.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+
+class EmailTaken(Exception):
+    pass
+
+
+class ProfileExists(Exception):
+    pass
+
+
+def _is_computed(projection: Dict[str, Any]) -> bool:
+    """Projections with expressions need the aggregation form on older servers"""
+    return any(isinstance(value, dict) for value in projection.values())
+
+
+def _is_exclusive(projection: Dict[str, Any]) -> bool:
+    return all(value == 0 for key, value in projection.items() if key != "_id")
+
+
+# Imported accounts that nobody has claimed yet
+PENDING_ACCOUNT = {"importedAt": {"$exists": True}, "activatedAt": {"$exists": False}, "googleId": None}
+
+
+async def _bulk_upsert(collection, operations: List[UpdateOne]) -> Tuple[Dict[int, Any], Dict[int, dict]]:
+    """Unordered bulk write; returns the upserted _ids and the write errors, by operation index"""
+    if not operations:
+        return {}, {}
+    try:
+        details = (await collection.bulk_write(operations, ordered=False)).bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        if details.get("writeConcernErrors"):
+            raise
+    upserted = {item["index"]: item["_id"] for item in details.get("upserted", [])}
+    errors = {item["index"]: item for item in details.get("writeErrors", [])}
+    return upserted, errors
+
+
+class Repository:
+    def __init__(self, db, listing_db=None):
+        self.db = db
+        # Public listings use MONGO_LISTING_READ_PREFERENCE (secondaries when opted in)
+        self.listing_db = listing_db if listing_db is not None else db
+
+    # ----- users -----
+
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        return await self.db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+
+    async def find_user_by_email(self, email: str) -> Optional[dict]:
+        return await self.db.users.find_one({"email": email}, {"_id": 0})
+
+    async def insert_user(self, user: dict):
+        try:
+            await self.db.users.insert_one(user)
+        except DuplicateKeyError:
+            raise EmailTaken(user["email"])
+        finally:
+            # insert_one adds the ObjectId to the document
+            user.pop("_id", None)
+
+    async def link_google_account(self, user_id: str, google_id: str) -> bool:
+        """Record the Google uid unless the account already has one.
+
+        This claims an imported account, so any pending invite stops working.
+        """
+        result = await self.db.users.update_one(
+            {"id": user_id, "googleId": {"$in": [None, ""]}},
+            {"$set": {"googleId": google_id}, "$unset": {"inviteTokenHash": "", "inviteExpiresAt": ""}}
+        )
+        return result.modified_count > 0
+
+    async def upsert_pending_users(self, users: List[dict], changes: List[dict]) -> Tuple[Dict[int, Any], Dict[int, dict]]:
+        """Create imported accounts, or apply changes to those still pending.
+
+        An existing account that is not pending makes its upsert hit the
+        unique email index, so it is reported as a write error, not modified.
+        """
+        return await _bulk_upsert(self.db.users, [
+            UpdateOne({"email": user["email"], **PENDING_ACCOUNT}, {"$set": change, "$setOnInsert": user}, upsert=True)
+            for user, change in zip(users, changes)
+        ])
+
+    async def user_ids_by_email(self, emails: List[str]) -> Dict[str, str]:
+        cursor = self.db.users.find(
+            {"email": {"$in": emails}},
+            {"_id": 0, "id": 1, "email": 1, "importedAt": 1, "activatedAt": 1, "googleId": 1}
+        )
+        # Only accounts still pending, in case one was claimed meanwhile
+        return {
+            user["email"]: user["id"] for user in await cursor.to_list(len(emails))
+            if "importedAt" in user and "activatedAt" not in user and not user.get("googleId")
+        }
+
+    async def clear_profile_flags(self, user_ids: List[str]):
+        await self.db.users.update_many({"id": {"$in": user_ids}}, {"$set": {"hasProfile": False}})
+
+    async def accept_invite(self, token_hash: str, password_hash: str, now) -> Optional[dict]:
+        """Set the password of the account invited with this token, if the invite is still valid
+        and nobody claimed the account meanwhile"""
+        return await self.db.users.find_one_and_update(
+            {"inviteTokenHash": token_hash, "inviteExpiresAt": {"$gt": now}, **PENDING_ACCOUNT},
+            {"$set": {"password": password_hash, "activatedAt": now},
+             "$unset": {"inviteTokenHash": "", "inviteExpiresAt": ""}},
+            projection={"_id": 0, "password": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    # ----- profiles -----
+
+    async def insert_profile(self, profile: dict):
+        """Insert a user's profile and flag the user, raising ProfileExists for a second one"""
+        results = await asyncio.gather(
+            self.db.entrepreneurs.insert_one(profile),
+            self.db.users.update_one({"id": profile["userId"]}, {"$set": {"hasProfile": True}}),
+            return_exceptions=True,
+        )
+        profile.pop("_id", None)
+        inserted, flagged = results
+        if isinstance(inserted, DuplicateKeyError):
+            raise ProfileExists(profile["userId"])
+        if isinstance(inserted, BaseException):
+            if not isinstance(flagged, BaseException):
+                # The flag must not claim a profile that was not written
+                exists = await self.db.entrepreneurs.find_one({"userId": profile["userId"]}, {"_id": 1})
+                if not exists:
+                    await self.db.users.update_one({"id": profile["userId"]}, {"$set": {"hasProfile": False}})
+            raise inserted
+        if isinstance(flagged, BaseException):
+            raise flagged
+
+    async def upsert_imported_profiles(self, profiles: List[dict],
+                                       insert_only: Sequence[str]) -> Tuple[Dict[int, Any], Dict[int, dict]]:
+        """Create or replace the profile of each user; insert_only fields are kept on existing profiles"""
+        operations = []
+        for profile in profiles:
+            changes = {key: value for key, value in profile.items() if key not in insert_only}
+            created = {key: profile[key] for key in insert_only if key in profile}
+            operations.append(UpdateOne({"userId": profile["userId"]}, {"$set": changes, "$setOnInsert": created},
+                                        upsert=True))
+        return await _bulk_upsert(self.db.entrepreneurs, operations)
+
+    async def get_profiles(self, ids: List[str], projection: Dict[str, Any]) -> Dict[str, dict]:
+        """Profiles with the given ids, fetched in one $in query and keyed by id"""
+        unique = list(dict.fromkeys(ids))
+        if _is_computed(projection):
+            cursor = self.listing_db.entrepreneurs.aggregate([
+                {"$match": {"id": {"$in": unique}}},
+                {"$project": projection},
+            ])
+        else:
+            cursor = self.listing_db.entrepreneurs.find({"id": {"$in": unique}}, projection)
+        return {doc["id"]: doc for doc in await cursor.to_list(len(unique))}
+
+    async def owns_profile(self, profile_id: str, owner_id: str) -> bool:
+        return await self.db.entrepreneurs.find_one({"id": profile_id, "userId": owner_id}, {"_id": 1}) is not None
+
+    async def update_owned_profile(self, profile_id: str, owner_id: str, changes: dict,
+                                   projection: Dict[str, Any]) -> Optional[dict]:
+        """Apply changes if the profile belongs to owner_id; returns the new document or None"""
+        return await self.db.entrepreneurs.find_one_and_update(
+            {"id": profile_id, "userId": owner_id},
+            {"$set": changes},
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def get_profile(self, query: dict, projection: Dict[str, Any]) -> Optional[dict]:
+        if _is_computed(projection):
+            found = await self.db.entrepreneurs.aggregate([
+                {"$match": query},
+                {"$limit": 1},
+                {"$project": projection},
+            ]).to_list(1)
+            return found[0] if found else None
+        return await self.db.entrepreneurs.find_one(query, projection)
+
+    async def list_profiles(self, query: dict, projection: Dict[str, Any], sort: List[Tuple[str, int]],
+                            skip: int, limit: int, score: Optional[dict] = None) -> List[dict]:
+        """One page of profiles; with a score expression, sorted by it before ``sort``"""
+        if score is None and not _is_computed(projection):
+            return await self.listing_db.entrepreneurs.find(
+                query, projection
+            ).sort(sort).skip(skip).limit(limit).to_list(limit)
+
+        pipeline = [{"$match": query}]
+        order = dict(sort)
+        if score is not None:
+            pipeline.append({"$addFields": {"_score": score}})
+            order = {"_score": -1, **order}
+            if _is_exclusive(projection):
+                # An inclusive projection drops _score by itself
+                projection = {**projection, "_score": 0}
+        pipeline += [{"$sort": order}, {"$skip": skip}, {"$limit": limit}, {"$project": projection}]
+        return await self.listing_db.entrepreneurs.aggregate(pipeline).to_list(limit)
+
+    async def list_profiles_near(self, near: dict, projection: Dict[str, Any], skip: int, limit: int) -> List[dict]:
+        """One page of profiles ordered by the distance computed by a $geoNear stage"""
+        return await self.listing_db.entrepreneurs.aggregate([
+            near,
+            {"$set": {"distanceKm": {"$round": ["$distanceKm", 2]}}},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$project": projection},
+        ]).to_list(limit)
+
+    def export_profiles(self, query: dict, projection: Dict[str, Any], batch_size: int):
+        """Cursor over the matching profiles in (updatedAt, id) order, read batch_size at a time"""
+        if _is_computed(projection):
+            return self.listing_db.entrepreneurs.aggregate([
+                {"$match": query},
+                {"$sort": {"updatedAt": 1, "id": 1}},
+                {"$project": projection},
+            ], batchSize=batch_size)
+        return self.listing_db.entrepreneurs.find(
+            query, projection, batch_size=batch_size
+        ).sort([("updatedAt", 1), ("id", 1)])
+
+    async def count_facets(self, query: dict, fields: Sequence[str], limit: int,
+                           array_fields: Sequence[str] = ()) -> Dict[str, Any]:
+        """Total and top values of each field among the profiles matching query, in one aggregation"""
+        facets: Dict[str, List[dict]] = {"total": [{"$count": "count"}]}
+        for field in fields:
+            stages = [{"$unwind": f"${field}"}] if field in array_fields else []
+            facets[field] = stages + [
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+                {"$match": {"_id": {"$nin": [None, ""]}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": limit},
+            ]
+        # The $match runs on the indexes; only the matching documents reach $facet
+        found = await self.listing_db.entrepreneurs.aggregate([
+            {"$match": query},
+            {"$project": {"_id": 0, **{field: 1 for field in fields}}},
+            {"$facet": facets},
+        ]).to_list(1)
+        result = found[0] if found else {}
+        total = result.get("total") or [{"count": 0}]
+        return {
+            "total": total[0]["count"],
+            **{field: [{"value": row["_id"], "count": row["count"]} for row in result.get(field, [])]
+               for field in fields},
+        }
+
+    # ----- contact messages -----
+
+    async def insert_contact_message(self, message: dict):
+        await self.db.contact_messages.insert_one(message)
+        message.pop("_id", None)
@@ -0,0 +1,259 @@
+"""Cache of encoded public API responses, invalidated by version counters.
+
+Entries are keyed on the route and its normalized query parameters, plus the
+current version of every tag the response depends on ("entrepreneurs",
+"users"). Writes bump a tag's version, which orphans every entry built from
+the previous one; orphans simply age out.
+
+Versions are random tokens rather than counters, so a key (and any ETag
+derived from it) is never reused after a restart or a Redis flush. Entries
+keep the validator headers of the response next to its body, and the ids of
+the profiles it lists so cache hits can still count search impressions.
+
+The keys double as ETags and are checked before any data is read, so the
+tag versions must be the same in every worker and instance: a write handled
+by one of them has to change the keys of all the others at once.
+
+Entry backends (``RESPONSE_CACHE_BACKEND``):
+
+- ``memory`` (default): per-process LRU with TTL, bounded by
+  ``RESPONSE_CACHE_MAX_BYTES``. Tag versions are kept in MongoDB (the
+  ``cache_versions`` collection), the only store every process and
+  instance can reach without Redis. Each process reuses the versions it
+  read for ``RESPONSE_CACHE_VERSIONS_TTL`` seconds (default 1), so cache
+  hits make at most one MongoDB read per second and worker; the process
+  that handles a write sees it at once, the others within that delay,
+  which is small next to the ``max-age`` of the responses. A TTL of 0
+  reads the versions on every lookup.
+  ``RESPONSE_CACHE_VERSIONS=memory`` keeps them in the process instead,
+  which is only correct with a single worker; it is refused when
+  ``WEB_CONCURRENCY`` is above 1. It cannot be the default because other
+  instances (several containers, serverless) are not visible from here.
+- ``redis``: any client with the redis.asyncio interface (``get``, ``set``,
+  ``mget``), shared by all workers, holding the versions too. Tests can pass
+  a local fake.
+- ``none``: caching disabled.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+import metrics
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+RESPONSE_CACHE_VERSIONS = os.environ.get('RESPONSE_CACHE_VERSIONS', 'mongo')
+# How long a worker reuses the tag versions it read from MongoDB
+RESPONSE_CACHE_VERSIONS_TTL = float(os.environ.get('RESPONSE_CACHE_VERSIONS_TTL', 1))
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# Larger responses are not worth keeping
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRY_BYTES', 1024 * 1024))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+CACHE_REQUESTS = metrics.counter("response_cache_requests_total", "Response cache lookups", ["route", "result"])
+VERSION_READS = metrics.counter("response_cache_version_reads_total", "Tag version reads from MongoDB")
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    profile_ids: List[str] = field(default_factory=list)
+
+    def pack(self) -> bytes:
+        meta = {"headers": self.headers, "profileIds": self.profile_ids}
+        return json.dumps(meta, separators=(",", ":")).encode() + b"\n" + self.body
+
+    @classmethod
+    def unpack(cls, value: bytes) -> "CachedResponse":
+        meta, _, body = value.partition(b"\n")
+        meta = json.loads(meta)
+        if "headers" not in meta:
+            # Entry written before profile ids were kept
+            return cls(body=body, headers=meta)
+        return cls(body=body, headers=meta["headers"], profile_ids=meta.get("profileIds", []))
+
+
+class MemoryBackend:
+    """Entries of one process"""
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self._entries = TTLCache(maxsize=max_bytes, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._entries.set(key, value, ttl=ttl, size=len(value))
+
+
+class MemoryVersions:
+    """Tag versions of one process: only correct when it is the only worker"""
+
+    def __init__(self):
+        self._versions: Dict[str, str] = {}
+
+    async def versions(self, tags: Iterable[str]) -> list:
+        return [self._versions.setdefault(tag, _new_version()) for tag in tags]
+
+    async def bump(self, tag: str):
+        self._versions[tag] = _new_version()
+
+
+class MongoVersions:
+    """Tag versions in a MongoDB collection, shared by every worker and instance.
+
+    Versions read are reused for ``ttl`` seconds; a bump is seen at once by
+    this process and within ``ttl`` by the others.
+    """
+
+    def __init__(self, collection, ttl: float = RESPONSE_CACHE_VERSIONS_TTL, clock=time.monotonic):
+        self.collection = collection
+        self.ttl = ttl
+        self.clock = clock
+        # tag -> (version, expiry)
+        self._recent: Dict[str, Tuple[str, float]] = {}
+
+    def _remember(self, tag: str, version: str, expires: float):
+        current = self._recent.get(tag)
+        # A bump made while the read was in flight is newer than what was read
+        if current is None or current[1] < expires:
+            self._recent[tag] = (version, expires)
+
+    async def versions(self, tags: Iterable[str]) -> list:
+        tags = list(tags)
+        now = self.clock()
+        found = {tag: self._recent[tag][0] for tag in tags if tag in self._recent and self._recent[tag][1] > now}
+        missing = [tag for tag in tags if tag not in found]
+        if missing:
+            VERSION_READS.inc()
+            async for doc in self.collection.find({"_id": {"$in": missing}}):
+                found[doc["_id"]] = doc["version"]
+            for tag in missing:
+                if tag not in found:
+                    # First use: whichever worker inserts first sets the version
+                    doc = await self.collection.find_one_and_update(
+                        {"_id": tag}, {"$setOnInsert": {"version": _new_version()}},
+                        upsert=True, return_document=ReturnDocument.AFTER,
+                    )
+                    found[tag] = doc["version"]
+                if self.ttl > 0:
+                    self._remember(tag, found[tag], now + self.ttl)
+        return [found[tag] for tag in tags]
+
+    async def bump(self, tag: str):
+        version = _new_version()
+        await self.collection.update_one({"_id": tag}, {"$set": {"version": version}}, upsert=True)
+        if self.ttl > 0:
+            self._recent[tag] = (version, self.clock() + self.ttl)
+
+
+class RedisBackend:
+    def __init__(self, client, prefix: str = "nexus:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def versions(self, tags: Iterable[str]) -> list:
+        keys = [f"{self.prefix}version:{tag}" for tag in tags]
+        values = await self.client.mget(keys)
+        for i, value in enumerate(values):
+            if value is None:
+                # First use (or the data was lost): never fall back to an old version
+                await self.client.set(keys[i], _new_version(), nx=True)
+                value = await self.client.get(keys[i])
+            values[i] = value.decode() if isinstance(value, bytes) else value
+        return values
+
+    async def bump(self, tag: str):
+        await self.client.set(f"{self.prefix}version:{tag}", _new_version())
+
+
+def _normalize(params: dict) -> str:
+    """Stable representation of query parameters; unset ones are ignored"""
+    cleaned = {k: v for k, v in params.items() if v is not None and v != ""}
+    return json.dumps(cleaned, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ResponseCache:
+    def __init__(self, backend=None, versions=None, ttl: int = RESPONSE_CACHE_TTL,
+                 max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES):
+        # No backend disables caching; the backend holds the versions unless given a store
+        self.backend = backend
+        self.versions = versions if versions is not None else backend
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+
+    async def lookup(self, route: str, params: dict, tags: Iterable[str]) -> Tuple[Optional[str], Optional[CachedResponse]]:
+        """Return the cache key for a request and the cached response, if any.
+
+        The key identifies the exact data version, so it can also serve as
+        an ETag. It is None when caching is disabled or the backend is
+        unavailable; a cache outage must never fail the request.
+        """
+        if self.backend is None:
+            return None, None
+        try:
+            versions = await self.versions.versions(list(tags))
+            digest = hashlib.sha1(_normalize(params).encode()).hexdigest()
+            key = f"{route}:{'.'.join(str(v) for v in versions)}:{digest}"
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Response cache read failed: {str(e)}")
+            return None, None
+        CACHE_REQUESTS.inc(route=route, result="hit" if value is not None else "miss")
+        return key, CachedResponse.unpack(value) if value is not None else None
+
+    async def store(self, key: Optional[str], response: CachedResponse, ttl: Optional[int] = None):
+        if key is None or len(response.body) > self.max_entry_bytes:
+            return
+        try:
+            await self.backend.set(key, response.pack(), ttl or self.ttl)
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {str(e)}")
+
+    async def invalidate(self, *tags: str):
+        if self.backend is None:
+            return
+        for tag in tags:
+            try:
+                await self.versions.bump(tag)
+            except Exception as e:
+                logger.error(f"Response cache invalidation of {tag} failed: {str(e)}")
+
+
+def create_version_store(db):
+    if RESPONSE_CACHE_VERSIONS == "memory":
+        if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+            raise ValueError("RESPONSE_CACHE_VERSIONS=memory requires a single worker")
+        return MemoryVersions()
+    return MongoVersions(db.cache_versions)
+
+
+def create_response_cache(db) -> ResponseCache:
+    if RESPONSE_CACHE_BACKEND == "redis":
+        # Optional dependency, only needed for the shared cache
+        import redis.asyncio as redis
+        return ResponseCache(RedisBackend(redis.from_url(REDIS_URL)))
+    if RESPONSE_CACHE_BACKEND == "none":
+        return ResponseCache(None)
+    return ResponseCache(MemoryBackend(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL), create_version_store(db))
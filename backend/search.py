@@ -0,0 +1,126 @@
+"""Accent-folded prefix search for the entrepreneur directory.
+
+Every profile carries two derived fields:
+
+- ``searchTerms``: every prefix of every folded token found in the searchable
+  fields, backed by a multikey index so a search is an index lookup instead
+  of a collection scan.
+- ``searchFields``: the same prefixes grouped per source field, so the
+  relevance score can be computed inside MongoDB with field weights.
+
+"Touré", "toure" and "TOUR" all match the same profile, and user input is
+never interpreted as a regular expression.
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+
+# Field name -> weight used by the relevance score
+SEARCH_FIELDS: Dict[str, int] = {
+    "companyName": 5,
+    "activityName": 4,
+    "firstName": 3,
+    "lastName": 3,
+    "description": 1,
+}
+
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 20
+MAX_QUERY_TERMS = 8
+
+# Projection removing the derived search fields from API responses
+SEARCH_PROJECTION = {"searchTerms": 0, "searchFields": 0}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "oe", "æ": "ae", "Æ": "ae", "ß": "ss"})
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents: "Développement" -> "developpement"."""
+    decomposed = unicodedata.normalize("NFKD", text.translate(_LIGATURES))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into folded tokens long enough to be searchable."""
+    if not text:
+        return []
+    return [t for t in _TOKEN_RE.findall(fold(text)) if len(t) >= MIN_PREFIX_LENGTH]
+
+
+def _prefixes(token: str) -> Iterable[str]:
+    upper = min(len(token), MAX_PREFIX_LENGTH)
+    for end in range(MIN_PREFIX_LENGTH, upper + 1):
+        yield token[:end]
+
+
+def search_document(doc: dict) -> dict:
+    """Build the derived search fields for an entrepreneur document."""
+    fields = {}
+    for field in SEARCH_FIELDS:
+        terms = set()
+        for token in tokenize(doc.get(field) or ""):
+            terms.update(_prefixes(token))
+        fields[field] = sorted(terms)
+
+    all_terms = set()
+    for terms in fields.values():
+        all_terms.update(terms)
+
+    return {"searchTerms": sorted(all_terms), "searchFields": fields}
+
+
+def query_terms(search: str) -> List[str]:
+    """Normalize a user query into the terms matched against ``searchTerms``."""
+    terms = []
+    for token in tokenize(search):
+        term = token[:MAX_PREFIX_LENGTH]
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def search_filter(terms: List[str]) -> dict:
+    """Every query term must match a prefix of some indexed token."""
+    return {"searchTerms": {"$all": terms}}
+
+
+def score_expression(terms: List[str]) -> dict:
+    """Aggregation expression scoring a document against the query terms."""
+    return {
+        "$add": [
+            {
+                "$multiply": [
+                    weight,
+                    {"$size": {"$filter": {
+                        "input": {"$ifNull": [f"$searchFields.{field}", []]},
+                        "cond": {"$in": ["$$this", terms]},
+                    }}},
+                ]
+            }
+            for field, weight in SEARCH_FIELDS.items()
+        ]
+    }
+
+
+async def backfill_search_terms(collection, batch_size: int = 500) -> int:
+    """Populate the search fields on documents written before they existed."""
+    projection = {"_id": 1, **{field: 1 for field in SEARCH_FIELDS}}
+    cursor = collection.find({"searchTerms": {"$exists": False}}, projection)
+
+    updated = 0
+    batch = []
+    async for doc in cursor:
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_document(doc)}))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+
+    return updated
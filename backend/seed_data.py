@@ -1,21 +1,26 @@
 import asyncio
 import sys
-from motor.motor_asyncio import AsyncIOMotorClient
 from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 import uuid
 from datetime import datetime, timezone
+from geo import geo_document
+from search import search_document
+from stats import PlatformStats
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Reads the pool settings from the environment at import time
+from database import create_client
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_client(mongo_url)
 db = client[os.environ.get('DB_NAME', 'nexus_connect')]
 
 # Demo users and entrepreneurs data
@@ -564,7 +569,7 @@ async def seed_database():
                 "lastName": data["user"]["lastName"],
                 "googleId": None,
                 "hasProfile": True,
-                "createdAt": datetime.now(timezone.utc).isoformat()
+                "createdAt": datetime.now(timezone.utc)
             }
             await db.users.insert_one(user_doc)
             
@@ -573,9 +578,11 @@ async def seed_database():
                 "id": str(uuid.uuid4()),
                 "userId": user_id,
                 **data["entrepreneur"],
-                "createdAt": datetime.now(timezone.utc).isoformat(),
-                "updatedAt": datetime.now(timezone.utc).isoformat()
+                "createdAt": datetime.now(timezone.utc),
+                "updatedAt": datetime.now(timezone.utc)
             }
+            entrepreneur_doc.update(search_document(entrepreneur_doc))
+            entrepreneur_doc.update(geo_document(entrepreneur_doc))
             await db.entrepreneurs.insert_one(entrepreneur_doc)
             
             print(f"✅ {idx}/20 - Created: {data['user']['firstName']} {data['user']['lastName']}")
@@ -583,6 +590,8 @@ async def seed_database():
         except Exception as e:
             print(f"❌ Error creating profile {idx}: {str(e)}")
     
+    await PlatformStats(db).rebuild()
+    
     print("\n✨ Seeding complete!")
     print(f"📊 Total users created: {await db.users.count_documents({})}")
     print(f"📊 Total entrepreneurs created: {await db.entrepreneurs.count_documents({})}")
@@ -0,0 +1,98 @@
+"""Model-free encoding of public directory documents.
+
+``SERIALIZATION_MODE`` selects how list and profile responses are built:
+
+- ``validated`` (default): documents are validated against the response
+  model and encoded by pydantic-core.
+- ``fast``: MongoDB projects exactly the response model's fields (computed
+  fields such as the logo thumbnail swap included) and the documents, which
+  were validated when the API wrote them, are encoded straight to bytes by
+  orjson. Missing optional fields get the model defaults, in nested models
+  (portfolio items) too.
+
+In ``fast`` mode dates are emitted as stored: native dates become RFC 3339
+strings, documents still holding ISO strings pass them through unchanged.
+"""
+import os
+import typing
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import orjson
+from pydantic import BaseModel
+
+SERIALIZATION_MODE = os.environ.get('SERIALIZATION_MODE', 'validated')
+FAST_SERIALIZATION = SERIALIZATION_MODE == "fast"
+
+# Naive datetimes read from MongoDB are UTC
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def _nested_model(annotation) -> Optional[Type[BaseModel]]:
+    """Model held by a field annotated as a model, Optional[model] or List[model]"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in typing.get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def inclusive_projection(model: Type[BaseModel], prefix: str = "") -> Dict[str, Any]:
+    projection = {}
+    for name, field in model.model_fields.items():
+        nested = _nested_model(field.annotation)
+        if nested is not None:
+            projection.update(inclusive_projection(nested, f"{prefix}{name}."))
+        else:
+            projection[f"{prefix}{name}"] = 1
+    return projection
+
+
+class _Defaults:
+    """Defaults of the optional fields of a model and of the models nested in it"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.values = {
+            name: field.get_default(call_default_factory=True)
+            for name, field in model.model_fields.items()
+            if not field.is_required()
+        }
+        self.nested: Dict[str, _Defaults] = {}
+        for name, field in model.model_fields.items():
+            nested = _nested_model(field.annotation)
+            if nested is not None:
+                self.nested[name] = _Defaults(nested)
+
+    def fill(self, doc: dict) -> dict:
+        for name, default in self.values.items():
+            if name not in doc:
+                doc[name] = default
+        for name, defaults in self.nested.items():
+            value = doc.get(name)
+            # A single model or a list of them; None is left as it is
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, dict):
+                    defaults.fill(item)
+        return doc
+
+
+class DocumentEncoder:
+    """Projection and encoder producing the JSON of ``model`` without instantiating it"""
+
+    def __init__(self, model: Type[BaseModel], computed: Optional[Dict[str, Any]] = None):
+        # computed: aggregation expressions replacing plain field inclusions
+        self.projection = {"_id": 0, **inclusive_projection(model), **(computed or {})}
+        self.defaults = _Defaults(model)
+
+    def complete(self, doc: dict) -> dict:
+        return self.defaults.fill(doc)
+
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(value, option=_ORJSON_OPTIONS)
+
+    def encode_list(self, docs: Iterable[dict]) -> bytes:
+        return self.encode([self.complete(doc) for doc in docs])
+
+    def encode_page(self, docs: List[dict], next_cursor: Optional[str]) -> bytes:
+        return self.encode({"items": [self.complete(doc) for doc in docs], "nextCursor": next_cursor})
@@ -1,43 +1,105 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Body, File, UploadFile
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, status, Body, File, Header, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr, validator
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter, model_validator, validator
+from typing import List, Optional, Literal, Union
 import uuid
 from datetime import datetime, timezone, timedelta
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 import base64
 import re
-from firebase_config import verify_firebase_token
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Local modules read their settings from the environment at import time
+from firebase_config import verify_firebase_token
+from cache import TTLCache
+import imaging
+from indexes import ensure_indexes
+from migrate_dates import migrate_pending as migrate_dates
+from database import create_client, listing_database, warm_pool
+from media import MAX_IMAGE_BYTES, InvalidImage, create_media_store, externalize_images, is_digest, media_url, parse_range
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+from passwords import PasswordPoolBusy, password_hasher
+from response_cache import CachedResponse, create_response_cache
+from conditional import is_not_modified, not_modified, strong_etag, validator_headers
+import metrics
+from stats import STATS_FIELDS, PlatformStats
+from events import EventPipeline
+from serialization import FAST_SERIALIZATION, DocumentEncoder
+from repository import EmailTaken, ProfileExists, Repository
+from ratelimit import RateLimit, RateLimitMiddleware, RoutePolicy, create_rate_limit_store
+from instrumentation import InstrumentationMiddleware, InstrumentedRoute, timed
+from export import EXPORT_API_KEYS, EXPORT_BATCH_SIZE, MEDIA_TYPES, export_stream, valid_api_key
+from bulk_import import FORMATS, IMPORT_API_KEYS, IMPORT_MAX_BYTES, ImportResult, InviteUrlNotConfigured, detect_format, hash_token, import_rows, read_rows
+from geo import DEFAULT_RADIUS_KM, GEO_PROJECTION, MAX_RADIUS_KM, backfill_pending_points, geo_document, geocode, near_stage, valid_coordinates
+from search import SEARCH_PROJECTION, backfill_search_terms, query_terms, score_expression, search_document, search_filter
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_client(mongo_url)
 db = client[os.environ.get('DB_NAME', 'nexus_connect')]
+media_store = create_media_store(db)
+response_cache = create_response_cache(db)
+platform_stats = PlatformStats(db)
+events = EventPipeline(db, platform_stats)
+repo = Repository(db, listing_database(db))
 
 # Create the main app without a prefix
 app = FastAPI(title="Nexus Connect API")
 
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+# Create a router with the /api prefix; its routes report their phase timings
+api_router = APIRouter(prefix="/api", route_class=InstrumentedRoute)
+
+# Rate limits per route, enforced by RateLimitMiddleware before the handlers run
+RATE_LIMITS = [
+    # Contact details are what scrapers are after
+    RoutePolicy(
+        "GET", "/api/entrepreneurs/{entrepreneur_id}/contact",
+        per_ip=RateLimit.parse(os.environ.get('CONTACT_RATE_LIMIT_PER_IP', '30/600')),
+        per_user=RateLimit.parse(os.environ.get('CONTACT_RATE_LIMIT_PER_USER', '100/3600')),
+    ),
+]
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 SECRET_KEY = os.environ.get('SECRET_KEY', 'nexus-connect-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# How authenticated requests resolve the user (AUTH_MODE):
+# - "cache" (default): users are kept in an in-process LRU/TTL cache. A change
+#   only invalidates the cache of the worker that made it: other workers and
+#   instances may serve the previous names and hasProfile for up to
+#   USER_CACHE_TTL seconds.
+# - "claims": the token carries email, names and hasProfile and is trusted,
+#   with no lookup at all; they stay as they were when the token was issued
+#   until the user signs in again.
+# - "db": one users lookup per request, always current.
+# User carries no permissions (ownership is checked against the profile), so
+# stale values only affect what is displayed.
+AUTH_MODE = os.environ.get('AUTH_MODE', 'cache')
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Directory facet counts: values returned per facet, and how long counts are cached
+FACET_LIMIT = int(os.environ.get('FACET_LIMIT', 50))
+FACETS_CACHE_TTL = int(os.environ.get('FACETS_CACHE_TTL', 30))
+
+# Most ids accepted by one batch profile fetch
+BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', 200))
+
+# Keys allowed to scrape /api/metrics (comma-separated); without keys it is disabled
+METRICS_API_KEYS = [key.strip() for key in os.environ.get('METRICS_API_KEYS', '').split(',') if key.strip()]
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -70,6 +132,10 @@ class User(UserBase):
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     hasProfile: bool = False
 
+class InviteAccept(BaseModel):
+    token: str
+    password: str
+
 class UserResponse(BaseModel):
     id: str
     email: str
@@ -87,6 +153,13 @@ class Token(BaseModel):
 class PortfolioItem(BaseModel):
     type: Literal["image", "link"]
     value: str
+    thumbnail: Optional[str] = None  # Generated for images
+    srcset: Optional[str] = None
+
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    format: str
 
 class EntrepreneurBase(BaseModel):
     profileType: Literal["entreprise", "freelance", "pme", "artisan", "ONG", "cabinet", "organisation", "autre"]
@@ -117,13 +190,16 @@ class EntrepreneurBase(BaseModel):
         return v
 
 class EntrepreneurCreate(EntrepreneurBase):
-    logo: Optional[str] = None  # Base64 or URL
+    logo: Optional[str] = None  # Data URL or URL; inline images are moved to the media store
 
 class Entrepreneur(EntrepreneurBase):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     userId: str
     logo: Optional[str] = None
+    logoThumbnail: Optional[str] = None
+    logoSrcset: Optional[str] = None
+    logoVariants: List[ImageVariant] = Field(default_factory=list)
     rating: float = 0.0
     reviewCount: int = 0
     isPremium: bool = False
@@ -138,7 +214,9 @@ class EntrepreneurPublic(BaseModel):
     lastName: Optional[str] = None
     companyName: Optional[str] = None
     activityName: Optional[str] = None
-    logo: Optional[str] = None
+    logo: Optional[str] = None  # Smallest suitable variant when one exists
+    logoSrcset: Optional[str] = None
+    logoVariants: List[ImageVariant] = []
     description: str
     tags: List[str]
     location: str
@@ -149,7 +227,72 @@ class EntrepreneurPublic(BaseModel):
     reviewCount: int
     isPremium: bool
     createdAt: datetime
+    distanceKm: Optional[float] = None  # Only when searching near a point
     # Contact info hidden - requires API call
+    
+    @model_validator(mode="before")
+    @classmethod
+    def use_logo_thumbnail(cls, data):
+        if isinstance(data, dict) and data.get('logoThumbnail'):
+            data = {**data, 'logo': data['logoThumbnail']}
+        return data
+
+class MediaUpload(BaseModel):
+    hash: str
+    url: str
+    size: int
+    contentType: str
+
+class EntrepreneurPage(BaseModel):
+    """Directory page returned when paginating with a cursor"""
+    items: List[EntrepreneurPublic]
+    nextCursor: Optional[str] = None
+
+class EntrepreneurExport(EntrepreneurPublic):
+    """Exported row; updatedAt is the checkpoint of incremental exports"""
+    updatedAt: datetime
+
+class EntrepreneurBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_IDS)
+
+class EntrepreneurBatch(BaseModel):
+    """Profiles in the order of the requested ids; null where an id was not found"""
+    items: List[Optional[EntrepreneurPublic]]
+    notFound: List[str]
+
+class ImportRowError(BaseModel):
+    row: int
+    email: Optional[str] = None
+    errors: List[str]
+
+class ImportInvite(BaseModel):
+    row: int
+    email: str
+    userId: str
+    inviteUrl: str
+    expiresAt: datetime
+
+class ImportReport(BaseModel):
+    rows: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[ImportRowError]
+    invites: List[ImportInvite]  # Links to send to the members; not retrievable later
+    seconds: float
+    rowsPerSecond: float
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class EntrepreneurFacets(BaseModel):
+    """Profiles matching the directory filters, counted per value of each filter field"""
+    total: int
+    location: List[FacetCount]
+    city: List[FacetCount]
+    profileType: List[FacetCount]
+    tags: List[FacetCount]
 
 class EntrepreneurContactInfo(BaseModel):
     phone: str
@@ -176,16 +319,86 @@ class Stats(BaseModel):
     totalUsers: int
     totalProfiles: int
     totalViews: int
+    totalContactReveals: int = 0
     totalProblems: int
 
 
+# Pre-built serializers for responses encoded by the handlers themselves
+ENTREPRENEUR_PUBLIC = TypeAdapter(EntrepreneurPublic)
+ENTREPRENEUR_LIST = TypeAdapter(List[EntrepreneurPublic])
+ENTREPRENEUR_PAGE = TypeAdapter(EntrepreneurPage)
+ENTREPRENEUR_FACETS = TypeAdapter(EntrepreneurFacets)
+ENTREPRENEUR_BATCH = TypeAdapter(EntrepreneurBatch)
+ENTREPRENEUR_EXPORT = TypeAdapter(EntrepreneurExport)
+STATS = TypeAdapter(Stats)
+# Fast serialization: exact public fields, logo thumbnail swapped in by MongoDB
+PUBLIC_DOCUMENTS = DocumentEncoder(EntrepreneurPublic, {"logo": {"$ifNull": ["$logoThumbnail", "$logo"]}})
+EXPORT_DOCUMENTS = DocumentEncoder(EntrepreneurExport, {"logo": {"$ifNull": ["$logoThumbnail", "$logo"]}})
+# Export columns, in model order; distances only exist in proximity searches
+EXPORT_COLUMNS = [name for name in EntrepreneurExport.model_fields if name != "distanceKm"]
+
+
 # ========== HELPER FUNCTIONS ==========
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def directory_query(search: Optional[str], location: Optional[str], city: Optional[str],
+                    profileType: Optional[str], tags: Optional[str], minRating: Optional[float]):
+    """Search terms and MongoDB filter of the directory query parameters"""
+    query = {}
+    terms = query_terms(search) if search else []
+    
+    if search:
+        query.update(search_filter(terms))
+    
+    if location:
+        query["location"] = location
+    
+    if city:
+        query["city"] = city
+    
+    if profileType:
+        query["profileType"] = profileType
+    
+    if tags:
+        tag_list = [t.strip() for t in tags.split(",")]
+        query["tags"] = {"$in": tag_list}
+    
+    if minRating:
+        query["rating"] = {"$gte": minRating}
+    
+    return terms, query
+
+def proximity_origin(lat: Optional[float], lng: Optional[float], near: Optional[str],
+                     location: Optional[str]):
+    """(latitude, longitude) of a proximity search, from coordinates or a gazetteer city"""
+    if near:
+        coords = geocode(near, location)
+        if coords is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown city: {near}"
+            )
+        return coords
+    if lat is None or lng is None or not valid_coordinates(lat, lng):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="lat and lng must both be valid coordinates"
+        )
+    return lat, lng
+
+def json_bytes_response(body: bytes, headers: Optional[dict] = None) -> Response:
+    """Response for an already encoded (possibly cached) JSON body"""
+    return Response(content=body, media_type="application/json", headers=headers)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def cached_json_response(request: Request, cached: CachedResponse) -> Response:
+    if is_not_modified(request, cached.headers):
+        return not_modified(cached.headers)
+    return json_bytes_response(cached.body, cached.headers)
+
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -197,7 +410,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims(user: dict) -> dict:
+    """JWT claims for a user; in claims mode they replace the users lookup"""
+    claims = {"sub": user['id']}
+    if AUTH_MODE == "claims":
+        claims.update({
+            "email": user['email'],
+            "firstName": user.get('firstName'),
+            "lastName": user.get('lastName'),
+            "hasProfile": user.get('hasProfile', False),
+        })
+    return claims
+
+async def load_user(user_id: str) -> Optional[User]:
+    use_cache = AUTH_MODE != "db"
+    user = user_cache.get(user_id) if use_cache else None
+    if user is not None:
+        return user
+    
+    user_doc = await repo.get_user(user_id)
+    if user_doc is None:
+        return None
+    
+    user = User(**user_doc)
+    if use_cache:
+        user_cache.set(user_id, user)
+    return user
+
+def token_subject(token: str) -> Optional[str]:
+    """User id of a valid access token, without loading the user"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+def invalidate_user(user_id: str):
+    """Drop a cached user after its document changed"""
+    user_cache.pop(user_id)
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    with timed("auth"):
+        return await authenticate(token)
+
+async def authenticate(token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -211,31 +466,38 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     except JWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    if AUTH_MODE == "claims" and "email" in payload:
+        # Claims were validated when the token was issued
+        return User.model_construct(
+            id=user_id,
+            email=payload["email"],
+            firstName=payload.get("firstName"),
+            lastName=payload.get("lastName"),
+            hasProfile=payload.get("hasProfile", False),
+        )
+    
+    # Tokens issued without claims fall back to the cached lookup
+    user = await load_user(user_id)
     if user is None:
         raise credentials_exception
     
-    # Convert ISO string to datetime if needed
-    if isinstance(user.get('createdAt'), str):
-        user['createdAt'] = datetime.fromisoformat(user['createdAt'])
-    
-    return User(**user)
+    return user
 
 
 # ========== AUTH ROUTES ==========
 
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserCreate):
-    # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
+    # Cheap check first so known emails never cost a bcrypt job; the unique
+    # index below still settles concurrent registrations
+    if await repo.find_user_by_email(user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     user = User(
         email=user_data.email,
         firstName=user_data.firstName,
@@ -244,13 +506,20 @@ async def register(user_data: UserCreate):
     
     user_dict = user.model_dump()
     user_dict['password'] = hashed_password
-    user_dict['createdAt'] = user_dict['createdAt'].isoformat()
     
-    await db.users.insert_one(user_dict)
+    # The unique email index rejects accounts created since the check
+    try:
+        await repo.insert_user(user_dict)
+    except EmailTaken:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    await platform_stats.increment(totalUsers=1)
     
     # Create token
     access_token = create_access_token(
-        data={"sub": user.id},
+        data=token_claims(user_dict),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
@@ -268,8 +537,9 @@ async def register(user_data: UserCreate):
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(user_data: UserLogin):
-    user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
-    if not user or not verify_password(user_data.password, user['password']):
+    user = await repo.find_user_by_email(user_data.email)
+    # Firebase-only accounts have no password to check
+    if not user or not user.get('password') or not await verify_password(user_data.password, user['password']):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -277,7 +547,36 @@ async def login(user_data: UserLogin):
     
     # Create token
     access_token = create_access_token(
-        data={"sub": user['id']},
+        data=token_claims(user),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        user=UserResponse(
+            id=user['id'],
+            email=user['email'],
+            firstName=user.get('firstName'),
+            lastName=user.get('lastName'),
+            hasProfile=user.get('hasProfile', False)
+        )
+    )
+
+@api_router.post("/auth/invite", response_model=Token)
+async def accept_invite(invite: InviteAccept):
+    """Set the password of an imported account and sign in"""
+    hashed_password = await get_password_hash(invite.password)
+    user = await repo.accept_invite(hash_token(invite.token), hashed_password, datetime.now(timezone.utc))
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired invite"
+        )
+    invalidate_user(user['id'])
+    
+    access_token = create_access_token(
+        data=token_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
@@ -308,7 +607,7 @@ async def firebase_login(firebase_token: dict = Body(...)):
     """Login or register with Firebase token"""
     try:
         # Verify Firebase token
-        decoded_token = verify_firebase_token(firebase_token.get('idToken'))
+        decoded_token = await verify_firebase_token(firebase_token.get('idToken'))
         
         firebase_uid = decoded_token['uid']
         email = decoded_token.get('email')
@@ -320,7 +619,7 @@ async def firebase_login(firebase_token: dict = Body(...)):
         last_name = name_parts[1] if len(name_parts) > 1 else ''
         
         # Check if user exists
-        user = await db.users.find_one({"email": email}, {"_id": 0})
+        user = await repo.find_user_by_email(email)
         
         if not user:
             # Create new user
@@ -333,22 +632,24 @@ async def firebase_login(firebase_token: dict = Body(...)):
                 "lastName": last_name,
                 "googleId": firebase_uid,
                 "hasProfile": False,
-                "createdAt": datetime.now(timezone.utc).isoformat()
+                "createdAt": datetime.now(timezone.utc)
             }
-            await db.users.insert_one(user_doc)
-            user = user_doc
+            try:
+                await repo.insert_user(user_doc)
+                await platform_stats.increment(totalUsers=1)
+                user = user_doc
+            except EmailTaken:
+                # A concurrent first sign-in created the account
+                user = await repo.find_user_by_email(email)
         else:
             # Update googleId if not set
-            if not user.get('googleId'):
-                await db.users.update_one(
-                    {"id": user['id']},
-                    {"$set": {"googleId": firebase_uid}}
-                )
+            if not user.get('googleId') and await repo.link_google_account(user['id'], firebase_uid):
                 user['googleId'] = firebase_uid
+                invalidate_user(user['id'])
         
         # Create JWT token
         access_token = create_access_token(
-            data={"sub": user['id']},
+            data=token_claims(user),
             expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         )
         
@@ -380,41 +681,60 @@ async def firebase_login_root(firebase_token: dict = Body(...)):
 
 # ========== ENTREPRENEUR ROUTES ==========
 
+async def store_profile_images(profile: dict, request: Request) -> dict:
+    """Move inline logo/portfolio images to the media store, keeping only URLs,
+    and attach their responsive variants"""
+    base_url = str(request.base_url)
+    try:
+        await externalize_images(media_store, profile, base_url)
+        return await imaging.apply_image_variants(media_store, db, profile, base_url)
+    except InvalidImage as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @api_router.post("/entrepreneurs", response_model=Entrepreneur)
 async def create_entrepreneur(
     entrepreneur_data: EntrepreneurCreate,
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
-    # Check if user already has a profile
-    existing = await db.entrepreneurs.find_one({"userId": current_user.id})
-    if existing:
+    # Checked before storing any image; the unique index below settles races
+    if await repo.get_profile({"userId": current_user.id}, {"_id": 1}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User already has a profile"
         )
     
     # Create entrepreneur profile
+    profile = await store_profile_images(entrepreneur_data.model_dump(), request)
     entrepreneur = Entrepreneur(
         userId=current_user.id,
-        **entrepreneur_data.model_dump()
+        **profile
     )
     
     entrepreneur_dict = entrepreneur.model_dump()
-    entrepreneur_dict['createdAt'] = entrepreneur_dict['createdAt'].isoformat()
-    entrepreneur_dict['updatedAt'] = entrepreneur_dict['updatedAt'].isoformat()
-    
-    await db.entrepreneurs.insert_one(entrepreneur_dict)
+    entrepreneur_dict.update(search_document(entrepreneur_dict))
+    entrepreneur_dict.update(geo_document(entrepreneur_dict))
     
-    # Update user hasProfile flag
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$set": {"hasProfile": True}}
-    )
+    # One profile per user is enforced by the unique userId index
+    try:
+        await repo.insert_profile(entrepreneur_dict)
+    except ProfileExists:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User already has a profile"
+        )
+    invalidate_user(current_user.id)
+    await platform_stats.increment(totalProfiles=1)
+    await response_cache.invalidate("entrepreneurs")
     
     return entrepreneur
 
-@api_router.get("/entrepreneurs", response_model=List[EntrepreneurPublic])
+@api_router.get("/entrepreneurs", response_model=Union[List[EntrepreneurPublic], EntrepreneurPage])
 async def get_entrepreneurs(
+    request: Request,
     search: Optional[str] = None,
     location: Optional[str] = None,
     city: Optional[str] = None,
@@ -423,64 +743,194 @@ async def get_entrepreneurs(
     minRating: Optional[float] = None,
     sort: Optional[str] = "createdAt",  # createdAt, rating, relevance
     limit: int = 50,
-    skip: int = 0
+    skip: int = 0,
+    cursor: Optional[str] = None,  # Keyset pagination; pass an empty cursor for the first page
+    lat: Optional[float] = None,  # Proximity search, nearest first: lat/lng or a city name
+    lng: Optional[float] = None,
+    near: Optional[str] = None,
+    radiusKm: float = DEFAULT_RADIUS_KM
 ):
-    query = {}
+    cache_key, cached = await response_cache.lookup("entrepreneurs", {
+        "search": search, "location": location, "city": city, "profileType": profileType,
+        "tags": tags, "minRating": minRating, "sort": sort, "limit": limit, "skip": skip,
+        "cursor": cursor, "lat": lat, "lng": lng, "near": near, "radiusKm": radiusKm,
+    }, ("entrepreneurs",))
+    if cached is not None:
+        events.record_many("impressions", cached.profile_ids)
+        return cached_json_response(request, cached)
     
-    # Build query filters
-    if search:
-        query["$or"] = [
-            {"firstName": {"$regex": search, "$options": "i"}},
-            {"lastName": {"$regex": search, "$options": "i"}},
-            {"companyName": {"$regex": search, "$options": "i"}},
-            {"activityName": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-        ]
+    # The cache key embeds the collection version, so it identifies this exact result
+    headers = validator_headers(strong_etag(cache_key) if cache_key else None)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
     
-    if location:
-        query["location"] = location
+    terms, query = directory_query(search, location, city, profileType, tags, minRating)
+    sort_field = "rating" if sort == "rating" else "createdAt"
     
-    if city:
-        query["city"] = city
+    origin = None
+    if lat is not None or lng is not None or near:
+        origin = proximity_origin(lat, lng, near, location)
+        if not 0 < radiusKm <= MAX_RADIUS_KM:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"radiusKm must be between 0 and {MAX_RADIUS_KM}"
+            )
+        if cursor is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Proximity search is paginated with skip"
+            )
     
-    if profileType:
-        query["profileType"] = profileType
+    if cursor is not None:
+        if sort == "relevance" and terms:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor pagination supports the createdAt and rating sorts"
+            )
+        if cursor:
+            try:
+                after_value, after_id = decode_cursor(cursor, sort_field)
+            except InvalidCursor as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+            after = keyset_filter(sort_field, after_value, after_id)
+            query = {"$and": [query, after]} if query else after
+        skip = 0
     
-    if tags:
-        tag_list = [t.strip() for t in tags.split(",")]
-        query["tags"] = {"$in": tag_list}
+    if FAST_SERIALIZATION:
+        projection = PUBLIC_DOCUMENTS.projection
+    else:
+        projection = {"_id": 0, "phone": 0, "whatsapp": 0, "email": 0, **SEARCH_PROJECTION, **GEO_PROJECTION}  # Hide contact info
     
-    if minRating:
-        query["rating"] = {"$gte": minRating}
+    if search and not terms:
+        # Nothing searchable in the query (e.g. a single character)
+        entrepreneurs = []
+    elif origin is not None:
+        # Ordered by distance through the 2dsphere index
+        entrepreneurs = await repo.list_profiles_near(
+            near_stage(*origin, radiusKm, query), projection, skip, limit
+        )
+    elif sort == "relevance" and terms:
+        # Weighted score computed server-side from the indexed search terms
+        entrepreneurs = await repo.list_profiles(
+            query, projection, [("rating", -1), ("createdAt", -1)], skip, limit,
+            score=score_expression(terms)
+        )
+    else:
+        # id breaks ties so the order, and therefore every cursor, is stable
+        entrepreneurs = await repo.list_profiles(query, projection, [(sort_field, -1), ("id", -1)], skip, limit)
+    
+    profile_ids = [ent['id'] for ent in entrepreneurs]
+    events.record_many("impressions", profile_ids)
     
-    # Sort
-    sort_field = "createdAt"
-    sort_direction = -1
-    if sort == "rating":
-        sort_field = "rating"
-    elif sort == "relevance" and search:
-        sort_field = "rating"  # Can improve with text search score
+    next_cursor = None
+    if cursor is not None and entrepreneurs and len(entrepreneurs) == limit:
+        next_cursor = encode_cursor(sort_field, entrepreneurs[-1])
     
-    entrepreneurs = await db.entrepreneurs.find(
-        query, 
-        {"_id": 0, "phone": 0, "whatsapp": 0, "email": 0}  # Hide contact info
-    ).sort(sort_field, sort_direction).skip(skip).limit(limit).to_list(limit)
+    if FAST_SERIALIZATION:
+        with timed("encoding"):
+            if cursor is not None:
+                body = PUBLIC_DOCUMENTS.encode_page(entrepreneurs, next_cursor)
+            else:
+                body = PUBLIC_DOCUMENTS.encode_list(entrepreneurs)
+        await response_cache.store(cache_key, CachedResponse(body, headers, profile_ids))
+        return json_bytes_response(body, headers)
     
-    # Convert ISO strings to datetime
-    for ent in entrepreneurs:
-        if isinstance(ent.get('createdAt'), str):
-            ent['createdAt'] = datetime.fromisoformat(ent['createdAt'])
-        if isinstance(ent.get('updatedAt'), str):
-            ent['updatedAt'] = datetime.fromisoformat(ent['updatedAt'])
+    with timed("validation"):
+        if cursor is not None:
+            response = EntrepreneurPage(items=entrepreneurs, nextCursor=next_cursor)
+        else:
+            response = ENTREPRENEUR_LIST.validate_python(entrepreneurs)
+    with timed("encoding"):
+        body = (ENTREPRENEUR_PAGE if cursor is not None else ENTREPRENEUR_LIST).dump_json(response)
+    await response_cache.store(cache_key, CachedResponse(body, headers, profile_ids))
+    return json_bytes_response(body, headers)
+
+@api_router.post("/entrepreneurs/batch", response_model=EntrepreneurBatch)
+async def get_entrepreneurs_batch(request: Request, batch: EntrepreneurBatchRequest):
+    """Public profiles of up to BATCH_MAX_IDS ids in one query, for lists of cards"""
+    cache_key, cached = await response_cache.lookup("entrepreneur_batch", {"ids": batch.ids}, ("entrepreneurs",))
+    if cached is not None:
+        events.record_many("impressions", cached.profile_ids)
+        return cached_json_response(request, cached)
+    
+    # Same projections and encoders as get_entrepreneur
+    if FAST_SERIALIZATION:
+        projection = PUBLIC_DOCUMENTS.projection
+    else:
+        projection = {"_id": 0, "phone": 0, "whatsapp": 0, "email": 0, **SEARCH_PROJECTION, **GEO_PROJECTION}
+    found = await repo.get_profiles(batch.ids, projection)
     
-    return entrepreneurs
+    items = [found.get(entrepreneur_id) for entrepreneur_id in batch.ids]
+    not_found = list(dict.fromkeys(entrepreneur_id for entrepreneur_id in batch.ids if entrepreneur_id not in found))
+    profile_ids = list(found)
+    events.record_many("impressions", profile_ids)
+    
+    if FAST_SERIALIZATION:
+        with timed("encoding"):
+            body = PUBLIC_DOCUMENTS.encode({
+                "items": [PUBLIC_DOCUMENTS.complete(dict(item)) if item else None for item in items],
+                "notFound": not_found,
+            })
+    else:
+        with timed("validation"):
+            response = EntrepreneurBatch(items=items, notFound=not_found)
+        with timed("encoding"):
+            body = ENTREPRENEUR_BATCH.dump_json(response)
+    headers = validator_headers(strong_etag(cache_key) if cache_key else None)
+    await response_cache.store(cache_key, CachedResponse(body, headers, profile_ids))
+    return json_bytes_response(body, headers)
+
+# Declared before /entrepreneurs/{entrepreneur_id}, which would otherwise match it
+@api_router.get("/entrepreneurs/facets", response_model=EntrepreneurFacets)
+async def get_entrepreneur_facets(
+    request: Request,
+    search: Optional[str] = None,
+    location: Optional[str] = None,
+    city: Optional[str] = None,
+    profileType: Optional[str] = None,
+    tags: Optional[str] = None,  # Comma-separated
+    minRating: Optional[float] = None
+):
+    """Counts per location, city, profile type and tag of the profiles matching the filters"""
+    cache_key, cached = await response_cache.lookup("entrepreneur_facets", {
+        "search": search, "location": location, "city": city, "profileType": profileType,
+        "tags": tags, "minRating": minRating,
+    }, ("entrepreneurs",))
+    if cached is not None:
+        return cached_json_response(request, cached)
+    
+    headers = validator_headers(strong_etag(cache_key) if cache_key else None)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    
+    terms, query = directory_query(search, location, city, profileType, tags, minRating)
+    fields = ["location", "city", "profileType", "tags"]
+    if search and not terms:
+        # Nothing searchable in the query, as in get_entrepreneurs
+        facets = {"total": 0, **{field: [] for field in fields}}
+    else:
+        facets = await repo.count_facets(query, fields, FACET_LIMIT, array_fields=["tags"])
+    
+    body = ENTREPRENEUR_FACETS.dump_json(EntrepreneurFacets(**facets))
+    await response_cache.store(cache_key, CachedResponse(body, headers), ttl=FACETS_CACHE_TTL)
+    return json_bytes_response(body, headers)
 
 @api_router.get("/entrepreneurs/{entrepreneur_id}", response_model=EntrepreneurPublic)
-async def get_entrepreneur(entrepreneur_id: str):
-    entrepreneur = await db.entrepreneurs.find_one(
-        {"id": entrepreneur_id},
-        {"_id": 0, "phone": 0, "whatsapp": 0, "email": 0}
-    )
+async def get_entrepreneur(entrepreneur_id: str, request: Request):
+    cache_key, cached = await response_cache.lookup("entrepreneur", {"id": entrepreneur_id}, ("entrepreneurs",))
+    if cached is not None:
+        events.record("views", entrepreneur_id)
+        return cached_json_response(request, cached)
+    
+    if FAST_SERIALIZATION:
+        # updatedAt feeds the validators and is dropped before encoding
+        projection = {**PUBLIC_DOCUMENTS.projection, "updatedAt": 1}
+    else:
+        projection = {"_id": 0, "phone": 0, "whatsapp": 0, "email": 0, **SEARCH_PROJECTION, **GEO_PROJECTION}
+    entrepreneur = await repo.get_profile({"id": entrepreneur_id}, projection)
     
     if not entrepreneur:
         raise HTTPException(
@@ -488,18 +938,29 @@ async def get_entrepreneur(entrepreneur_id: str):
             detail="Entrepreneur not found"
         )
     
-    # Convert ISO strings to datetime
-    if isinstance(entrepreneur.get('createdAt'), str):
-        entrepreneur['createdAt'] = datetime.fromisoformat(entrepreneur['createdAt'])
-    if isinstance(entrepreneur.get('updatedAt'), str):
-        entrepreneur['updatedAt'] = datetime.fromisoformat(entrepreneur['updatedAt'])
+    events.record("views", entrepreneur_id)
     
-    return entrepreneur
+    updated_at = entrepreneur.get('updatedAt')
+    headers = validator_headers(strong_etag(entrepreneur['id'], updated_at), updated_at)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    
+    if FAST_SERIALIZATION:
+        entrepreneur.pop('updatedAt', None)
+        with timed("encoding"):
+            body = PUBLIC_DOCUMENTS.encode(PUBLIC_DOCUMENTS.complete(entrepreneur))
+    else:
+        with timed("validation"):
+            entrepreneur = ENTREPRENEUR_PUBLIC.validate_python(entrepreneur)
+        with timed("encoding"):
+            body = ENTREPRENEUR_PUBLIC.dump_json(entrepreneur)
+    await response_cache.store(cache_key, CachedResponse(body, headers))
+    return json_bytes_response(body, headers)
 
 @api_router.get("/entrepreneurs/{entrepreneur_id}/contact", response_model=EntrepreneurContactInfo)
 async def get_entrepreneur_contact(entrepreneur_id: str):
     """Protected endpoint - returns contact info (anti-scraping)"""
-    entrepreneur = await db.entrepreneurs.find_one(
+    entrepreneur = await repo.get_profile(
         {"id": entrepreneur_id},
         {"_id": 0, "phone": 1, "whatsapp": 1, "email": 1}
     )
@@ -510,6 +971,8 @@ async def get_entrepreneur_contact(entrepreneur_id: str):
             detail="Entrepreneur not found"
         )
     
+    events.record("contactReveals", entrepreneur_id)
+    
     return EntrepreneurContactInfo(
         phone=entrepreneur['phone'],
         whatsapp=entrepreneur['whatsapp'],
@@ -519,9 +982,9 @@ async def get_entrepreneur_contact(entrepreneur_id: str):
 @api_router.get("/entrepreneurs/user/me", response_model=Entrepreneur)
 async def get_my_profile(current_user: User = Depends(get_current_user)):
     """Get current user's entrepreneur profile"""
-    entrepreneur = await db.entrepreneurs.find_one(
+    entrepreneur = await repo.get_profile(
         {"userId": current_user.id},
-        {"_id": 0}
+        {"_id": 0, **SEARCH_PROJECTION, **GEO_PROJECTION}
     )
     
     if not entrepreneur:
@@ -530,49 +993,223 @@ async def get_my_profile(current_user: User = Depends(get_current_user)):
             detail="Profile not found"
         )
     
-    # Convert ISO strings to datetime
-    if isinstance(entrepreneur.get('createdAt'), str):
-        entrepreneur['createdAt'] = datetime.fromisoformat(entrepreneur['createdAt'])
-    if isinstance(entrepreneur.get('updatedAt'), str):
-        entrepreneur['updatedAt'] = datetime.fromisoformat(entrepreneur['updatedAt'])
-    
     return entrepreneur
 
 @api_router.put("/entrepreneurs/{entrepreneur_id}", response_model=Entrepreneur)
 async def update_entrepreneur(
     entrepreneur_id: str,
     entrepreneur_data: EntrepreneurCreate,
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
-    # Check ownership
-    existing = await db.entrepreneurs.find_one({"id": entrepreneur_id})
-    if not existing or existing['userId'] != current_user.id:
+    # Before storing images or rendering variants, so other users cannot
+    # use the route to fill the media store or load the image workers
+    if not await repo.owns_profile(entrepreneur_id, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this profile"
         )
     
-    # Update
-    update_data = entrepreneur_data.model_dump()
-    update_data['updatedAt'] = datetime.now(timezone.utc).isoformat()
+    update_data = await store_profile_images(entrepreneur_data.model_dump(), request)
+    update_data['updatedAt'] = datetime.now(timezone.utc)
+    update_data.update(search_document(update_data))
+    update_data.update(geo_document(update_data))
     
-    await db.entrepreneurs.update_one(
-        {"id": entrepreneur_id},
-        {"$set": update_data}
+    # Update and read back, still guarded by the owner
+    updated = await repo.update_owned_profile(
+        entrepreneur_id, current_user.id, update_data, {"_id": 0, **SEARCH_PROJECTION, **GEO_PROJECTION}
     )
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to update this profile"
+        )
     
-    # Get updated profile
-    updated = await db.entrepreneurs.find_one({"id": entrepreneur_id}, {"_id": 0})
-    
-    # Convert ISO strings to datetime
-    if isinstance(updated.get('createdAt'), str):
-        updated['createdAt'] = datetime.fromisoformat(updated['createdAt'])
-    if isinstance(updated.get('updatedAt'), str):
-        updated['updatedAt'] = datetime.fromisoformat(updated['updatedAt'])
+    await response_cache.invalidate("entrepreneurs")
     
     return updated
 
 
+# ========== MEDIA ROUTES ==========
+
+@api_router.post("/media", response_model=MediaUpload)
+async def upload_media(
+    request: Request,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Upload a logo or portfolio image; identical files are stored once"""
+    data = await file.read(MAX_IMAGE_BYTES + 1)
+    try:
+        info = await media_store.save(data)
+    except InvalidImage as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return MediaUpload(
+        hash=info.digest,
+        url=media_url(info.digest, str(request.base_url)),
+        size=info.size,
+        contentType=info.content_type
+    )
+
+@api_router.get("/media/{digest}")
+async def get_media(digest: str, request: Request):
+    """Stream a stored image with ETag and Range support"""
+    info = await media_store.stat(digest) if is_digest(digest) else None
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Media not found"
+        )
+    
+    # Content-addressed: the hash is a strong validator and the bytes never change
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or f'"{digest}"' in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    try:
+        byte_range = parse_range(request.headers.get("range"), info.size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{info.size}"}
+        )
+    
+    status_code = status.HTTP_200_OK
+    start, end = 0, info.size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        media_store.iter_range(digest, start, end),
+        status_code=status_code,
+        media_type=info.content_type,
+        headers=headers
+    )
+
+
+# ========== EXPORT ROUTES ==========
+
+def export_documents(since: Optional[datetime] = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Cursor over the exported profiles, updated at or after since when given"""
+    query = {"updatedAt": {"$gte": since}} if since else {}
+    if FAST_SERIALIZATION:
+        projection = EXPORT_DOCUMENTS.projection
+    else:
+        projection = {"_id": 0, "phone": 0, "whatsapp": 0, "email": 0, **SEARCH_PROJECTION, **GEO_PROJECTION}
+    return repo.export_profiles(query, projection, batch_size)
+
+def export_row(doc: dict) -> dict:
+    if FAST_SERIALIZATION:
+        row = EXPORT_DOCUMENTS.complete(doc)
+    else:
+        row = ENTREPRENEUR_EXPORT.validate_python(doc).model_dump()
+    row.pop("distanceKm", None)
+    return row
+
+@api_router.get("/export/entrepreneurs")
+async def export_entrepreneurs(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,  # Incremental export: profiles updated at or after this time
+    x_api_key: Optional[str] = Header(None)
+):
+    """Stream every public profile for partner feeds; gzip-compressed when the client accepts it"""
+    if not valid_api_key(x_api_key, EXPORT_API_KEYS):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="A valid export API key is required"
+        )
+    
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="entrepreneurs-{datetime.now(timezone.utc):%Y%m%d%H%M%S}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_stream(export_documents(since), export_row, format, EXPORT_COLUMNS, compress=compress),
+        media_type=MEDIA_TYPES[format],
+        headers=headers
+    )
+
+
+# ========== IMPORT ROUTES ==========
+
+def validate_import_row(row: dict) -> dict:
+    return EntrepreneurCreate.model_validate(row).model_dump()
+
+def import_profile_document(profile: dict, user_id: str) -> dict:
+    """Complete document of an imported profile, as create_entrepreneur builds it"""
+    entrepreneur_dict = Entrepreneur(userId=user_id, **profile).model_dump()
+    entrepreneur_dict.update(search_document(entrepreneur_dict))
+    entrepreneur_dict.update(geo_document(entrepreneur_dict))
+    return entrepreneur_dict
+
+async def finish_import(result: ImportResult):
+    """Bring the totals and caches up to date with an import"""
+    if result.accounts_created or result.created:
+        await platform_stats.increment(totalUsers=result.accounts_created, totalProfiles=result.created)
+    for user_id in result.updated_user_ids:
+        invalidate_user(user_id)
+    if result.created or result.updated:
+        await response_cache.invalidate("entrepreneurs")
+
+@api_router.post("/import/entrepreneurs", response_model=ImportReport)
+async def import_entrepreneurs(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,  # Default: from the file name or content type
+    dryRun: bool = False,  # Validate only
+    x_api_key: Optional[str] = Header(None)
+):
+    """Create or update partner members' accounts and profiles from a CSV or NDJSON file"""
+    if not valid_api_key(x_api_key, IMPORT_API_KEYS):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="A valid import API key is required"
+        )
+    
+    format = format or detect_format(file.filename, file.content_type)
+    if format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown file format; pass format={' or '.join(FORMATS)}"
+        )
+    if file.size is not None and file.size > IMPORT_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Import files are limited to {IMPORT_MAX_BYTES // (1024 * 1024)} MB"
+        )
+    
+    try:
+        result = await import_rows(repo, read_rows(file.file, format), validate_import_row, import_profile_document,
+                                   dry_run=dryRun)
+    except InviteUrlNotConfigured as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    await finish_import(result)
+    logger.info(f"Imported {result.rows} rows ({result.created} created, {result.updated} updated, "
+                f"{result.failed} failed) at {result.rows_per_second} rows/s")
+    
+    return result.report()
+
+
 # ========== CONTACT ROUTES ==========
 
 @api_router.post("/contact", response_model=ContactMessage)
@@ -580,9 +1217,8 @@ async def create_contact_message(message_data: ContactMessageCreate):
     message = ContactMessage(**message_data.model_dump())
     
     message_dict = message.model_dump()
-    message_dict['createdAt'] = message_dict['createdAt'].isoformat()
     
-    await db.contact_messages.insert_one(message_dict)
+    await repo.insert_contact_message(message_dict)
     
     return message
 
@@ -590,19 +1226,35 @@ async def create_contact_message(message_data: ContactMessageCreate):
 # ========== STATS ROUTES ==========
 
 @api_router.get("/stats", response_model=Stats)
-async def get_stats():
-    total_users = await db.users.count_documents({})
-    total_profiles = await db.entrepreneurs.count_documents({})
-    # Views can be tracked with a separate collection or counter
-    total_views = 0  # Placeholder
-    total_problems = 0  # Placeholder
-    
-    return Stats(
-        totalUsers=total_users,
-        totalProfiles=total_profiles,
-        totalViews=total_views,
-        totalProblems=total_problems
-    )
+async def get_stats(request: Request):
+    totals = await platform_stats.read()
+    headers = validator_headers(strong_etag("stats", *(totals[field] for field in STATS_FIELDS)))
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    
+    return json_bytes_response(STATS.dump_json(Stats(**totals)), headers)
+
+
+# ========== METRICS ROUTES ==========
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """Prometheus text exposition of the in-process metrics.
+
+    They reveal database addresses and traffic, so a metrics API key is
+    required, in X-API-Key or as a bearer token (Prometheus ``authorization``).
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    key = x_api_key or (token if scheme.lower() == "bearer" else None)
+    if not valid_api_key(key, METRICS_API_KEYS):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="A valid metrics API key is required"
+        )
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 # ========== ROOT ROUTE ==========
@@ -616,9 +1268,25 @@ async def root():
     }
 
 
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication is temporarily overloaded, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(
+    RateLimitMiddleware,
+    policies=RATE_LIMITS,
+    store=create_rate_limit_store(),
+    user_key=token_subject,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -627,6 +1295,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the timings cover the other middlewares too
+app.add_middleware(InstrumentationMiddleware)
+
+@app.on_event("startup")
+async def warm_database():
+    await warm_pool(client)
+
+@app.on_event("startup")
+async def prepare_indexes():
+    # One account per email and one profile per user are enforced by unique
+    # indexes; without them startup fails (MissingUniqueIndexes) rather than
+    # serving writes that could create duplicates. Other index failures are
+    # only logged.
+    await ensure_indexes(db)
+    
+    # Sorting, cursors and exports need every timestamp stored as a BSON date
+    for name, converted in (await migrate_dates(db)).items():
+        if converted:
+            logger.info(f"Converted string timestamps on {converted} {name} documents")
+    
+    backfilled = await backfill_search_terms(db.entrepreneurs)
+    if backfilled:
+        logger.info(f"Backfilled search terms on {backfilled} entrepreneur profiles")
+    
+    # Marked done after the first complete run, then skipped
+    located = await backfill_pending_points(db)
+    if located:
+        logger.info(f"Backfilled points on {located} entrepreneur profiles")
+
+@app.on_event("startup")
+async def start_stats():
+    await platform_stats.bootstrap()
+    events.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Write buffered analytics before the client goes away
+    await events.stop()
+    password_hasher.shutdown()
+    imaging.shutdown()
     client.close()
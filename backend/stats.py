@@ -0,0 +1,95 @@
+"""Platform statistics kept in a single, incrementally maintained document.
+
+Registrations and profile creations ``$inc`` the ``stats`` document as they
+happen. Profile views and contact reveals are far more frequent; they go
+through the analytics pipeline in ``events.py``, whose flushes add them here
+in batches, so the read paths never wait on a write. ``/api/stats`` is a
+point read of the document, cached in memory.
+
+The totals can be recomputed from the collections with:
+
+    python stats.py --rebuild
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "platform"
+STATS_FIELDS = ("totalUsers", "totalProfiles", "totalViews", "totalContactReveals", "totalProblems")
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', 10))
+
+
+class PlatformStats:
+    def __init__(self, db, cache_ttl: float = STATS_CACHE_TTL):
+        self.db = db
+        self.cache_ttl = cache_ttl
+        self._cached: Optional[dict] = None
+        self._cached_at = 0.0
+
+    async def bootstrap(self):
+        """Create the stats document from the collections if it does not exist yet"""
+        if await self.db.stats.find_one({"_id": STATS_ID}, {"_id": 1}):
+            return
+        totals = await self._count()
+        try:
+            await self.db.stats.update_one({"_id": STATS_ID}, {"$setOnInsert": totals}, upsert=True)
+        except DuplicateKeyError:
+            # Another worker created it first
+            pass
+
+    async def rebuild(self) -> dict:
+        """Recompute user and profile totals; event counters are kept"""
+        totals = await self._count()
+        await self.db.stats.update_one({"_id": STATS_ID}, {"$set": totals}, upsert=True)
+        self._cached = None
+        return totals
+
+    async def _count(self) -> dict:
+        return {
+            "totalUsers": await self.db.users.count_documents({}),
+            "totalProfiles": await self.db.entrepreneurs.count_documents({}),
+        }
+
+    async def increment(self, **fields: int):
+        """Atomically apply counter changes now"""
+        await self.db.stats.update_one({"_id": STATS_ID}, {"$inc": fields}, upsert=True)
+
+    async def read(self) -> dict:
+        now = time.monotonic()
+        if self._cached is not None and now - self._cached_at < self.cache_ttl:
+            return self._cached
+        doc = await self.db.stats.find_one({"_id": STATS_ID}) or {}
+        self._cached = {field: doc.get(field, 0) for field in STATS_FIELDS}
+        self._cached_at = now
+        return self._cached
+
+
+async def main() -> int:
+    root_dir = Path(__file__).parent
+    load_dotenv(root_dir / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'nexus_connect')]
+    try:
+        totals = await PlatformStats(db).rebuild()
+        print(f"✅ Stats rebuilt: {totals}")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the platform statistics document")
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    parser.parse_args()
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Modules read their settings at import time; nothing here connects to it
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("FIREBASE_PROJECT_ID", "nexus-test")
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """The API module over an in-memory database and a temporary media store.
+
+    The indexes are created; the other startup hooks (migrations, background
+    tasks) are not run.
+    """
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+    from events import EventPipeline
+    from indexes import ensure_indexes
+    from media import LocalMediaStore
+    from repository import Repository
+    from response_cache import create_response_cache
+    from stats import PlatformStats
+
+    db = mongomock_motor.AsyncMongoMockClient()["nexus_test"]
+    asyncio.run(ensure_indexes(db))
+    platform_stats = PlatformStats(db)
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "repo", Repository(db))
+    monkeypatch.setattr(server, "media_store", LocalMediaStore(tmp_path / "media"))
+    monkeypatch.setattr(server, "response_cache", create_response_cache(db))
+    monkeypatch.setattr(server, "platform_stats", platform_stats)
+    monkeypatch.setattr(server, "events", EventPipeline(db, platform_stats))
+    server.user_cache.clear()
+    return server
+
+
+@pytest.fixture
+def client(server):
+    from fastapi.testclient import TestClient
+
+    return TestClient(server.app)
@@ -0,0 +1,44 @@
+"""Data and shortcuts shared by the API tests (see the server fixture in conftest)"""
+import asyncio
+import base64
+import io
+
+from PIL import Image
+
+PROFILE = {
+    "profileType": "freelance", "firstName": "Awa", "description": "Développeuse web", "tags": ["Web"],
+    "phone": "+221700000000", "whatsapp": "+221700000000", "email": "awa@example.com",
+    "location": "SN", "city": "Dakar",
+}
+
+
+def add_user(server, user_id="u1", **fields) -> dict:
+    user = {"id": user_id, "email": f"{user_id}@example.com", "firstName": "Awa", "hasProfile": False, **fields}
+    asyncio.run(server.db.users.insert_one(dict(user)))
+    return user
+
+
+def token_for(server, user: dict) -> str:
+    return server.create_access_token(server.token_claims(user))
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_profile(server, client, user_id="u1", **fields) -> dict:
+    """A user and their profile, created through the API"""
+    token = token_for(server, add_user(server, user_id))
+    response = client.post("/api/entrepreneurs", json={**PROFILE, **fields}, headers=auth(token))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def png(width=8, height=8, color=(200, 30, 30)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+
+def data_url(data: bytes, content_type="image/png") -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode()}"
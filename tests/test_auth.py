@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from tests.helpers import PROFILE, add_user, auth, token_for
+
+
+@pytest.fixture
+def lookups(server, monkeypatch):
+    """User ids read from the database by the auth dependency"""
+    calls = []
+    get_user = server.repo.get_user
+
+    async def counting(user_id):
+        calls.append(user_id)
+        return await get_user(user_id)
+
+    monkeypatch.setattr(server.repo, "get_user", counting)
+    return calls
+
+
+def me(client, token):
+    return client.get("/api/auth/me", headers=auth(token))
+
+
+def rename(server, user_id, name):
+    asyncio.run(server.db.users.update_one({"id": user_id}, {"$set": {"firstName": name}}))
+
+
+def test_cache_mode_reads_each_user_once(server, client, lookups, monkeypatch):
+    monkeypatch.setattr(server, "AUTH_MODE", "cache")
+    user = add_user(server)
+    token = token_for(server, user)
+
+    assert me(client, token).json()["firstName"] == "Awa"
+    assert me(client, token).status_code == 200
+    assert lookups == ["u1"]
+
+    # Changes made elsewhere (another worker) show once the entry is invalidated or expires
+    rename(server, "u1", "Aminata")
+    assert me(client, token).json()["firstName"] == "Awa"
+    server.invalidate_user("u1")
+    assert me(client, token).json()["firstName"] == "Aminata"
+
+
+def test_cache_mode_sees_its_own_profile_creation(server, client, lookups, monkeypatch):
+    monkeypatch.setattr(server, "AUTH_MODE", "cache")
+    token = token_for(server, add_user(server))
+    headers = auth(token)
+
+    assert me(client, token).json()["hasProfile"] is False
+    assert client.post("/api/entrepreneurs", json=PROFILE, headers=headers).status_code == 200
+    assert me(client, token).json()["hasProfile"] is True
+    assert client.post("/api/entrepreneurs", json=PROFILE, headers=headers).status_code == 400
+
+
+def test_claims_mode_trusts_the_token(server, client, lookups, monkeypatch):
+    monkeypatch.setattr(server, "AUTH_MODE", "claims")
+    user = add_user(server)
+    token = token_for(server, user)
+
+    assert me(client, token).json() == {
+        "id": "u1", "email": "u1@example.com", "firstName": "Awa", "lastName": None, "hasProfile": False,
+    }
+    assert client.post("/api/entrepreneurs", json=PROFILE, headers=auth(token)).status_code == 200
+    assert lookups == []
+    # Claims are those of the token until the user signs in again
+    assert me(client, token).json()["hasProfile"] is False
+    fresh = token_for(server, asyncio.run(server.repo.get_user("u1")))
+    assert me(client, fresh).json()["hasProfile"] is True
+
+
+def test_claims_mode_falls_back_for_tokens_without_claims(server, client, lookups, monkeypatch):
+    user = add_user(server)
+    monkeypatch.setattr(server, "AUTH_MODE", "cache")
+    token = token_for(server, user)
+    monkeypatch.setattr(server, "AUTH_MODE", "claims")
+
+    assert me(client, token).json()["email"] == "u1@example.com"
+    assert lookups == ["u1"]
+
+
+def test_db_mode_reads_the_user_on_every_request(server, client, lookups, monkeypatch):
+    monkeypatch.setattr(server, "AUTH_MODE", "db")
+    token = token_for(server, add_user(server))
+
+    assert me(client, token).json()["firstName"] == "Awa"
+    rename(server, "u1", "Aminata")
+    assert me(client, token).json()["firstName"] == "Aminata"
+    assert lookups == ["u1", "u1"]
+    assert server.user_cache.get("u1") is None
+
+
+@pytest.mark.parametrize("mode", ["cache", "claims", "db"])
+def test_invalid_tokens_are_rejected(server, client, monkeypatch, mode):
+    monkeypatch.setattr(server, "AUTH_MODE", mode)
+    user = add_user(server)
+
+    assert me(client, "not-a-token").status_code == 401
+    forged = server.jwt.encode(server.token_claims(user), "another-secret", algorithm=server.ALGORITHM)
+    assert me(client, forged).status_code == 401
+    # A deleted account (no claims to fall back on)
+    unknown = server.create_access_token({"sub": "missing"})
+    assert me(client, unknown).status_code == 401
+    assert client.get("/api/auth/me").status_code == 401
@@ -0,0 +1,51 @@
+import pytest
+
+from tests.helpers import create_profile
+
+
+@pytest.fixture(params=[True, False], ids=["fast", "validated"])
+def serialization(server, monkeypatch, request):
+    monkeypatch.setattr(server, "FAST_SERIALIZATION", request.param)
+
+
+def batch(client, ids):
+    return client.post("/api/entrepreneurs/batch", json={"ids": ids})
+
+
+def test_profiles_in_requested_order(server, client, serialization):
+    first = create_profile(server, client, "u1")
+    second = create_profile(server, client, "u2", firstName="Kofi", city="Accra", location="GH")
+
+    response = batch(client, [second["id"], "missing", first["id"], second["id"], "missing"])
+    assert response.status_code == 200
+    body = response.json()
+    assert [item and item["id"] for item in body["items"]] == [
+        second["id"], None, first["id"], second["id"], None,
+    ]
+    assert body["items"][0]["firstName"] == "Kofi"
+    # Each missing id reported once; contact details stay hidden
+    assert body["notFound"] == ["missing"]
+    assert "email" not in body["items"][0] and "phone" not in body["items"][0]
+
+
+def test_batch_is_cached_until_a_profile_changes(server, client):
+    profile = create_profile(server, client)
+    response = batch(client, [profile["id"]])
+    etag = response.headers["etag"]
+
+    cached = client.post("/api/entrepreneurs/batch", json={"ids": [profile["id"]]}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert batch(client, [profile["id"]]).content == response.content
+
+    create_profile(server, client, "u2")
+    assert batch(client, [profile["id"]]).headers["etag"] != etag
+
+
+def test_batch_size_limits(server, client):
+    assert batch(client, []).status_code == 422
+    assert batch(client, [f"id-{i}" for i in range(server.BATCH_MAX_IDS + 1)]).status_code == 422
+
+    response = batch(client, [f"id-{i}" for i in range(server.BATCH_MAX_IDS)])
+    assert response.status_code == 200
+    assert len(response.json()["notFound"]) == server.BATCH_MAX_IDS
+    assert client.post("/api/entrepreneurs/batch", json={}).status_code == 422
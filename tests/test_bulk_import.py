@@ -0,0 +1,247 @@
+import asyncio
+import io
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel
+
+import bulk_import
+from bulk_import import InviteUrlNotConfigured, detect_format, hash_token, import_rows, read_rows
+
+
+@pytest.fixture(autouse=True)
+def invite_url(monkeypatch):
+    monkeypatch.setattr(bulk_import, "INVITE_URL", "https://app.example/invite?token={token}")
+
+
+class Member(BaseModel):
+    email: str
+    companyName: str
+    firstName: Optional[str] = None
+    lastName: Optional[str] = None
+    logo: Optional[str] = None
+    tags: List[str] = []
+    portfolio: List[dict] = []
+
+
+def validate(row: dict) -> dict:
+    return Member.model_validate(row).model_dump()
+
+
+def build_profile(profile: dict, user_id: str) -> dict:
+    return {**profile, "id": f"profile-{user_id}", "userId": user_id}
+
+
+class FakeRepo:
+    """The repository calls made by the importer, over in-memory accounts and profiles"""
+
+    def __init__(self):
+        self.users = {}
+        self.profiles = {}
+        self.failing_profiles = set()
+        self.unflagged = []
+
+    def add_user(self, email: str, **fields):
+        self.users[email] = {"id": f"user-{email}", "email": email, "googleId": None, **fields}
+
+    @staticmethod
+    def _pending(user: dict) -> bool:
+        return "importedAt" in user and "activatedAt" not in user and user.get("googleId") is None
+
+    async def upsert_pending_users(self, users, changes):
+        inserted, failed = {}, {}
+        for index, (user, change) in enumerate(zip(users, changes)):
+            existing = self.users.get(user["email"])
+            if existing is None:
+                self.users[user["email"]] = {**user, **change}
+                inserted[index] = index
+            elif self._pending(existing):
+                existing.update(change)
+            else:
+                # The upsert misses the claimed account and hits the unique email index
+                failed[index] = {"index": index, "code": 11000, "errmsg": "E11000 duplicate key"}
+        return inserted, failed
+
+    async def user_ids_by_email(self, emails):
+        return {
+            email: self.users[email]["id"]
+            for email in emails if email in self.users and self._pending(self.users[email])
+        }
+
+    async def upsert_imported_profiles(self, profiles, insert_only):
+        created, failed = {}, {}
+        for position, profile in enumerate(profiles):
+            if profile["email"] in self.failing_profiles:
+                failed[position] = {"index": position, "code": 2, "errmsg": "Profile rejected"}
+                continue
+            existing = self.profiles.get(profile["userId"])
+            if existing is None:
+                self.profiles[profile["userId"]] = dict(profile)
+                created[position] = profile["userId"]
+            else:
+                existing.update({k: v for k, v in profile.items() if k not in insert_only})
+        return created, failed
+
+    async def clear_profile_flags(self, user_ids):
+        self.unflagged.extend(user_ids)
+
+
+def run_import(repo, data: bytes, fmt: str, **options):
+    return asyncio.run(import_rows(repo, read_rows(io.BytesIO(data), fmt), validate, build_profile, **options))
+
+
+def errors_by_row(result):
+    return {error["row"]: error["errors"] for error in result.errors}
+
+
+def test_detect_format():
+    assert detect_format("members.csv", None) == "csv"
+    assert detect_format("members.jsonl", None) == "ndjson"
+    assert detect_format(None, "text/csv") == "csv"
+    assert detect_format("members.xlsx", None) is None
+
+
+def test_read_csv_rows():
+    data = (
+        "﻿email,companyName,tags,portfolio,logo\n"
+        'a@example.com,A,"web|design, print","[{""type"": ""link"", ""value"": ""https://a""}]",\n'
+        "b@example.com,B,,not json,\n"
+    ).encode()
+    rows = list(read_rows(io.BytesIO(data), "csv"))
+    assert rows[0] == (1, {
+        "email": "a@example.com", "companyName": "A", "tags": ["web", "design", "print"],
+        "portfolio": [{"type": "link", "value": "https://a"}],
+    }, None)
+    assert rows[1] == (2, None, "portfolio: must be a JSON array")
+
+
+def test_read_ndjson_rows():
+    data = b'{"email": "a@example.com"}\n\nnot json\n[1]\n'
+    assert list(read_rows(io.BytesIO(data), "ndjson")) == [
+        (1, {"email": "a@example.com"}, None),
+        (2, None, "Invalid JSON"),
+        (3, None, "Each line must be a JSON object"),
+    ]
+
+
+def test_import_creates_accounts_profiles_and_invites():
+    repo = FakeRepo()
+    result = run_import(repo, b"email,companyName\na@example.com,A\nb@example.com,B\n", "csv")
+
+    assert (result.rows, result.created, result.updated, result.failed) == (2, 2, 0, 0)
+    assert result.accounts_created == 2
+    account = repo.users["a@example.com"]
+    assert account["password"] is None and account["hasProfile"] is True
+    # Only the hash of the token sent to the member is stored
+    token = result.invites[0]["inviteUrl"].split("token=")[1]
+    assert account["inviteTokenHash"] == hash_token(token)
+    assert result.updated_user_ids == []
+
+
+def test_invalid_duplicate_and_inline_image_rows_are_reported():
+    repo = FakeRepo()
+    data = b"\n".join([
+        b'{"email": "a@example.com", "companyName": "A"}',
+        b'{"email": "b@example.com"}',
+        b'{"email": "a@example.com", "companyName": "A again"}',
+        b'{"email": "c@example.com", "companyName": "C", "logo": "data:image/png;base64,AAAA"}',
+    ])
+    result = run_import(repo, data, "ndjson")
+
+    errors = errors_by_row(result)
+    assert errors[2] == ["companyName: Field required"]
+    assert errors[3] == ["Same email as row 1"]
+    assert errors[4] == ["Images must be URLs; upload them through /api/media first"]
+    assert result.created == 1 and set(repo.users) == {"a@example.com"}
+
+
+def test_claimed_accounts_are_left_untouched():
+    repo = FakeRepo()
+    repo.add_user("self@example.com", password="hash")
+    repo.add_user("google@example.com", importedAt=1, googleId="g-1")
+    repo.add_user("accepted@example.com", importedAt=1, activatedAt=2)
+    data = b"email,companyName\nself@example.com,S\ngoogle@example.com,G\naccepted@example.com,A\n"
+    result = run_import(repo, data, "csv")
+
+    assert result.created == 0 and result.updated == 0
+    assert errors_by_row(result) == {row: ["An account with this email already exists"] for row in (1, 2, 3)}
+    assert "inviteTokenHash" not in repo.users["accepted@example.com"]
+    assert repo.profiles == {}
+
+
+def test_reimport_updates_pending_accounts():
+    repo = FakeRepo()
+    first = run_import(repo, b"email,companyName\na@example.com,A\n", "csv")
+    user_id = first.invites[0]["userId"]
+    second = run_import(repo, b"email,companyName,firstName\na@example.com,A2,Ann\nb@example.com,B,\n", "csv")
+
+    assert (second.created, second.updated, second.accounts_created) == (1, 1, 1)
+    assert second.updated_user_ids == [user_id]
+    assert repo.profiles[user_id]["companyName"] == "A2"
+    assert repo.users["a@example.com"]["firstName"] == "Ann"
+    # A new invite replaces the first one
+    assert first.invites[0]["inviteUrl"] != second.invites[0]["inviteUrl"]
+
+
+def test_failed_profile_clears_the_flag_of_a_new_account():
+    repo = FakeRepo()
+    repo.failing_profiles = {"a@example.com"}
+    result = run_import(repo, b"email,companyName\na@example.com,A\n", "csv")
+
+    assert errors_by_row(result) == {1: ["Profile rejected"]}
+    assert repo.unflagged == [repo.users["a@example.com"]["id"]]
+    assert result.invites == []
+
+
+def test_dry_run_writes_nothing():
+    repo = FakeRepo()
+    result = run_import(repo, b"email,companyName\na@example.com,A\n", "csv", dry_run=True)
+    assert result.rows == 1 and result.failed == 0
+    assert repo.users == {} and repo.profiles == {}
+
+
+def test_rows_are_written_chunk_by_chunk(monkeypatch):
+    repo = FakeRepo()
+    calls = []
+    upsert = repo.upsert_pending_users
+
+    async def counting(users, changes):
+        calls.append(len(users))
+        return await upsert(users, changes)
+
+    monkeypatch.setattr(repo, "upsert_pending_users", counting)
+    lines = [b"email,companyName"] + [f"m{i}@example.com,M{i}".encode() for i in range(5)]
+    result = run_import(repo, b"\n".join(lines), "csv", chunk_size=2)
+    assert calls == [2, 2, 1]
+    assert result.created == 5
+
+
+def test_invite_url(monkeypatch):
+    monkeypatch.setattr(bulk_import, "INVITE_URL", "https://app.example/invite?t={token}")
+    assert bulk_import.invite_url("abc") == "https://app.example/invite?t=abc"
+
+
+@pytest.mark.parametrize("url", ["", "https://app.example/invite"])
+def test_import_requires_an_invite_url(monkeypatch, url):
+    monkeypatch.setattr(bulk_import, "INVITE_URL", url)
+    repo = FakeRepo()
+    with pytest.raises(InviteUrlNotConfigured):
+        run_import(repo, b"email,companyName\na@example.com,A\n", "csv")
+    assert repo.users == {}
+    # Nothing is sent on a dry run
+    assert run_import(repo, b"email,companyName\na@example.com,A\n", "csv", dry_run=True).rows == 1
+
+
+def test_import_endpoint_without_invite_url(server, client, monkeypatch):
+    monkeypatch.setattr(server, "IMPORT_API_KEYS", ["partner-key"])
+    monkeypatch.setattr(bulk_import, "INVITE_URL", "")
+
+    def upload(**params):
+        return client.post("/api/import/entrepreneurs", params=params, headers={"X-API-Key": "partner-key"},
+                           files={"file": ("members.csv", b"email,companyName\na@example.com,A\n", "text/csv")})
+
+    response = upload()
+    assert response.status_code == 503
+    assert "INVITE_URL" in response.json()["detail"]
+    assert upload(dryRun="true").status_code == 200
+    assert asyncio.run(server.db.users.count_documents({})) == 0
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import conditional
+from conditional import http_date, is_not_modified, strong_etag, validator_headers
+
+from tests.helpers import PROFILE, add_user, auth, create_profile, token_for
+
+
+def request(**headers):
+    return SimpleNamespace(headers={name.replace("_", "-"): value for name, value in headers.items()})
+
+
+def test_strong_etag():
+    etag = strong_etag("p1", "2024-01-01")
+    assert etag.startswith('"') and etag.endswith('"') and len(etag) == 34
+    assert etag == strong_etag("p1", "2024-01-01")
+    assert etag != strong_etag("p1", "2024-01-02")
+
+
+def test_http_date_and_validator_headers():
+    assert http_date(datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc)) == "Fri, 01 Mar 2024 12:30:00 GMT"
+    # Naive and ISO string dates are UTC
+    assert http_date("2024-03-01T12:30:00") == "Fri, 01 Mar 2024 12:30:00 GMT"
+
+    headers = validator_headers('"a"', datetime(2024, 3, 1, tzinfo=timezone.utc))
+    assert headers == {
+        "Cache-Control": conditional.PUBLIC_CACHE_CONTROL,
+        "ETag": '"a"',
+        "Last-Modified": "Fri, 01 Mar 2024 00:00:00 GMT",
+    }
+    assert validator_headers(None) == {"Cache-Control": conditional.PUBLIC_CACHE_CONTROL}
+
+
+def test_if_none_match():
+    headers = validator_headers('"a"')
+    assert is_not_modified(request(if_none_match='"a"'), headers)
+    assert is_not_modified(request(if_none_match='"b", W/"a"'), headers)
+    assert is_not_modified(request(if_none_match="*"), headers)
+    assert not is_not_modified(request(if_none_match='"b"'), headers)
+    assert not is_not_modified(request(), headers)
+    # Nothing to compare with
+    assert not is_not_modified(request(if_none_match="*"), validator_headers(None))
+
+
+def test_if_modified_since():
+    modified = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    headers = validator_headers('"a"', modified)
+    assert is_not_modified(request(if_modified_since=http_date(modified)), headers)
+    assert is_not_modified(request(if_modified_since=http_date(modified + timedelta(days=1))), headers)
+    assert not is_not_modified(request(if_modified_since=http_date(modified - timedelta(seconds=1))), headers)
+    assert not is_not_modified(request(if_modified_since="not a date"), headers)
+    # If-None-Match takes precedence
+    assert not is_not_modified(request(if_none_match='"b"', if_modified_since=http_date(modified)), headers)
+
+
+def test_profile_validators(server, client):
+    token = token_for(server, add_user(server))
+    profile_id = client.post("/api/entrepreneurs", json=PROFILE, headers=auth(token)).json()["id"]
+    path = f"/api/entrepreneurs/{profile_id}"
+
+    response = client.get(path)
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    assert response.headers["cache-control"] == conditional.PUBLIC_CACHE_CONTROL
+
+    not_modified = client.get(path, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert client.get(path, headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    updated = client.put(path, json={**PROFILE, "firstName": "Aminata"}, headers=auth(token))
+    assert updated.status_code == 200
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["firstName"] == "Aminata"
+
+
+def test_listing_validators(server, client):
+    token = token_for(server, add_user(server))
+    profile_id = client.post("/api/entrepreneurs", json=PROFILE, headers=auth(token)).json()["id"]
+
+    etag = client.get("/api/entrepreneurs").headers["etag"]
+    # Served from the response cache as well as built
+    assert client.get("/api/entrepreneurs", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/entrepreneurs?limit=5", headers={"If-None-Match": etag}).status_code == 200
+
+    client.put(f"/api/entrepreneurs/{profile_id}", json={**PROFILE, "city": "Thiès"}, headers=auth(token))
+    response = client.get("/api/entrepreneurs", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_stats_validators(server, client):
+    server.platform_stats.cache_ttl = 0
+    etag = client.get("/api/stats").headers["etag"]
+    assert client.get("/api/stats", headers={"If-None-Match": etag}).status_code == 304
+
+    create_profile(server, client)
+    response = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,124 @@
+import asyncio
+
+from pymongo.errors import BulkWriteError
+
+import events
+from events import EventPipeline
+
+
+class FakeStatsCollection:
+    """profile_stats_hourly, failing the upserts of some profiles"""
+
+    def __init__(self):
+        self.counts = {}
+        self.failing = set()
+        self.down = False
+        self.calls = 0
+
+    async def bulk_write(self, operations, ordered):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("no primary")
+        errors = []
+        for index, operation in enumerate(operations):
+            query, update = operation._filter, operation._doc
+            if query["profileId"] in self.failing:
+                errors.append({"index": index, "code": 2, "errmsg": "failed"})
+                continue
+            counters = self.counts.setdefault(query["profileId"], {})
+            for kind, count in update["$inc"].items():
+                counters[kind] = counters.get(kind, 0) + count
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": 0})
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.profile_stats_hourly = FakeStatsCollection()
+
+
+class FakePlatformStats:
+    def __init__(self):
+        self.totals = {}
+
+    async def increment(self, **totals):
+        for name, count in totals.items():
+            self.totals[name] = self.totals.get(name, 0) + count
+
+
+def test_flush_writes_and_counts_platform_totals():
+    db, platform = FakeDatabase(), FakePlatformStats()
+    pipeline = EventPipeline(db, platform)
+    pipeline.record("views", "a")
+    pipeline.record("views", "a")
+    pipeline.record_many("impressions", ["a", "b"])
+
+    assert asyncio.run(pipeline.flush()) is True
+    assert db.profile_stats_hourly.counts == {"a": {"views": 2, "impressions": 1}, "b": {"impressions": 1}}
+    assert platform.totals == {"totalViews": 2}
+
+
+def test_partial_failure_only_keeps_failed_counters():
+    db, platform = FakeDatabase(), FakePlatformStats()
+    pipeline = EventPipeline(db, platform)
+    db.profile_stats_hourly.failing = {"b"}
+    pipeline.record("views", "a")
+    pipeline.record("views", "b")
+
+    assert asyncio.run(pipeline.flush()) is False
+    assert db.profile_stats_hourly.counts == {"a": {"views": 1}}
+    assert platform.totals == {"totalViews": 1}
+
+    db.profile_stats_hourly.failing = set()
+    assert asyncio.run(pipeline.flush()) is True
+    # "a" was not written a second time
+    assert db.profile_stats_hourly.counts == {"a": {"views": 1}, "b": {"views": 1}}
+    assert platform.totals == {"totalViews": 2}
+
+
+def test_outage_keeps_everything_for_the_next_flush():
+    db = FakeDatabase()
+    pipeline = EventPipeline(db)
+    db.profile_stats_hourly.down = True
+    pipeline.record("views", "a")
+    assert asyncio.run(pipeline.flush()) is False
+    pipeline.record("views", "a")
+
+    db.profile_stats_hourly.down = False
+    assert asyncio.run(pipeline.flush()) is True
+    assert db.profile_stats_hourly.counts == {"a": {"views": 2}}
+
+
+def test_buffered_counters_are_capped():
+    db = FakeDatabase()
+    pipeline = EventPipeline(db, max_keys=2)
+    dropped = events.EVENTS_DROPPED.value(reason="buffer_full")
+    db.profile_stats_hourly.down = True
+    pipeline.record_many("views", ["a", "b", "c"])
+    assert asyncio.run(pipeline.flush()) is False
+    # Existing counters still grow
+    pipeline.record_many("views", ["a", "d"])
+
+    db.profile_stats_hourly.down = False
+    assert asyncio.run(pipeline.flush()) is True
+    assert db.profile_stats_hourly.counts == {"a": {"views": 2}, "b": {"views": 1}}
+    assert events.EVENTS_DROPPED.value(reason="buffer_full") - dropped == 2
+
+
+def test_run_backs_off_while_writes_fail():
+    async def scenario():
+        db = FakeDatabase()
+        db.profile_stats_hourly.down = True
+        pipeline = EventPipeline(db, flush_interval=0.01, max_batch=1, max_backoff=0.04)
+        pipeline.record("views", "a")
+        pipeline.start()
+        await asyncio.sleep(0.2)
+        calls = db.profile_stats_hourly.calls
+        db.profile_stats_hourly.down = False
+        await pipeline.stop()
+        return calls, db.profile_stats_hourly.counts
+
+    calls, counts = asyncio.run(scenario())
+    # Without a backoff the full buffer would be retried in a tight loop
+    assert 2 <= calls <= 8
+    assert counts == {"a": {"views": 1}}
@@ -0,0 +1,126 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from export import csv_value, export_stream
+
+from tests.helpers import create_profile
+
+KEY = {"X-API-Key": "partner-key"}
+IDENTITY = {**KEY, "Accept-Encoding": "identity"}
+
+
+@pytest.fixture
+def export_keys(server, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_API_KEYS", ["partner-key"])
+
+
+async def documents(docs):
+    for doc in docs:
+        yield doc
+
+
+def collect(stream) -> bytes:
+    async def read():
+        return b"".join([chunk async for chunk in stream])
+    return asyncio.run(read())
+
+
+DOCS = [
+    {"id": "a", "tags": ["web", "design"], "verified": True, "updatedAt": datetime(2024, 6, 1, tzinfo=timezone.utc)},
+    {"id": "b", "tags": [], "verified": False, "updatedAt": datetime(2024, 6, 2)},
+]
+
+
+def test_ndjson_stream():
+    lines = collect(export_stream(documents(DOCS), dict, "ndjson", ["id"])).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": "a", "tags": ["web", "design"], "verified": True, "updatedAt": "2024-06-01T00:00:00Z"},
+        {"id": "b", "tags": [], "verified": False, "updatedAt": "2024-06-02T00:00:00Z"},
+    ]
+
+
+def test_csv_stream_and_gzip():
+    columns = ["id", "tags", "verified", "updatedAt"]
+    body = collect(export_stream(documents(DOCS), dict, "csv", columns, compress=True))
+    rows = list(csv.reader(io.StringIO(gzip.decompress(body).decode())))
+    assert rows == [
+        columns,
+        ["a", "web|design", "true", "2024-06-01T00:00:00Z"],
+        ["b", "", "false", "2024-06-02T00:00:00Z"],
+    ]
+    # The header alone when there is nothing to export
+    assert collect(export_stream(documents([]), dict, "csv", ["id"])) == b"id\n"
+
+
+def test_csv_values():
+    assert csv_value(None) == ""
+    assert csv_value(4.5) == "4.5"
+    assert csv_value([{"type": "link"}]) == '[{"type":"link"}]'
+
+
+def test_export_requires_a_key(server, client, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_API_KEYS", [])
+    assert client.get("/api/export/entrepreneurs", headers=KEY).status_code == 403
+
+    monkeypatch.setattr(server, "EXPORT_API_KEYS", ["partner-key"])
+    assert client.get("/api/export/entrepreneurs").status_code == 403
+    assert client.get("/api/export/entrepreneurs", headers={"X-API-Key": "wrong"}).status_code == 403
+    assert client.get("/api/export/entrepreneurs", headers=KEY).status_code == 200
+
+
+def test_export_streams_public_rows(server, client, export_keys):
+    first = create_profile(server, client, "u1")
+    second = create_profile(server, client, "u2", firstName="Kofi")
+
+    response = client.get("/api/export/entrepreneurs", headers=IDENTITY)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-disposition"].endswith('.ndjson"')
+    rows = [json.loads(line) for line in response.content.splitlines()]
+    assert [row["id"] for row in rows] == [first["id"], second["id"]]
+    assert set(rows[0]) == set(server.EXPORT_COLUMNS)
+    assert "email" not in rows[0] and "phone" not in rows[0]
+
+    response = client.get("/api/export/entrepreneurs", params={"format": "csv"}, headers=IDENTITY)
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    table = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["firstName"] for row in table] == ["Awa", "Kofi"]
+
+
+def test_export_is_gzipped_when_accepted(server, client, export_keys):
+    create_profile(server, client)
+
+    with client.stream("GET", "/api/export/entrepreneurs", headers={**KEY, "Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        raw = b"".join(response.iter_raw())
+    assert raw[:2] == b"\x1f\x8b"
+    assert json.loads(gzip.decompress(raw))["firstName"] == "Awa"
+
+
+def test_incremental_export(server, client, export_keys):
+    old = create_profile(server, client, "u1")
+    recent = create_profile(server, client, "u2")
+    for profile, day in ((old, 1), (recent, 3)):
+        asyncio.run(server.db.entrepreneurs.update_one(
+            {"id": profile["id"]}, {"$set": {"updatedAt": datetime(2024, 6, day, tzinfo=timezone.utc)}}
+        ))
+
+    def exported(since):
+        response = client.get("/api/export/entrepreneurs", params={"since": since}, headers=IDENTITY)
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.content.splitlines()]
+
+    rows = exported("2024-06-02T00:00:00Z")
+    assert [row["id"] for row in rows] == [recent["id"]]
+    # The last updatedAt is the next since: that row again, nothing missed
+    assert [row["id"] for row in exported(rows[-1]["updatedAt"])] == [recent["id"]]
+    # Naive times are UTC
+    assert len(exported("2024-06-01T00:00:00")) == 2
+    assert client.get("/api/export/entrepreneurs", params={"since": "yesterday"}, headers=KEY).status_code == 422
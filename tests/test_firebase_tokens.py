@@ -0,0 +1,184 @@
+import asyncio
+import base64
+import json
+import time
+
+import pytest
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+from firebase_config import (ISSUER_PREFIX, MIN_KEY_REFRESH_INTERVAL, FirebaseTokenVerifier, GoogleKeySource,
+                             StaticKeySource, TokenVerificationError)
+
+PROJECT = "nexus-test"
+
+
+def _private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _public_pem(key) -> str:
+    return key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+
+
+KEY = _private_key()
+OTHER_KEY = _private_key()
+
+
+def _segment(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def make_token(key=KEY, kid="k1", alg="RS256", drop=(), **overrides) -> str:
+    now = int(time.time())
+    claims = {
+        "aud": PROJECT,
+        "iss": ISSUER_PREFIX + PROJECT,
+        "sub": "firebase-uid",
+        "iat": now - 10,
+        "exp": now + 3600,
+        "auth_time": now - 10,
+        "email": "awa@example.com",
+        **overrides,
+    }
+    for name in drop:
+        claims.pop(name)
+    signing_input = f"{_segment({'alg': alg, 'kid': kid, 'typ': 'JWT'})}.{_segment(claims)}"
+    signature = key.sign(signing_input.encode(), padding.PKCS1v15(), hashes.SHA256())
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+
+
+def verify(token: str, key_source=None) -> dict:
+    verifier = FirebaseTokenVerifier(PROJECT, key_source or StaticKeySource({"k1": _public_pem(KEY)}))
+    try:
+        return asyncio.run(verifier.verify(token))
+    finally:
+        verifier.executor.shutdown()
+
+
+def test_valid_token():
+    claims = verify(make_token())
+    assert claims["uid"] == "firebase-uid"
+    assert claims["email"] == "awa@example.com"
+
+
+def test_bad_signature():
+    with pytest.raises(TokenVerificationError, match="signature"):
+        verify(make_token(key=OTHER_KEY))
+
+
+def test_tampered_claims():
+    header, _, signature = make_token().split(".")
+    forged = _segment({"aud": PROJECT, "iss": ISSUER_PREFIX + PROJECT, "sub": "someone-else",
+                       "iat": int(time.time()), "exp": int(time.time()) + 3600})
+    with pytest.raises(TokenVerificationError, match="signature"):
+        verify(f"{header}.{forged}.{signature}")
+
+
+def test_wrong_algorithm():
+    with pytest.raises(TokenVerificationError, match="algorithm"):
+        verify(make_token(alg="HS256"))
+
+
+@pytest.mark.parametrize("claims, message", [
+    ({"aud": "other-project"}, "audience"),
+    ({"iss": ISSUER_PREFIX + "other-project"}, "issuer"),
+    ({"iss": "https://evil.example.com/" + PROJECT}, "issuer"),
+])
+def test_wrong_audience_or_issuer(claims, message):
+    with pytest.raises(TokenVerificationError, match=message):
+        verify(make_token(**claims))
+
+
+def test_expired():
+    with pytest.raises(TokenVerificationError, match="expired"):
+        verify(make_token(iat=int(time.time()) - 7200, exp=int(time.time()) - 3600))
+
+
+@pytest.mark.parametrize("drop, overrides", [
+    (("iat",), {}),
+    ((), {"iat": "yesterday"}),
+    ((), {"iat": True}),
+])
+def test_missing_or_invalid_iat(drop, overrides):
+    with pytest.raises(TokenVerificationError, match="issue time"):
+        verify(make_token(drop=drop, **overrides))
+
+
+def test_missing_exp():
+    with pytest.raises(TokenVerificationError, match="expiry"):
+        verify(make_token(drop=("exp",)))
+
+
+def test_future_iat():
+    with pytest.raises(TokenVerificationError, match="before issue time"):
+        verify(make_token(iat=int(time.time()) + 3600))
+
+
+@pytest.mark.parametrize("sub", ["", None, 42, "x" * 129])
+def test_invalid_subject(sub):
+    with pytest.raises(TokenVerificationError, match="subject"):
+        verify(make_token(sub=sub))
+
+
+def test_malformed():
+    for token in ["", "a.b", "not.a.token", make_token() + ".extra"]:
+        with pytest.raises(TokenVerificationError):
+            verify(token)
+
+
+class CountingKeySource(GoogleKeySource):
+    """Google key source whose certificate fetch is served locally"""
+
+    def __init__(self, responses):
+        super().__init__(url="unused")
+        self.responses = list(responses)
+        self.fetches = 0
+
+    def _fetch(self):
+        self.fetches += 1
+        certificates = self.responses[min(self.fetches, len(self.responses)) - 1]
+        return {kid: serialization.load_pem_public_key(pem.encode()) for kid, pem in certificates.items()}, 3600
+
+
+def test_unknown_kid_refreshes_keys_at_most_once_per_interval():
+    source = CountingKeySource([{"k1": _public_pem(KEY)}])
+    verifier = FirebaseTokenVerifier(PROJECT, source)
+
+    async def scenario():
+        assert (await verifier.verify(make_token()))["uid"] == "firebase-uid"
+        assert source.fetches == 1
+        # An unknown kid forces one refresh...
+        with pytest.raises(TokenVerificationError, match="unknown key"):
+            await verifier.verify(make_token(kid="k9", sub="a"))
+        # ...and further unknown kids within the interval reuse the keys just fetched
+        for i in range(5):
+            with pytest.raises(TokenVerificationError, match="unknown key"):
+                await verifier.verify(make_token(kid="k9", sub=f"b{i}"))
+        return source.fetches
+
+    try:
+        assert asyncio.run(scenario()) == 1
+    finally:
+        verifier.executor.shutdown()
+
+
+def test_unknown_kid_picks_up_rotated_keys():
+    source = CountingKeySource([{"k1": _public_pem(KEY)}, {"k1": _public_pem(KEY), "k2": _public_pem(OTHER_KEY)}])
+    verifier = FirebaseTokenVerifier(PROJECT, source)
+
+    async def scenario():
+        await verifier.verify(make_token())
+        # Past the refresh interval, Google has published a new key
+        source._fetched_at -= MIN_KEY_REFRESH_INTERVAL + 1
+        claims = await verifier.verify(make_token(key=OTHER_KEY, kid="k2"))
+        return claims, source.fetches
+
+    try:
+        claims, fetches = asyncio.run(scenario())
+    finally:
+        verifier.executor.shutdown()
+    assert claims["uid"] == "firebase-uid"
+    assert fetches == 2
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import geo
+from geo import backfill_pending_points, geo_document, geocode, near_stage, valid_coordinates
+
+from tests.helpers import create_profile
+
+
+@pytest.fixture
+def near_calls(server, monkeypatch):
+    """$geoNear stages of the listing (mongomock has no $geoNear); profiles are returned unordered"""
+    calls = []
+
+    async def list_profiles_near(near, projection, skip, limit):
+        calls.append((near, skip, limit))
+        docs = await server.db.entrepreneurs.find(near["$geoNear"]["query"], projection).to_list(None)
+        return [{**doc, "distanceKm": 1.5} for doc in docs[skip:skip + limit]]
+
+    monkeypatch.setattr(server.repo, "list_profiles_near", list_profiles_near)
+    return calls
+
+
+def test_geocode_ignores_accents_case_and_punctuation():
+    thies = geo.GAZETTEER["SN"]["Thiès"]
+    assert geocode("Thiès") == thies
+    assert geocode("THIES", "sn") == thies
+    assert geocode("saint louis", "SN") == geo.GAZETTEER["SN"]["Saint-Louis"]
+    # Within the given country only
+    assert geocode("Thiès", "GH") is None
+    assert geocode("Atlantis") is None
+    assert geocode(None) is None and geocode("") is None
+
+
+def test_geo_document_is_a_geojson_point():
+    lat, lng = geo.GAZETTEER["SN"]["Dakar"]
+    assert geo_document({"city": "dakar", "location": "SN"}) == {
+        "point": {"type": "Point", "coordinates": [lng, lat]},
+    }
+    assert geo_document({"city": "Atlantis", "location": "SN"}) == {"point": None}
+    assert geo_document({}) == {"point": None}
+
+
+def test_near_stage():
+    stage = near_stage(14.7, -17.4, 25, {"profileType": "freelance"})["$geoNear"]
+    assert stage["near"] == {"type": "Point", "coordinates": [-17.4, 14.7]}
+    assert stage["key"] == "point"
+    assert stage["maxDistance"] == 25000
+    assert stage["distanceMultiplier"] == 0.001
+    assert stage["query"] == {"profileType": "freelance"}
+    assert stage["spherical"] is True
+
+
+def test_valid_coordinates():
+    assert valid_coordinates(14.7, -17.4)
+    assert valid_coordinates(-90, 180)
+    assert not valid_coordinates(91, 0)
+    assert not valid_coordinates(0, -181)
+    assert not valid_coordinates(float("nan"), 0)
+
+
+def test_listing_near_a_city(server, client, near_calls):
+    created = create_profile(server, client)
+    assert created["city"] == "Dakar"
+
+    response = client.get("/api/entrepreneurs", params={"near": "dakar", "location": "SN", "radiusKm": 10, "skip": 1})
+    assert response.status_code == 200
+    (stage, skip, limit), = near_calls
+    lat, lng = geo.GAZETTEER["SN"]["Dakar"]
+    assert stage["$geoNear"]["near"]["coordinates"] == [lng, lat]
+    assert stage["$geoNear"]["maxDistance"] == 10000
+    assert stage["$geoNear"]["query"] == {"location": "SN"}
+    assert (skip, limit) == (1, 50)
+
+    items = client.get("/api/entrepreneurs", params={"lat": 14.7, "lng": -17.4}).json()
+    assert [item["distanceKm"] for item in items] == [1.5]
+    assert near_calls[-1][0]["$geoNear"]["near"]["coordinates"] == [-17.4, 14.7]
+    assert near_calls[-1][0]["$geoNear"]["maxDistance"] == geo.DEFAULT_RADIUS_KM * 1000
+
+
+@pytest.mark.parametrize("params", [
+    {"near": "Atlantis"},
+    {"near": "Thiès", "location": "GH"},
+    {"lat": 14.7},
+    {"lat": 95, "lng": 0},
+    {"near": "Dakar", "radiusKm": 0},
+    {"near": "Dakar", "radiusKm": geo.MAX_RADIUS_KM + 1},
+    {"near": "Dakar", "cursor": ""},
+])
+def test_invalid_proximity_searches(server, client, near_calls, params):
+    assert client.get("/api/entrepreneurs", params=params).status_code == 400
+    assert near_calls == []
+
+
+def test_points_are_backfilled_once(server):
+    async def scenario():
+        db = server.db
+        await db.entrepreneurs.insert_many([
+            {"id": "old", "userId": "u1", "city": "Accra", "location": "GH"},
+            {"id": "unknown", "userId": "u2", "city": "Atlantis", "location": "GH"},
+        ])
+        first = await backfill_pending_points(db)
+        # Written without a point after the backfill: not scanned for again
+        await db.entrepreneurs.insert_one({"id": "later", "userId": "u3", "city": "Kumasi", "location": "GH"})
+        second = await backfill_pending_points(db)
+        docs = {doc["id"]: doc async for doc in db.entrepreneurs.find({}, {"_id": 0})}
+        return first, second, docs, await db.migrations.find_one({"_id": geo.POINTS_MIGRATION_ID})
+
+    first, second, docs, marker = asyncio.run(scenario())
+    assert (first, second) == (2, 0)
+    assert docs["old"]["point"]["coordinates"] == [-0.1870, 5.6037]
+    assert docs["unknown"]["point"] is None
+    assert "point" not in docs["later"]
+    assert marker["done"] is True and marker["migrated"] == 2
@@ -0,0 +1,158 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+import imaging
+from imaging import _image_set, apply_image_variants, image_variants, render_variants
+from media import InvalidImage, LocalMediaStore, media_digest, media_url
+
+from tests.helpers import PROFILE, add_user, auth, data_url, png, token_for
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Source sizes rendered, on a thread pool instead of worker processes"""
+    calls = []
+    render = imaging.render_variants
+
+    def counting(data, widths):
+        calls.append(len(data))
+        return render(data, widths)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(imaging, "render_variants", counting)
+    monkeypatch.setattr(imaging, "_get_executor", lambda: executor)
+    yield calls
+    executor.shutdown()
+
+
+def decoded(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def test_render_variants_widths_and_formats():
+    variants = render_variants(png(400, 200), (96, 192, 384))
+
+    assert [(width, fmt) for width, fmt, _ in variants] == [
+        (96, "webp"), (96, "jpeg"), (192, "webp"), (192, "jpeg"), (384, "webp"), (384, "jpeg"),
+    ]
+    for width, fmt, data in variants:
+        image = decoded(data)
+        assert image.format == fmt.upper()
+        assert image.size == (width, width // 2)
+
+
+def test_render_variants_never_upscales():
+    variants = render_variants(png(120, 60), (96, 192, 384))
+    assert sorted({width for width, _, _ in variants}) == [96, 120]
+
+
+def test_render_variants_strips_metadata_and_flattens_alpha():
+    source = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    Image.new("RGB", (200, 100), (10, 120, 200)).save(source, "JPEG", exif=exif)
+    for _, _, data in render_variants(source.getvalue(), (96,)):
+        assert not decoded(data).getexif()
+
+    transparent = io.BytesIO()
+    Image.new("RGBA", (100, 100), (0, 0, 0, 0)).save(transparent, "PNG")
+    jpeg = next(data for _, fmt, data in render_variants(transparent.getvalue(), (96,)) if fmt == "jpeg")
+    # Transparent pixels become white, not black
+    assert decoded(jpeg).convert("RGB").getpixel((50, 50)) > (240, 240, 240)
+
+
+def test_render_variants_rejects_undecodable_images():
+    with pytest.raises(InvalidImage):
+        render_variants(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32, (96,))
+
+
+def test_image_set_picks_the_smallest_suitable_thumbnail(monkeypatch):
+    monkeypatch.setattr(imaging, "THUMBNAIL_WIDTH", 192)
+    variants = [
+        {"url": f"/{width}.{fmt}", "width": width, "format": fmt}
+        for width in (384, 96, 192) for fmt in ("jpeg", "webp")
+    ]
+    image_set = _image_set(variants)
+    assert image_set["thumbnail"] == "/192.webp"
+    assert image_set["srcset"] == "/96.webp 96w, /192.webp 192w, /384.webp 384w"
+    assert image_set["variants"] == variants
+
+    # Nothing wide enough: the largest one
+    assert _image_set([v for v in variants if v["width"] == 96])["thumbnail"] == "/96.webp"
+
+
+def test_variants_are_rendered_once_per_image(server, tmp_path, renders):
+    store = LocalMediaStore(tmp_path)
+
+    async def scenario():
+        digest = (await store.save(png(400, 200))).digest
+        first = await image_variants(store, server.db, digest, "http://api.test")
+        second = await image_variants(store, server.db, digest, "http://api.test")
+        missing = await image_variants(store, server.db, "0" * 64)
+        return first, second, missing
+
+    first, second, missing = asyncio.run(scenario())
+    assert len(renders) == 1
+    assert first == second
+    assert missing is None
+    assert media_digest(first["thumbnail"]) is not None
+    assert [v["width"] for v in first["variants"] if v["format"] == "webp"] == [96, 192, 384]
+
+
+def test_apply_image_variants(server, tmp_path, renders):
+    store = LocalMediaStore(tmp_path)
+
+    async def scenario():
+        digest = (await store.save(png(400, 200))).digest
+        profile = {
+            "logo": media_url(digest),
+            "logoThumbnail": "stale",
+            "portfolio": [
+                {"type": "image", "value": media_url(digest)},
+                {"type": "image", "value": "https://cdn.example.com/a.png", "thumbnail": "stale"},
+                {"type": "link", "value": "https://example.com"},
+            ],
+        }
+        return await apply_image_variants(store, server.db, profile)
+
+    profile = asyncio.run(scenario())
+    assert media_digest(profile["logoThumbnail"]) is not None
+    assert profile["logoSrcset"].count("w,") == 2
+    assert len(profile["logoVariants"]) == 6
+    assert profile["portfolio"][0]["thumbnail"] == profile["logoThumbnail"]
+    # External URLs have no variants; stale ones are cleared
+    assert profile["portfolio"][1]["thumbnail"] is None
+    assert profile["portfolio"][2]["thumbnail"] is None
+    assert len(renders) == 1
+
+    external = asyncio.run(apply_image_variants(store, server.db, {"logo": "https://cdn.example.com/logo.png"}))
+    assert (external["logoThumbnail"], external["logoSrcset"], external["logoVariants"]) == (None, None, [])
+
+
+def test_public_profile_shows_the_thumbnail(server, client, renders):
+    token = token_for(server, add_user(server))
+    logo = data_url(png(400, 400))
+    created = client.post("/api/entrepreneurs", json={
+        **PROFILE, "logo": logo, "portfolio": [{"type": "image", "value": data_url(png(300, 150))}],
+    }, headers=auth(token)).json()
+
+    # The owner sees the original and its variants
+    assert created["logo"] != created["logoThumbnail"]
+    thumbnail = next(v["url"] for v in created["logoVariants"] if v["width"] == 192 and v["format"] == "webp")
+    assert created["logoThumbnail"] == thumbnail
+
+    public = client.get(f"/api/entrepreneurs/{created['id']}").json()
+    assert public["logo"] == thumbnail
+    assert public["logoSrcset"] == created["logoSrcset"]
+    assert public["portfolio"][0]["thumbnail"] == created["portfolio"][0]["thumbnail"]
+    assert client.get("/api/entrepreneurs").json()[0]["logo"] == thumbnail
+
+    served = client.get(thumbnail.replace("http://testserver", ""))
+    assert served.status_code == 200
+    assert decoded(served.content).size == (192, 192)
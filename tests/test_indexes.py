@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from indexes import INDEXES, MissingUniqueIndexes, ensure_indexes
+
+
+class FakeCollection:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.created = []
+
+    async def list_indexes(self):
+        for info in ():
+            yield info
+
+    async def drop_index(self, name):
+        pass
+
+    async def create_indexes(self, models):
+        names = [model.document["name"] for model in models]
+        if self.failing.intersection(names):
+            raise DuplicateKeyError("E11000 duplicate key error")
+        self.created.extend(names)
+        return names
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+def test_builds_every_declared_index():
+    db = FakeDatabase()
+    created = asyncio.run(ensure_indexes(db))
+    assert created == {name: [model.document["name"] for model in models] for name, models in INDEXES.items()}
+
+
+def test_failing_unique_index_does_not_stop_the_others():
+    db = FakeDatabase(users=FakeCollection(failing={"email_unique"}))
+    with pytest.raises(MissingUniqueIndexes) as raised:
+        asyncio.run(ensure_indexes(db))
+    assert raised.value.names == ["users.email_unique"]
+    # The other users indexes and every later collection were still built
+    assert "id_unique" in db["users"].created
+    assert "userId_unique" in db["entrepreneurs"].created
+    assert "profileId_hour_unique" in db["profile_stats_hourly"].created
+
+
+def test_failing_plain_index_is_only_logged():
+    db = FakeDatabase(entrepreneurs=FakeCollection(failing={"searchTerms"}))
+    created = asyncio.run(ensure_indexes(db))
+    assert "searchTerms" not in created["entrepreneurs"]
+    assert "userId_unique" in created["entrepreneurs"]
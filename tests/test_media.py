@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+
+import pytest
+
+import media
+from media import (InvalidImage, LocalMediaStore, decode_inline_image, externalize_images, media_digest,
+                   media_url, parse_range, sniff_content_type, validate_image)
+
+from tests.helpers import PROFILE, add_user, auth, data_url, png, token_for
+
+
+def stored_files(root):
+    return sorted(path.name for path in root.rglob("*") if path.is_file()) if root.exists() else []
+
+
+def test_content_type_is_sniffed_from_the_bytes():
+    assert sniff_content_type(png()[:16]) == "image/png"
+    assert sniff_content_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert sniff_content_type(b"GIF89a") == "image/gif"
+    assert sniff_content_type(b"RIFF\x00\x00\x00\x00WEBP") == "image/webp"
+    assert sniff_content_type(b"<svg") is None
+
+    with pytest.raises(InvalidImage):
+        validate_image(b"")
+    with pytest.raises(InvalidImage):
+        validate_image(b"<svg xmlns='http://www.w3.org/2000/svg'/>")
+
+
+def test_inline_images_and_media_urls():
+    data = png()
+    assert decode_inline_image(data_url(data)) == data
+    assert decode_inline_image("https://example.com/logo.png") is None
+
+    digest = hashlib.sha256(data).hexdigest()
+    url = media_url(digest, "http://api.test/")
+    assert url == f"http://api.test/api/media/{digest}"
+    assert media_digest(url) == digest
+    assert media_digest("https://example.com/api/media/not-a-hash") is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-3", (0, 3)),
+    ("bytes=4-", (4, 9)),
+    ("bytes=-3", (7, 9)),
+    ("bytes=5-100", (5, 9)),
+    ("bytes=0-1,4-5", None),  # Multiple ranges: the whole file
+    ("items=0-1", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 10) == expected
+
+
+def test_parse_range_unsatisfiable():
+    with pytest.raises(ValueError):
+        parse_range("bytes=10-", 10)
+    with pytest.raises(ValueError):
+        parse_range("bytes=5-2", 10)
+
+
+def test_store_is_content_addressed(tmp_path):
+    store = LocalMediaStore(tmp_path)
+    data = png()
+
+    async def scenario():
+        first = await store.save(data)
+        second = await store.save(data)
+        other = await store.save(png(color=(0, 0, 255)))
+        content = b"".join([chunk async for chunk in store.iter_range(first.digest, 0, first.size - 1)])
+        return first, second, other, content, await store.stat(first.digest)
+
+    first, second, other, content, info = asyncio.run(scenario())
+    assert first.digest == second.digest == hashlib.sha256(data).hexdigest()
+    assert other.digest != first.digest
+    assert content == data
+    assert (info.size, info.content_type) == (len(data), "image/png")
+    # Sharded by the first two hex characters, stored once
+    assert (tmp_path / first.digest[:2] / first.digest).exists()
+    assert len(stored_files(tmp_path)) == 2
+
+
+def test_externalize_images_keeps_only_urls(tmp_path):
+    store = LocalMediaStore(tmp_path)
+    data = png()
+    profile = {
+        "logo": data_url(data),
+        "portfolio": [
+            {"type": "image", "value": data_url(data)},
+            {"type": "link", "value": "https://example.com"},
+            {"type": "image", "value": "https://cdn.example.com/a.png"},
+        ],
+    }
+    asyncio.run(externalize_images(store, profile, "http://api.test"))
+
+    url = media_url(hashlib.sha256(data).hexdigest(), "http://api.test")
+    assert profile["logo"] == url
+    assert [item["value"] for item in profile["portfolio"]] == [
+        url, "https://example.com", "https://cdn.example.com/a.png",
+    ]
+    assert len(stored_files(tmp_path)) == 1
+
+
+def test_media_route_serves_etag_and_ranges(server, client):
+    data = png()
+    digest = asyncio.run(server.media_store.save(data)).digest
+    path = f"/api/media/{digest}"
+
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["etag"] == f'"{digest}"'
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["accept-ranges"] == "bytes"
+
+    assert client.get(path, headers={"If-None-Match": f'"{digest}"'}).status_code == 304
+    assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+    partial = client.get(path, headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.content == data[:8]
+    assert partial.headers["content-range"] == f"bytes 0-7/{len(data)}"
+
+    unsatisfiable = client.get(path, headers={"Range": f"bytes={len(data)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(data)}"
+
+    assert client.get(f"/api/media/{'0' * 64}").status_code == 404
+    assert client.get("/api/media/..%2F..%2Fserver.py").status_code == 404
+
+
+def test_upload_media(server, client):
+    headers = auth(token_for(server, add_user(server)))
+    data = png()
+
+    response = client.post("/api/media", files={"file": ("logo.png", data, "image/png")}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["hash"] == hashlib.sha256(data).hexdigest()
+    assert response.json()["contentType"] == "image/png"
+
+    rejected = client.post("/api/media", files={"file": ("logo.svg", b"<svg/>", "image/svg+xml")}, headers=headers)
+    assert rejected.status_code == 400
+    assert client.post("/api/media", files={"file": ("logo.png", data, "image/png")}).status_code == 401
+
+
+def test_update_by_another_user_stores_nothing(server, client, tmp_path, monkeypatch):
+    owner = token_for(server, add_user(server, "owner"))
+    other = token_for(server, add_user(server, "other"))
+    created = client.post("/api/entrepreneurs", json=PROFILE, headers=auth(owner))
+    profile_id = created.json()["id"]
+
+    rendered = []
+
+    async def apply_image_variants(store, db, profile, base_url=""):
+        rendered.append(profile)
+        return profile
+
+    monkeypatch.setattr(server.imaging, "apply_image_variants", apply_image_variants)
+    update = {**PROFILE, "logo": data_url(png()), "portfolio": [{"type": "image", "value": data_url(png(16, 16))}]}
+    response = client.put(f"/api/entrepreneurs/{profile_id}", json=update, headers=auth(other))
+
+    assert response.status_code == 403
+    assert stored_files(tmp_path / "media") == []
+    assert rendered == []
+    assert client.put("/api/entrepreneurs/missing", json=update, headers=auth(owner)).status_code == 403
+
+    response = client.put(f"/api/entrepreneurs/{profile_id}", json=update, headers=auth(owner))
+    assert response.status_code == 200
+    assert media.media_digest(response.json()["logo"]) is not None
+    assert len(stored_files(tmp_path / "media")) == 2
+    assert len(rendered) == 1
+
+
+def test_second_profile_stores_nothing(server, client, tmp_path):
+    token = token_for(server, add_user(server))
+    assert client.post("/api/entrepreneurs", json=PROFILE, headers=auth(token)).status_code == 200
+
+    response = client.post("/api/entrepreneurs", json={**PROFILE, "logo": data_url(png())}, headers=auth(token))
+    assert response.status_code == 400
+    assert stored_files(tmp_path / "media") == []
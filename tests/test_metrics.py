@@ -0,0 +1,37 @@
+import metrics
+
+
+def test_render_counters_and_histograms():
+    requests = metrics.counter("test_requests_total", "Test requests", ["route"])
+    latency = metrics.histogram("test_latency_seconds", "Test latency", buckets=(0.1, 1.0))
+    requests.inc(route="/a")
+    requests.inc(2, route='/b"')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = metrics.render()
+    assert 'test_requests_total{route="/a"} 1' in text
+    assert 'test_requests_total{route="/b\\""} 2' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_latency_seconds_count 2" in text
+    # Registering again returns the same metric
+    assert metrics.counter("test_requests_total", "Test requests", ["route"]) is requests
+
+
+def test_metrics_endpoint_requires_a_key(server, client, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_API_KEYS", ["scrape-key"])
+
+    assert client.get("/api/metrics").status_code == 403
+    assert client.get("/api/metrics", headers={"X-API-Key": "wrong"}).status_code == 403
+    assert client.get("/api/metrics", headers={"Authorization": "Basic scrape-key"}).status_code == 403
+
+    response = client.get("/api/metrics", headers={"X-API-Key": "scrape-key"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer scrape-key"}).status_code == 200
+
+
+def test_metrics_endpoint_is_disabled_without_keys(server, client, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_API_KEYS", [])
+    assert client.get("/api/metrics", headers={"X-API-Key": ""}).status_code == 403
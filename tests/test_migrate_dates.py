@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime, timezone
+
+import migrate_dates
+from migrate_dates import migrate_pending, parse_timestamp
+
+
+class FakeMigrations:
+    def __init__(self, done):
+        self.done = done
+
+    async def _iterate(self):
+        for _id in self.done:
+            yield {"_id": _id}
+
+    def find(self, query, projection):
+        assert query == {"done": True}
+        return self._iterate()
+
+
+class FakeDatabase:
+    def __init__(self, done):
+        self.migrations = FakeMigrations(done)
+
+
+def test_parse_timestamp_defaults_to_utc():
+    assert parse_timestamp("2024-05-01T10:00:00") == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert parse_timestamp("2024-05-01T12:00:00+02:00") == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+
+
+def test_migrate_pending_skips_done_collections(monkeypatch):
+    migrated = []
+
+    async def migrate_collection(db, name, fields, batch_size):
+        migrated.append(name)
+        return 3
+
+    monkeypatch.setattr(migrate_dates, "migrate_collection", migrate_collection)
+    converted = asyncio.run(migrate_pending(FakeDatabase(["dates:users"])))
+    assert migrated == ["entrepreneurs", "contact_messages"]
+    assert converted == {"entrepreneurs": 3, "contact_messages": 3}
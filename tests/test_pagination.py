@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).rstrip(b"=").decode()
+
+
+def test_round_trip_by_date():
+    created = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor("createdAt", {"id": "p1", "createdAt": created})
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "createdAt") == (created, "p1")
+
+
+def test_round_trip_by_rating():
+    cursor = encode_cursor("rating", {"id": "p2", "rating": 4.5})
+    assert decode_cursor(cursor, "rating") == (4.5, "p2")
+    assert decode_cursor(encode_cursor("rating", {"id": "p3", "rating": 0}), "rating") == (0, "p3")
+
+
+def test_cursor_for_another_sort_is_rejected():
+    cursor = encode_cursor("rating", {"id": "p2", "rating": 4.5})
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "createdAt")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "!!!",
+    "bm90IGpzb24",  # "not json"
+    raw_cursor(["createdAt", {"$date": "2024-05-01T00:00:00"}]),  # Two items
+    raw_cursor({"field": "createdAt"}),
+    raw_cursor(["createdAt", {"$date": "x"}, "p1"]),
+    raw_cursor(["createdAt", {"$date": 5}, "p1"]),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "createdAt")
+
+
+@pytest.mark.parametrize("sort_field, value", [
+    # Query operators must never reach keyset_filter
+    ("createdAt", {"$ne": None}),
+    ("createdAt", {"$date": "2024-05-01T00:00:00", "$ne": None}),
+    ("rating", {"$gt": 0}),
+    ("createdAt", ["2024-05-01"]),
+    ("createdAt", "2024-05-01T00:00:00"),
+    ("createdAt", 5),
+    ("rating", "5"),
+    ("rating", True),
+    ("rating", None),
+])
+def test_values_of_the_wrong_type_are_rejected(sort_field, value):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor([sort_field, value, "p1"]), sort_field)
+
+
+@pytest.mark.parametrize("last_id", [None, 5, {"$gt": ""}])
+def test_id_must_be_a_string(last_id):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(["rating", 4.0, last_id]), "rating")
+
+
+def test_unsupported_sort_field():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(["name", "awa", "p1"]), "name")
+
+
+def test_keyset_filter():
+    assert keyset_filter("rating", 4.5, "p2") == {"$or": [
+        {"rating": {"$lt": 4.5}},
+        {"rating": 4.5, "id": {"$lt": "p2"}},
+    ]}
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+
+from passwords import PasswordHasher, PasswordPoolBusy
+
+
+class BlockingContext:
+    """Stands in for the CryptContext; hashing waits until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.started.set()
+        self.release.wait(5)
+        return f"hashed:{password}"
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_job_finishes():
+    async def scenario():
+        context = BlockingContext()
+        hasher = PasswordHasher(context, max_workers=1, max_pending=1)
+        try:
+            task = asyncio.create_task(hasher.hash("first"))
+            await asyncio.to_thread(context.started.wait, 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            # bcrypt is still running in its thread: the pool is still full
+            with pytest.raises(PasswordPoolBusy):
+                await hasher.hash("second")
+
+            context.release.set()
+            for _ in range(100):
+                if hasher._pending == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert await hasher.hash("third") == "hashed:third"
+        finally:
+            context.release.set()
+            hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_rejects_beyond_max_pending():
+    async def scenario():
+        context = BlockingContext()
+        hasher = PasswordHasher(context, max_workers=1, max_pending=2)
+        try:
+            jobs = [asyncio.create_task(hasher.hash(str(i))) for i in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(PasswordPoolBusy) as busy:
+                await hasher.hash("overflow")
+            assert busy.value.retry_after >= 1
+            context.release.set()
+            assert await asyncio.gather(*jobs) == ["hashed:0", "hashed:1"]
+        finally:
+            context.release.set()
+            hasher.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+from ratelimit import MemoryStore, RateLimit, RateLimitMiddleware, RedisStore, RoutePolicy, client_ip
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def get(self, key):
+        return self.values.get(key)
+
+
+def hits(store, key, rate, count):
+    async def run():
+        return [await store.hit(key, rate) for _ in range(count)]
+    return asyncio.run(run())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store_and_clock(request):
+    clock = Clock()
+    if request.param == "memory":
+        return MemoryStore(shards=4, timer=clock), clock
+    return RedisStore(FakeRedis(), timer=clock), clock
+
+
+def test_rate_limit_parse():
+    assert RateLimit.parse("30/600") == RateLimit(30, 600)
+    assert RateLimit.parse("5") == RateLimit(5, 60)
+
+
+def test_limit_within_a_window(store_and_clock):
+    store, _ = store_and_clock
+    results = hits(store, "k", RateLimit(3, 100), 4)
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    # Retry once the window is over
+    assert results[-1][1] == 100
+
+
+def test_previous_window_is_weighted_by_its_overlap(store_and_clock):
+    store, clock = store_and_clock
+    rate = RateLimit(4, 100)
+    assert all(allowed for allowed, _ in hits(store, "k", rate, 4))
+
+    # A quarter into the next window, 3 of the previous 4 still count
+    clock.now += 125
+    assert hits(store, "k", rate, 2) == [(True, 0), (False, 50)]
+
+    # Halfway in: 2 of the previous ones plus the 3 attempts, rejected ones included
+    clock.now += 25
+    assert hits(store, "k", rate, 1)[0][0] is False
+
+
+def test_gap_of_more_than_a_window_forgets_everything(store_and_clock):
+    store, clock = store_and_clock
+    rate = RateLimit(2, 100)
+    hits(store, "k", rate, 5)
+    clock.now += 200
+    assert [allowed for allowed, _ in hits(store, "k", rate, 2)] == [True, True]
+
+
+def test_keys_are_independent(store_and_clock):
+    store, _ = store_and_clock
+    rate = RateLimit(1, 100)
+    assert hits(store, "a", rate, 1)[0][0] is True
+    assert hits(store, "b", rate, 1)[0][0] is True
+    assert hits(store, "a", rate, 1)[0][0] is False
+
+
+def test_memory_store_prunes_expired_keys():
+    clock = Clock()
+    store = MemoryStore(shards=1, shard_size=2, timer=clock)
+    rate = RateLimit(1, 10)
+    hits(store, "a", rate, 1)
+    hits(store, "b", rate, 1)
+    clock.now += 30
+    hits(store, "c", rate, 1)
+    assert set(store._shards[0]) == {"c"}
+
+
+def scope(headers=(), client=("10.0.0.1", 1234), method="POST", path="/api/auth/login"):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers), "client": client}
+
+
+def test_client_ip_ignores_forwarded_for_by_default():
+    request = scope([(b"x-forwarded-for", b"1.2.3.4")])
+    assert client_ip(request) == "10.0.0.1"
+    assert client_ip(request, proxy_hops=0) == "10.0.0.1"
+
+
+def test_client_ip_takes_the_entry_added_by_the_outermost_proxy():
+    request = scope([(b"x-forwarded-for", b"6.6.6.6, 1.2.3.4, 10.0.0.2")])
+    assert client_ip(request, proxy_hops=1) == "10.0.0.2"
+    assert client_ip(request, proxy_hops=2) == "1.2.3.4"
+    # More hops than entries: the leftmost one
+    assert client_ip(request, proxy_hops=5) == "6.6.6.6"
+
+
+def test_client_ip_without_header_or_client():
+    assert client_ip(scope(), proxy_hops=1) == "10.0.0.1"
+    assert client_ip(scope(client=None)) == "unknown"
+
+
+def test_middleware_rejects_with_retry_after():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    policy = RoutePolicy("POST", "/api/entrepreneurs/{entrepreneur_id}/contact", per_ip=RateLimit(1, 60))
+    middleware = RateLimitMiddleware(app, [policy], MemoryStore(timer=Clock(960.0)))
+
+    async def run(request):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+        await middleware(request, None, send)
+        return sent
+
+    path = "/api/entrepreneurs/abc/contact"
+    assert asyncio.run(run(scope(path=path))) == []
+    rejected = asyncio.run(run(scope(path=path)))
+    assert rejected[0]["status"] == 429
+    assert (b"retry-after", b"60") in rejected[0]["headers"]
+    # Other routes and other clients are not limited
+    asyncio.run(run(scope(path="/api/entrepreneurs")))
+    asyncio.run(run(scope(path=path, client=("10.0.0.9", 1))))
+    assert calls == [path, "/api/entrepreneurs", path]
@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+
+import response_cache
+from response_cache import (CachedResponse, MemoryBackend, MemoryVersions, MongoVersions, RedisBackend,
+                            ResponseCache, create_version_store)
+
+
+class FakeVersionCollection:
+    """The slice of a Motor collection used by MongoVersions"""
+
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    async def _iterate(self, ids):
+        for _id in ids:
+            if _id in self.docs:
+                yield dict(self.docs[_id])
+
+    def find(self, query):
+        self.reads += 1
+        return self._iterate(query["_id"]["$in"])
+
+    async def find_one_and_update(self, query, update, upsert, return_document):
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"], **update["$setOnInsert"]})
+        return dict(doc)
+
+    async def update_one(self, query, update, upsert):
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+
+def worker(versions) -> ResponseCache:
+    return ResponseCache(MemoryBackend(1024 * 1024, 60), versions)
+
+
+async def cached_body(cache: ResponseCache, params: dict):
+    key, cached = await cache.lookup("entrepreneurs", params, ("entrepreneurs",))
+    return key, cached.body if cached else None
+
+
+def test_hit_after_store_and_miss_after_invalidation():
+    async def scenario():
+        cache = worker(MemoryVersions())
+        key, body = await cached_body(cache, {"page": 1})
+        assert body is None
+        await cache.store(key, CachedResponse(b"[1]", {"ETag": '"a"'}, ["p1"]))
+
+        same_key, cached = await cache.lookup("entrepreneurs", {"page": 1}, ("entrepreneurs",))
+        assert same_key == key
+        assert (cached.body, cached.headers, cached.profile_ids) == (b"[1]", {"ETag": '"a"'}, ["p1"])
+        # Other parameters are other entries
+        assert (await cached_body(cache, {"page": 2}))[1] is None
+
+        await cache.invalidate("entrepreneurs")
+        new_key, body = await cached_body(cache, {"page": 1})
+        assert new_key != key
+        assert body is None
+
+    asyncio.run(scenario())
+
+
+def test_unrelated_tag_keeps_entries():
+    async def scenario():
+        cache = worker(MemoryVersions())
+        key, _ = await cached_body(cache, {})
+        await cache.store(key, CachedResponse(b"{}"))
+        await cache.invalidate("users")
+        assert await cached_body(cache, {}) == (key, b"{}")
+
+    asyncio.run(scenario())
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_write_in_one_worker_invalidates_every_worker():
+    async def scenario():
+        shared = MongoVersions(FakeVersionCollection(), ttl=0)
+        first, second = worker(shared), worker(shared)
+
+        key, _ = await cached_body(second, {})
+        await second.store(key, CachedResponse(b"old"))
+        assert await cached_body(first, {}) == (key, None)  # Same key (and ETag), own entries
+
+        await first.invalidate("entrepreneurs")
+        new_key, body = await cached_body(second, {})
+        assert new_key != key
+        assert body is None
+
+    asyncio.run(scenario())
+
+
+def test_mongo_versions_are_reused_for_their_ttl():
+    async def scenario():
+        collection, clock = FakeVersionCollection(), Clock()
+        first = MongoVersions(collection, ttl=1, clock=clock)
+        second = MongoVersions(collection, ttl=1, clock=clock)
+
+        initial = await first.versions(["entrepreneurs", "users"])
+        assert await first.versions(["entrepreneurs"]) == initial[:1]
+        assert collection.reads == 1
+        assert await second.versions(["entrepreneurs", "users"]) == initial
+        assert collection.reads == 2
+
+        # The worker that writes sees it at once, the others after the TTL
+        await first.bump("entrepreneurs")
+        bumped = await first.versions(["entrepreneurs"])
+        assert bumped != initial[:1]
+        assert await second.versions(["entrepreneurs"]) == initial[:1]
+        clock.now = 1.0
+        assert await second.versions(["entrepreneurs"]) == bumped
+        assert collection.reads == 3
+
+    asyncio.run(scenario())
+
+
+def test_mongo_versions_without_ttl_read_every_lookup():
+    async def scenario():
+        collection = FakeVersionCollection()
+        versions = MongoVersions(collection, ttl=0)
+        await versions.versions(["entrepreneurs"])
+        await versions.versions(["entrepreneurs"])
+        return collection.reads
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_redis_backend_shares_entries_and_versions():
+    async def scenario():
+        redis = FakeRedis()
+        first, second = ResponseCache(RedisBackend(redis)), ResponseCache(RedisBackend(redis))
+        key, _ = await cached_body(first, {})
+        await first.store(key, CachedResponse(b"shared"))
+        assert await cached_body(second, {}) == (key, b"shared")
+        await second.invalidate("entrepreneurs")
+        assert (await cached_body(first, {}))[1] is None
+
+    asyncio.run(scenario())
+
+
+def test_large_responses_are_not_stored():
+    async def scenario():
+        cache = ResponseCache(MemoryBackend(1024 * 1024, 60), MemoryVersions(), max_entry_bytes=10)
+        key, _ = await cached_body(cache, {})
+        await cache.store(key, CachedResponse(b"x" * 11))
+        return await cached_body(cache, {})
+
+    assert asyncio.run(scenario())[1] is None
+
+
+def test_version_store_outage_disables_caching():
+    class Down:
+        async def versions(self, tags):
+            raise ConnectionError("down")
+
+    assert asyncio.run(worker(Down()).lookup("entrepreneurs", {}, ("entrepreneurs",))) == (None, None)
+
+
+def test_disabled_cache():
+    cache = ResponseCache(None)
+    assert asyncio.run(cache.lookup("entrepreneurs", {}, ("entrepreneurs",))) == (None, None)
+    asyncio.run(cache.invalidate("entrepreneurs"))
+
+
+def test_process_versions_need_a_single_worker(monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_VERSIONS", "memory")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(ValueError):
+        create_version_store(db=None)
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert isinstance(create_version_store(db=None), MemoryVersions)
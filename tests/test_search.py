@@ -0,0 +1,53 @@
+from search import (MAX_PREFIX_LENGTH, MAX_QUERY_TERMS, fold, query_terms, search_document, search_filter,
+                    tokenize)
+
+
+def test_fold_strips_accents_and_case():
+    assert fold("Développement") == "developpement"
+    assert fold("TOURÉ") == "toure"
+    assert fold("Cœur") == "coeur"
+
+
+def test_tokenize_drops_one_character_tokens():
+    assert tokenize("Agence à Dakar") == ["agence", "dakar"]
+    assert tokenize("a b c") == []
+    assert tokenize("") == []
+
+
+def test_search_document_indexes_every_prefix():
+    doc = search_document({"companyName": "Touré SARL", "description": "Développement web"})
+    assert {"to", "tou", "tour", "toure", "sa", "sarl", "de", "dev", "developpement", "we", "web"} <= set(doc["searchTerms"])
+    # Single characters are never indexed
+    assert all(len(term) >= 2 for term in doc["searchTerms"])
+    assert doc["searchFields"]["companyName"] == ["sa", "sar", "sarl", "to", "tou", "tour", "toure"]
+    assert doc["searchFields"]["firstName"] == []
+
+
+def test_search_document_caps_prefix_length():
+    doc = search_document({"companyName": "x" * 30})
+    assert max(len(term) for term in doc["searchTerms"]) == MAX_PREFIX_LENGTH
+
+
+def test_accented_and_plain_queries_match_the_same_terms():
+    terms = set(search_document({"lastName": "Touré"})["searchTerms"])
+    for search in ("Touré", "toure", "TOUR", "to"):
+        assert set(query_terms(search)) <= terms
+
+
+def test_query_terms():
+    assert query_terms("Dév dév DEV") == ["dev"]
+    assert len(query_terms(" ".join(f"term{i}" for i in range(20)))) == MAX_QUERY_TERMS
+    assert query_terms("y" * 40) == ["y" * MAX_PREFIX_LENGTH]
+
+
+def test_one_character_query():
+    # Too short to be indexed: it matches nothing rather than everything
+    assert query_terms("a") == []
+    assert search_filter(query_terms("a")) == {"searchTerms": {"$all": []}}
+    # Alongside a longer term it is ignored
+    assert query_terms("a dakar") == ["dakar"]
+
+
+def test_search_filter_is_never_a_regex():
+    assert search_filter(query_terms(".*")) == {"searchTerms": {"$all": []}}
+    assert search_filter(query_terms("(a+)+$ web")) == {"searchTerms": {"$all": ["web"]}}
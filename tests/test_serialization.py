@@ -0,0 +1,49 @@
+import json
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from serialization import DocumentEncoder
+
+
+class Item(BaseModel):
+    value: str
+    thumbnail: Optional[str] = None
+    tags: List[str] = []
+
+
+class Profile(BaseModel):
+    id: str
+    city: Optional[str] = None
+    items: List[Item] = []
+    main: Optional[Item] = None
+
+
+ENCODER = DocumentEncoder(Profile)
+
+
+def test_projection_includes_nested_fields():
+    assert ENCODER.projection == {
+        "_id": 0, "id": 1, "city": 1,
+        "items.value": 1, "items.thumbnail": 1, "items.tags": 1,
+        "main.value": 1, "main.thumbnail": 1, "main.tags": 1,
+    }
+
+
+def test_complete_fills_top_level_and_nested_defaults():
+    doc = {"id": "1", "items": [{"value": "a"}, {"value": "b", "thumbnail": "t"}], "main": {"value": "m"}}
+    completed = ENCODER.complete(doc)
+    # Same output as the validated path
+    assert completed == Profile.model_validate(doc).model_dump()
+
+
+def test_complete_leaves_missing_and_null_models_alone():
+    assert ENCODER.complete({"id": "1", "main": None}) == {"id": "1", "city": None, "items": [], "main": None}
+
+
+def test_encode_page():
+    body = ENCODER.encode_page([{"id": "1", "items": [{"value": "a"}]}], "next")
+    assert json.loads(body) == {
+        "items": [{"id": "1", "city": None, "items": [{"value": "a", "thumbnail": None, "tags": []}], "main": None}],
+        "nextCursor": "next",
+    }